@@ -0,0 +1,134 @@
+# batch_insights.py
+"""
+Job em lote: gera os insights de IA de todas as conversas em negociação e salva um
+JSON por ticket (insights.InsightStore). A página de conversas carrega esses
+insights na hora; tickets sem mensagens novas desde a última execução são pulados.
+
+Uso:
+    python batch_insights.py --concurrency 4
+    python batch_insights.py --force --limit 50
+
+Credenciais: variáveis de ambiente (ou .env) SUPABASE_URL, SUPABASE_KEY e
+OPENAI_API_KEY; na ausência delas, as mesmas chaves de .streamlit/secrets.toml.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+from dotenv import load_dotenv
+from supabase import create_client
+
+import config
+import conversations
+import insights as insights_lib
+
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+# Erros que valem nova tentativa: limite de requisições, timeouts e falhas do servidor
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+def load_secret(*names: str) -> str | None:
+    """Primeiro nome encontrado no ambiente ou no secrets.toml do Streamlit."""
+    for name in names:
+        if os.environ.get(name):
+            return os.environ[name]
+    if os.path.exists(SECRETS_PATH):
+        with open(SECRETS_PATH, "rb") as f:
+            secrets = tomllib.load(f)
+        for name in names:
+            if secrets.get(name):
+                return secrets[name]
+    return None
+
+def retry_delay(error: Exception, attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Respeita o `retry-after` da API quando houver; senão, backoff exponencial com jitter."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+def call_with_backoff(fn, max_retries: int, *args, **kwargs):
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            time.sleep(retry_delay(e, attempt))
+
+def generate_with_backoff(conversation_text: str, cache: insights_lib.InsightCache, max_retries: int) -> dict:
+    return call_with_backoff(insights_lib.generate_insights, max_retries, conversation_text, cache=cache)
+
+def process_ticket(ticket_id, messages_df, store: insights_lib.InsightStore, cache: insights_lib.InsightCache, max_retries: int, force: bool,
+                   summaries: insights_lib.SummaryStore | None = None) -> str:
+    summaries = summaries or insights_lib.SummaryStore()
+    # Um insight gerado na página pode estar em dia com um resumo parcial: o job completa o resumo
+    if not force and store.is_fresh(store.get(ticket_id), messages_df) and not insights_lib.has_summary_backlog(ticket_id, messages_df, summaries):
+        return "sem mensagens novas"
+    conversation_text = insights_lib.build_conversation_context(
+        ticket_id, messages_df, summaries,
+        summarize=lambda previous, lines: call_with_backoff(insights_lib.summarize_messages, max_retries, previous, lines),
+    )
+    # Com --force o cache é ignorado para de fato regerar
+    result = generate_with_backoff(conversation_text, None if force else cache, max_retries)
+    store.save(ticket_id, result, messages_df['ordemmensagens'].max())
+    return "gerado"
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=config.INSIGHT_BATCH_CONCURRENCY, help="chamadas simultâneas ao modelo")
+    parser.add_argument("--max-retries", type=int, default=config.INSIGHT_BATCH_MAX_RETRIES)
+    parser.add_argument("--limit", type=int, default=None, help="processa no máximo N tickets")
+    parser.add_argument("--force", action="store_true", help="regera mesmo sem mensagens novas")
+    args = parser.parse_args()
+
+    load_dotenv()
+    url = load_secret("SUPABASE_URL", "supabase_url")
+    key = load_secret("SUPABASE_KEY", "supabase_key")
+    openai.api_key = load_secret("OPENAI_API_KEY")
+    if not url or not key or not openai.api_key:
+        print("Credenciais do Supabase/OpenAI não encontradas.", file=sys.stderr)
+        return 1
+    openai.max_retries = 0  # As novas tentativas são feitas aqui, com backoff
+
+    store = conversations.ConversationStore(config.CONVERSATION_STORE_PATH)
+    store.sync(create_client(url, key))
+    messages, summary = store.snapshot()
+    ticket_ids = summary.index[summary['em_negociacao']].tolist()[:args.limit]
+    print(f"{len(ticket_ids)} conversas em negociação")
+
+    insight_store = insights_lib.InsightStore()
+    insight_cache = insights_lib.InsightCache()
+    summary_store = insights_lib.SummaryStore()
+    selected = messages[messages['ticket_id'].isin(ticket_ids)]
+    counts = {}
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = {
+            executor.submit(process_ticket, ticket_id, group, insight_store, insight_cache, args.max_retries, args.force, summary_store): ticket_id
+            for ticket_id, group in selected.groupby('ticket_id', sort=False, observed=True)
+        }
+        for future in as_completed(futures):
+            ticket_id = futures[future]
+            try:
+                status = future.result()
+            except Exception as e:
+                status = "erro"
+                print(f"[{ticket_id}] erro: {e}", file=sys.stderr)
+            counts[status] = counts.get(status, 0) + 1
+
+    print(", ".join(f"{status}: {count}" for status, count in sorted(counts.items())))
+    cache_stats = insight_cache.stats()
+    print(f"cache de insights: {cache_stats['entries']} entradas, taxa de acerto {cache_stats['hit_rate']:.0%}")
+    return 1 if counts.get("erro") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
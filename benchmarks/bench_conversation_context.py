@@ -0,0 +1,85 @@
+# benchmarks/bench_conversation_context.py
+"""
+Tamanho do prompt de insights de uma conversa longa que cresce: as últimas
+INSIGHT_CONTEXT_MESSAGES mensagens (insights.build_conversation_text, o comportamento
+anterior, que perde o início da conversa), a conversa inteira e o contexto com
+orçamento de tokens e resumo acumulado (insights.build_conversation_context), que
+cobre todas as mensagens com tamanho limitado.
+A cada `--step` mensagens novas o insight é pedido de novo, como na página; o
+resumidor é o FakeOpenAI com a resposta gravada, então nada sai para a rede.
+Por fim, compara as chamadas de resumo do primeiro clique na conversa inteira, sem
+resumo salvo: sem limite (o job) e com INSIGHT_INTERACTIVE_MAX_FOLDS (a página).
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_conversation_context.py --messages 4000 --step 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import conversations
+import insights as insights_lib
+import tracing
+from fixtures import OPENAI_FILE, load_recorded, replay_messages
+from stubs import FakeOpenAI, offline
+
+def long_conversation(n_messages: int):
+    """Todas as mensagens reproduzidas viram um único ticket, em ordem."""
+    rows = replay_messages(n_messages)
+    for i, row in enumerate(rows, start=1):
+        row["ticket_id"] = "LONGA"
+        row["ordemmensagens"] = i
+    return conversations.prepare_messages(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=4000)
+    parser.add_argument("--step", type=int, default=20, help="mensagens novas entre duas gerações de insight")
+    args = parser.parse_args()
+
+    tracing.set_exporter(None)
+    messages = long_conversation(args.messages)
+    summaries = insights_lib.SummaryStore(tempfile.mkdtemp(prefix="bench-summaries-"))
+    tail_tokens, full_tokens, context_tokens, context_ms = [], [], [], []
+    coverage = []
+
+    with offline(), FakeOpenAI(load_recorded(OPENAI_FILE)) as fake_openai:
+        for end in range(args.step, len(messages) + 1, args.step):
+            window = messages.iloc[:end]
+            tail_tokens.append(insights_lib.estimate_tokens(insights_lib.build_conversation_text(window)))
+            full_tokens.append(insights_lib.estimate_tokens(insights_lib.build_conversation_text(window, max_messages=end)))
+            coverage.append(min(end, config.INSIGHT_CONTEXT_MESSAGES) / end)
+            start = time.perf_counter()
+            context = insights_lib.build_conversation_context("LONGA", window, summaries)
+            context_ms.append((time.perf_counter() - start) * 1000)
+            context_tokens.append(insights_lib.estimate_tokens(context))
+        summary_calls = fake_openai.calls.get("summary", 0)
+
+        first_click = {}
+        for label, max_folds in (("sem limite (job)", None), (f"máx. {config.INSIGHT_INTERACTIVE_MAX_FOLDS} (página)", config.INSIGHT_INTERACTIVE_MAX_FOLDS)):
+            calls_before = fake_openai.calls.get("summary", 0)
+            start = time.perf_counter()
+            insights_lib.build_conversation_context("LONGA", messages, insights_lib.SummaryStore(tempfile.mkdtemp(prefix="bench-summaries-")), max_folds=max_folds)
+            first_click[label] = (fake_openai.calls.get("summary", 0) - calls_before, (time.perf_counter() - start) * 1000)
+
+    print(f"{len(full_tokens)} gerações de insight, conversa de até {len(messages)} mensagens")
+    print(f"{'contexto':<22} | {'tokens (máx)':>12} | {'tokens (mediana)':>16} | {'tokens (total)':>14} | {'cobertura':>9} | {'resumos':>7}")
+    for label, tokens, covered, calls in (
+        (f"últimas {config.INSIGHT_CONTEXT_MESSAGES} mensagens", tail_tokens, statistics.mean(coverage), 0),
+        ("conversa inteira", full_tokens, 1.0, 0),
+        ("orçamento + resumo", context_tokens, 1.0, summary_calls),
+    ):
+        print(f"{label:<22} | {max(tokens):>12,} | {statistics.median(tokens):>16,.0f} | {sum(tokens):>14,} | {covered:>9.0%} | {calls:>7}")
+    print(f"montagem do contexto: mediana {statistics.median(context_ms):.1f} ms, máx {max(context_ms):.1f} ms")
+    for label, (calls, elapsed) in first_click.items():
+        print(f"primeiro clique, {label}: {calls} chamadas de resumo ({elapsed:.0f} ms com o modelo simulado)")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,57 @@
+# benchmarks/bench_conversation_sync.py
+"""
+Compara o carregamento completo das mensagens (comportamento anterior: RPC inteiro
+a cada expiração do cache) com a sincronização incremental da ConversationStore,
+para tabelas de tamanhos diferentes. Ambos incluem a montagem do resumo por ticket
+e do índice de busca. Roda sem rede, com o FakeSupabase; a coluna "linhas" mostra
+o volume que trafegaria do banco (no incremental, as mensagens novas mais as da janela
+de CONVERSATIONS_SYNC_LOOKBACK_SECONDS antes do watermark).
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_conversation_sync.py --sizes 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conversations
+from stubs import FakeSupabase
+from synthetic import make_messages
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def bench(size: int, new_messages: int):
+    rows = make_messages(size)
+    conn = FakeSupabase(rows)
+
+    # Carga completa: tudo é buscado e o resumo/índice são construídos do zero
+    store = conversations.ConversationStore()
+    _, full_time = timed(store.sync, conn)
+    full_rows = conn.rows_transferred
+    last = datetime.fromisoformat(rows[-1]['data_hora'])
+    conn.insert(make_messages(new_messages, seed=7, start=last + timedelta(seconds=30)))
+    conn.rows_transferred = 0
+    _, incremental_time = timed(store.sync, conn)
+
+    print(f"{size:>10,} | {full_time * 1000:>12.1f} | {full_rows:>12,} | {incremental_time * 1000:>14.1f} | {conn.rows_transferred:>12,}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    parser.add_argument("--new-messages", type=int, default=200, help="mensagens novas entre duas sincronizações")
+    args = parser.parse_args()
+
+    print(f"{'mensagens':>10} | {'completo (ms)':>12} | {'linhas':>12} | {'incremental (ms)':>14} | {'linhas':>12}")
+    for size in args.sizes:
+        bench(size, args.new_messages)
+
+if __name__ == "__main__":
+    main()
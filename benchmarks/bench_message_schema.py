@@ -0,0 +1,83 @@
+# benchmarks/bench_message_schema.py
+"""
+Compara o DataFrame de mensagens anterior (colunas `object` direto do JSON do RPC,
+`data_hora` como texto) com o esquema compacto de conversations.compact_messages:
+memória ocupada, tempo de preparo, leitura a cada rerun (o st.cache_data anterior
+fazia pickle + cópia a cada leitura; a store compartilhada devolve a mesma
+referência) e tamanho/tempo de carga do arquivo persistido.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_message_schema.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conversations
+import tracing
+from fixtures import replay_messages
+
+def legacy_prepare(records: list) -> pd.DataFrame:
+    """prepare_messages anterior: colunas object e datas em texto."""
+    df = pd.DataFrame(records)
+    df['curso'] = df['tags'].apply(lambda x: x.split(',')[0].strip() if x and isinstance(x, str) else 'Não especificado')
+    df['ordemmensagens'] = pd.to_numeric(df['ordemmensagens'], errors='coerce')
+    df.dropna(subset=['ordemmensagens'], inplace=True)
+    df['ordemmensagens'] = df['ordemmensagens'].astype(int)
+    return df
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def file_stats(df: pd.DataFrame) -> tuple[float, float]:
+    """Tamanho do pickle em MB e tempo de carga em ms."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "messages.pkl")
+        pd.to_pickle(df, path)
+        size = os.path.getsize(path) / 1024 / 1024
+        _, load_ms = timed(pd.read_pickle, path)
+    return size, load_ms
+
+def bench(size: int):
+    records = replay_messages(size)
+    legacy, legacy_prepare_ms = timed(legacy_prepare, records)
+    compact, compact_prepare_ms = timed(conversations.prepare_messages, records)
+
+    _, legacy_read_ms = timed(lambda: pickle.loads(pickle.dumps(legacy)))  # O que o st.cache_data faz a cada leitura
+    store = conversations.ConversationStore()
+    store.merge(compact)
+    _, compact_read_ms = timed(store.snapshot)
+
+    legacy_file, legacy_load_ms = file_stats(legacy)
+    compact_file, compact_load_ms = file_stats(compact)
+    legacy_mb = legacy.memory_usage(deep=True).sum() / 1024 / 1024
+    compact_mb = compact.memory_usage(deep=True).sum() / 1024 / 1024
+
+    for label, mb, prepare_ms, read_ms, file_mb, load_ms in (
+        ("anterior", legacy_mb, legacy_prepare_ms, legacy_read_ms, legacy_file, legacy_load_ms),
+        ("compacto", compact_mb, compact_prepare_ms, compact_read_ms, compact_file, compact_load_ms),
+    ):
+        print(f"{size:>10,} | {label:<8} | {mb:>11.1f} | {prepare_ms:>12.1f} | {read_ms:>12.2f} | {file_mb:>12.1f} | {load_ms:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    args = parser.parse_args()
+
+    tracing.set_exporter(None)
+    print(f"{'mensagens':>10} | {'esquema':<8} | {'memória MB':>11} | {'preparo (ms)':>12} | {'rerun (ms)':>12} | {'arquivo MB':>12} | {'carga (ms)':>10}")
+    for size in args.sizes:
+        bench(size)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,100 @@
+# benchmarks/bench_pinecone_client.py
+"""
+Exercita o PineconeAssistantClient contra o servidor local (pinecone_standin) em
+cenários de serviço saudável, instável, fora do ar e lento, comparando com a
+chamada anterior (`requests.post` avulso, timeout único de 60s). O comportamento em si
+(retries, Retry-After, timeouts, circuit breaker) é verificado em tests/test_pinecone_client.py.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_pinecone_client.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from pinecone_client import CircuitOpenError, PineconeAssistantClient
+from pinecone_standin import PineconeStandIn
+
+BODY = {"messages": [{"role": "user", "content": "Qual a carga horária de Cardiologia?"}], "stream": False, "model": "gpt-4o"}
+
+def bare_post(url: str) -> bool:
+    """Chamada como era feita antes: nova conexão a cada pergunta e sem novas tentativas."""
+    try:
+        response = requests.post(url, headers={"Api-Key": "chave-falsa"}, json=BODY, timeout=60)
+        response.raise_for_status()
+        return True
+    except requests.exceptions.RequestException:
+        return False
+
+def client_post(client: PineconeAssistantClient) -> bool:
+    try:
+        client.chat(BODY["messages"][0]["content"]).json()
+        return True
+    except requests.exceptions.RequestException:
+        return False
+
+def make_client(url: str, **overrides) -> PineconeAssistantClient:
+    options = dict(connect_timeout=1, read_timeout=2, max_retries=3, backoff_base=0.01, backoff_cap=0.05, breaker_threshold=5, breaker_cooldown=0.5)
+    options.update(overrides)
+    return PineconeAssistantClient(url, "chave-falsa", **options)
+
+def report(name: str, ok: int, total: int, elapsed: float, server: PineconeStandIn, extra: str = ""):
+    print(f"{name:<32} | sucesso {ok:>3}/{total:<3} | {elapsed * 1000:>8.0f} ms | requisições {server.requests:>4} | conexões {len(server.connections):>3} {extra}")
+
+def scenario(name: str, calls: int, standin_options: dict, client_options: dict | None = None):
+    print(f"-- {name}")
+    with PineconeStandIn(**standin_options) as server:
+        start = time.perf_counter()
+        ok = sum(bare_post(server.url) for _ in range(calls))
+        report("requests.post avulso", ok, calls, time.perf_counter() - start, server)
+
+    with PineconeStandIn(**standin_options) as server:
+        client = make_client(server.url, **(client_options or {}))
+        start = time.perf_counter()
+        ok = sum(client_post(client) for _ in range(calls))
+        stats = client.stats()
+        report("PineconeAssistantClient", ok, calls, time.perf_counter() - start, server,
+               f"| retries {stats['retries']} | breaker {stats['breaker']} | p50 {stats['p50']}s p95 {stats['p95']}s")
+
+def main():
+    scenario("Saudável (reuso de conexão)", 50, {"latency": 0.005})
+    scenario("Instável (30% de 503)", 50, {"latency": 0.005, "failure_rate": 0.3})
+    scenario("Rate limit (429 nas 2 primeiras)", 5, {"fail_next": [429, 429]})
+    scenario("Fora do ar (100% de 503)", 20, {"failure_rate": 1.0})
+
+    print("-- Lento (resposta em 3s, read timeout de 1s no cliente)")
+    with PineconeStandIn(latency=3) as server:
+        client = make_client(server.url, read_timeout=1, max_retries=0)
+        start = time.perf_counter()
+        ok = client_post(client)
+        report("PineconeAssistantClient", int(ok), 1, time.perf_counter() - start, server)
+
+    print("-- Circuit breaker aberto")
+    with PineconeStandIn(failure_rate=1.0) as server:
+        client = make_client(server.url, max_retries=0, breaker_threshold=3, breaker_cooldown=60)
+        for _ in range(3):
+            client_post(client)
+        try:
+            client.chat("pergunta")
+            sys.exit("circuit breaker não abriu")
+        except CircuitOpenError:
+            print(f"chamada recusada sem tocar o servidor (requisições no servidor: {server.requests})")
+
+    print("-- Streaming (SSE)")
+    with PineconeStandIn(token_delay=0.01) as server:
+        client = make_client(server.url)
+        start = time.perf_counter()
+        first_token = None
+        with client.chat("pergunta", stream=True) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line and '"content_chunk"' in line and first_token is None:
+                    first_token = time.perf_counter() - start
+        print(f"primeiro token em {first_token * 1000:.0f} ms, resposta completa em {(time.perf_counter() - start) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_rag_cache_similarity.py
+"""
+Mede a camada de similaridade do cache de respostas do RAG contra pares de perguntas
+rotulados (benchmarks/data/rag_cache_pairs.json: `same` diz se a resposta de uma serve
+para a outra). Para cada limiar, mostra a taxa de falsos positivos (pares diferentes
+que reaproveitariam a resposta) e a cobertura (pares iguais reaproveitados), só com o
+limiar e com a exigência de mesmos números e negações do RagAnswerCache.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_rag_cache_similarity.py
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import services
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "rag_cache_pairs.json")
+
+def load_pairs(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def cache_matches(pair: dict, threshold: float) -> bool:
+    """Se a segunda pergunta reaproveita a resposta guardada para a primeira."""
+    cache = services.RagAnswerCache(max_entries=8, ttl_seconds=60, similarity_threshold=threshold)
+    cache.put(pair["a"], ["Cardiologia"], "conteúdo", "[]", "resposta")
+    return cache.get(pair["b"], ["Cardiologia"]) is not None
+
+def threshold_matches(pair: dict, threshold: float) -> bool:
+    a, b = services.normalize_question(pair["a"]), services.normalize_question(pair["b"])
+    return services._cosine(services._embed_question(a), services._embed_question(b)) >= threshold
+
+def rates(pairs: list, matches) -> tuple:
+    negatives = [p for p in pairs if not p["same"]]
+    positives = [p for p in pairs if p["same"]]
+    false_positives = sum(1 for p in negatives if matches(p))
+    true_positives = sum(1 for p in positives if matches(p))
+    return false_positives / len(negatives), true_positives / len(positives)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.85, 0.9, config.RAG_CACHE_SIMILARITY_THRESHOLD, 0.95])
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.dataset)
+    negatives = sum(1 for p in pairs if not p["same"])
+    print(f"{len(pairs)} pares ({negatives} diferentes, {len(pairs) - negatives} iguais)")
+    print(f"{'limiar':>7} | {'FP só limiar':>13} | {'cobertura':>9} | {'FP com proteção':>15} | {'cobertura':>9}")
+    for threshold in sorted(set(args.thresholds)):
+        fp_plain, tp_plain = rates(pairs, lambda p: threshold_matches(p, threshold))
+        fp_guard, tp_guard = rates(pairs, lambda p: cache_matches(p, threshold))
+        marker = " *" if threshold == config.RAG_CACHE_SIMILARITY_THRESHOLD else ""
+        print(f"{threshold:>7.2f} | {fp_plain:>13.0%} | {tp_plain:>9.0%} | {fp_guard:>15.0%} | {tp_guard:>9.0%}{marker}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/bench_realtime_ingestion.py
+"""
+Mensagens novas chegando por push (realtime_feed.MessageFeed com o LocalChangeSource)
+contra a sincronização por consulta ao banco (ConversationStore.sync a cada
+CONVERSATIONS_SYNC_INTERVAL_SECONDS) e contra a recarga completa que o
+st.cache_data(ttl=300) fazia antes.
+
+`--messages` mensagens novas são publicadas a `--rate` por segundo, em conversas já
+existentes numa store com `--size` mensagens (FakeSupabase, sem rede). Para o push
+são medidos o atraso entre a publicação e a mensagem estar na store (pronta para o
+próximo ciclo do st.fragment da página), o custo de cada lote e as consultas ao banco.
+Para a consulta periódica, o atraso esperado é metade do intervalo mais o custo
+medido de uma sincronização.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_realtime_ingestion.py --size 100000 --messages 300 --rate 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import conversations
+import realtime_feed
+import tracing
+from fixtures import replay_messages
+from stubs import FakeSupabase
+
+class TimedFeed(realtime_feed.MessageFeed):
+    """MessageFeed que guarda a duração de cada lote."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flush_ms = []
+
+    def flush(self) -> int:
+        start = time.perf_counter()
+        applied = super().flush()
+        self.flush_ms.append((time.perf_counter() - start) * 1000)
+        return applied
+
+def new_messages(rows: list, count: int, seed: int = 7) -> list:
+    """Mensagens novas em conversas já existentes (continuação da ordem de cada ticket)."""
+    rng = random.Random(seed)
+    last_order = {}
+    for row in rows:
+        last_order[row["ticket_id"]] = max(last_order.get(row["ticket_id"], 0), row["ordemmensagens"])
+    tickets = rng.sample(sorted(last_order), min(len(last_order), max(1, count // 10)))
+    start = datetime.fromisoformat(rows[-1]["data_hora"]) + timedelta(seconds=1)
+    templates = {row["ticket_id"]: row for row in rows}
+    messages = []
+    for i in range(count):
+        ticket_id = rng.choice(tickets)
+        last_order[ticket_id] += 1
+        messages.append(dict(
+            templates[ticket_id],
+            message_id=f"wamid.PUSH{i:06d}",
+            mensagem=f"Mensagem nova {i}",
+            ordemmensagens=last_order[ticket_id],
+            data_hora=(start + timedelta(seconds=i)).isoformat(),
+        ))
+    return messages
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def full_reload(conn):
+    """O que o st.cache_data(ttl=300) fazia ao expirar: tudo do banco, preparo, resumo e índice."""
+    messages = conversations.prepare_messages(conversations.fetch_messages(conn))
+    conversations.build_ticket_summary(messages)
+    conversations.ConversationSearchIndex().update_tickets(messages)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000, help="mensagens já na store")
+    parser.add_argument("--messages", type=int, default=300, help="mensagens novas publicadas")
+    parser.add_argument("--rate", type=float, default=50.0, help="mensagens novas por segundo")
+    parser.add_argument("--batch", type=float, default=config.REALTIME_BATCH_SECONDS, help="janela de lote do push (s)")
+    args = parser.parse_args()
+
+    tracing.set_exporter(None)
+    rows = replay_messages(args.size)
+    pushed = new_messages(rows, args.messages)
+
+    # --- CONSULTA PERIÓDICA (e a recarga completa de antes) ---
+    conn = FakeSupabase(rows)
+    store = conversations.ConversationStore()
+    store.sync(conn)
+    _, reload_ms = timed(full_reload, conn)
+    conn.insert(pushed)
+    calls_before, transferred_before = conn.calls, conn.rows_transferred
+    _, poll_ms = timed(store.sync, conn)
+    poll_calls, poll_rows = conn.calls - calls_before, conn.rows_transferred - transferred_before
+
+    # --- PUSH ---
+    conn = FakeSupabase(rows)
+    store = conversations.ConversationStore()
+    store.sync(conn)
+    source = realtime_feed.LocalChangeSource()
+    published = {}
+    latencies = []
+
+    def on_change(ticket_ids):
+        now = time.perf_counter()
+        for ticket_id in ticket_ids:
+            for published_at in published.pop(ticket_id, []):
+                latencies.append((now - published_at) * 1000)
+
+    feed = TimedFeed(store, conn, source, batch_seconds=args.batch, save_interval=config.REALTIME_SAVE_INTERVAL_SECONDS, on_change=on_change)
+    feed.start()
+    time.sleep(args.batch * 2)  # Sincronização de reconexão antes das mensagens
+    conn.insert(pushed)  # No banco desde já: o push não deve precisar dele
+    calls_before, transferred_before = conn.calls, conn.rows_transferred
+    flushes_before = len(feed.flush_ms)
+    for record in pushed:
+        published.setdefault(record["ticket_id"], []).append(time.perf_counter())
+        source.publish(record)
+        time.sleep(1 / args.rate)
+    while published and feed._thread.is_alive():
+        time.sleep(0.05)
+    feed.stop()
+    push_calls, push_rows = conn.calls - calls_before, conn.rows_transferred - transferred_before
+    batch_ms = feed.flush_ms[flushes_before:]
+    assert store.summary["mensagens"].sum() == args.size + args.messages
+
+    interval = config.CONVERSATIONS_SYNC_INTERVAL_SECONDS
+    print(f"store com {args.size:,} mensagens; {args.messages} mensagens novas a {args.rate:.0f}/s")
+    print(f"{'modo':<34} | {'atraso médio (ms)':>17} | {'atraso p95 (ms)':>15} | {'custo (ms)':>10} | {'consultas/min':>13} | {'linhas lidas':>12}")
+    print(f"{'recarga completa (ttl 300 s)':<34} | {150_000 + reload_ms:>17,.0f} | {300_000 + reload_ms:>15,.0f} | {reload_ms:>10.1f} | {60 / 300:>13.1f} | {args.size + args.messages:>12,}")
+    print(f"{f'sincronização a cada {interval} s':<34} | {interval * 500 + poll_ms:>17,.0f} | {interval * 950 + poll_ms:>15,.0f} | {poll_ms:>10.1f} | {poll_calls * 60 / interval:>13.1f} | {poll_rows:>12,}")
+    print(
+        f"{f'push (lotes de {args.batch:g} s)':<34} | {statistics.mean(latencies):>17,.0f} | {tracing.percentile(latencies, 0.95):>15,.0f}"
+        f" | {statistics.median(batch_ms):>10.1f} | {push_calls * 60 / (args.messages / args.rate):>13.1f} | {push_rows:>12,}"
+    )
+    print(f"push: {len(batch_ms)} lotes, {len(latencies)} mensagens medidas; custo = mediana por lote")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,57 @@
+# benchmarks/bench_search_index.py
+"""
+Compara a busca anterior da página de conversas (varredura com `str.contains` em
+todas as mensagens a cada rerun) com o índice invertido (search_index).
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_search_index.py --messages 200000 --queries caro parcelar "ana sil"
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conversations
+from search_index import ConversationSearchIndex
+from synthetic import make_messages
+
+def scan(messages, search_term: str) -> set:
+    """Busca anterior: nome do cliente começando com o termo ou alguma mensagem contendo o termo."""
+    term = search_term.lower().strip()
+    identity_match = messages['user_identity'].str.lower().str.strip().str.startswith(term)
+    message_match = messages['mensagem'].str.lower().str.contains(term, na=False, regex=False)
+    return set(messages.loc[identity_match | message_match, 'ticket_id'])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--queries", nargs="+", default=["caro", "parcelar", "certificado mec", "ana sil"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    messages = conversations.prepare_messages(make_messages(args.messages))
+
+    index = ConversationSearchIndex()
+    start = time.perf_counter()
+    index.update_tickets(messages)
+    print(f"mensagens: {len(messages):,} | tickets: {len(index):,} | construção do índice: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"{'busca':<20} | {'varredura (ms)':>14} | {'índice (ms)':>11} | {'tickets (varredura/índice)':>26}")
+    for query in args.queries:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            scanned = scan(messages, query)
+        scan_time = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            indexed = index.search(query)
+        index_time = (time.perf_counter() - start) / args.repeat
+
+        print(f"{query:<20} | {scan_time * 1000:>14.2f} | {index_time * 1000:>11.2f} | {len(scanned):>12,} / {len(indexed):<12,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_specialty_classifier.py
+"""
+Benchmark offline do classificador local de especialidades contra um conjunto de
+perguntas rotuladas. Mede a cobertura (perguntas resolvidas sem LLM), a acurácia
+nas perguntas resolvidas e a latência por pergunta.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_specialty_classifier.py
+    python benchmarks/bench_specialty_classifier.py --save-model   # treina e salva o modelo opcional
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import specialty_classifier as sc
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "specialty_questions.json")
+
+def load_dataset(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def train_model(rows: list) -> sc.NaiveBayesSpecialtyModel:
+    """Treina o Naive Bayes com as perguntas que têm exatamente uma especialidade."""
+    single = [r for r in rows if len(r["specialties"]) == 1]
+    return sc.NaiveBayesSpecialtyModel().fit([r["question"] for r in single], [r["specialties"][0] for r in single])
+
+def run(classifier: sc.SpecialtyClassifier, rows: list) -> list:
+    """Classifica cada pergunta, devolvendo (previsto, esperado, latência em µs)."""
+    records = []
+    for row in rows:
+        start = time.perf_counter()
+        predicted = classifier.classify(row["question"])
+        records.append((predicted, row["specialties"], (time.perf_counter() - start) * 1e6))
+    return records
+
+def summarize(records: list) -> dict:
+    resolved = [(p, e) for p, e, _ in records if p is not None]
+    correct = sum(1 for p, e in resolved if sorted(p) == sorted(e))
+    latencies = sorted(latency for _, _, latency in records)
+    return {
+        "perguntas": len(records),
+        "resolvidas_localmente": len(resolved),
+        "cobertura": len(resolved) / len(records) if records else 0.0,
+        "acuracia_resolvidas": correct / len(resolved) if resolved else 0.0,
+        "latencia_p50_us": round(statistics.median(latencies), 1) if latencies else 0.0,
+        "latencia_p95_us": round(latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else 0.0,
+    }
+
+def run_with_model(rows: list, folds: int = 5) -> list:
+    """Validação cruzada em `folds` partes: o modelo nunca vê as perguntas em que é avaliado."""
+    index = sc.KeywordSpecialtyIndex(config.ALLOWED_SPECIALTIES, config.SPECIALTY_ALIASES)
+    records = []
+    for fold in range(folds):
+        test = rows[fold::folds]
+        train = [r for i, r in enumerate(rows) if i % folds != fold]
+        classifier = sc.SpecialtyClassifier(index, model=train_model(train), min_model_confidence=config.SPECIALTY_MODEL_MIN_CONFIDENCE)
+        records += run(classifier, test)
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--save-model", action="store_true", help=f"treina com todo o conjunto e salva em {config.SPECIALTY_MODEL_PATH}")
+    args = parser.parse_args()
+
+    rows = load_dataset(args.dataset)
+    keyword_only = sc.SpecialtyClassifier(sc.KeywordSpecialtyIndex(config.ALLOWED_SPECIALTIES, config.SPECIALTY_ALIASES))
+
+    print("== Apenas palavras-chave ==")
+    print(json.dumps(summarize(run(keyword_only, rows)), indent=2, ensure_ascii=False))
+    print("== Palavras-chave + Naive Bayes (validação cruzada) ==")
+    print(json.dumps(summarize(run_with_model(rows)), indent=2, ensure_ascii=False))
+
+    if args.save_model:
+        train_model(rows).save(config.SPECIALTY_MODEL_PATH)
+        print(f"Modelo salvo em {config.SPECIALTY_MODEL_PATH}")
+
+if __name__ == "__main__":
+    main()
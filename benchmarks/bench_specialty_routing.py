@@ -0,0 +1,162 @@
+# benchmarks/bench_specialty_routing.py
+"""
+Compara a busca global (o caminho anterior) com a busca roteada por especialidade
+(services.retrieval_routes) no pipeline RAG completo, para as perguntas rotuladas de
+data/specialty_questions.json.
+
+O PineconeStandIn responde a partir de uma base sintética: um documento por
+especialidade e assunto (valores, certificado, duração...), cada um com `--chunks`
+trechos e o metadado `especialidade`. A busca respeita o `filter` da requisição,
+ranqueia os documentos por palavras em comum com a pergunta e cita os `--top-k`
+melhores; sem nenhum documento no filtro, responde como o assistente real ("não
+encontrei...") e sem citações. Classificador e coach são o FakeOpenAI, com as respostas
+gravadas.
+
+As latências NÃO são medidas contra o Pinecone: o custo da busca é um modelo (linear nos
+trechos examinados, `--scan-us` por trecho, mais `--answer-ms` de geração), então a
+diferença de latência entre os modos reflete esse modelo. Trechos examinados, requisições
+e relevância das citações não dependem dele.
+
+O modo "roteada, sem metadado" simula os arquivos sem o metadado `especialidade`: o
+filtro não acha nada e cada pergunta roteada cai na busca global.
+
+Métricas por modo: latência do pipeline e da busca (mediana e p95), trechos
+examinados, requisições ao assistente e relevância das citações (fração dos
+documentos citados que são de uma especialidade da pergunta).
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_specialty_routing.py --chunks 50 --scan-us 20 --answer-ms 300
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import pinecone_client
+import services
+import tracing
+from fixtures import OPENAI_FILE, load_recorded
+from pinecone_standin import PineconeStandIn
+from stubs import FakeOpenAI, offline
+from text_utils import fold_text
+
+QUESTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "specialty_questions.json")
+TOPICS = {
+    "valores": "preço valor investimento parcelas parcelar cartão desconto à vista mensalidade",
+    "certificado": "certificado reconhecido mec diploma título",
+    "duracao": "carga horária duração quanto tempo meses horas",
+    "grade": "grade módulos disciplinas conteúdo programático temas",
+    "aulas": "aulas presenciais online ao vivo gravadas práticas",
+    "matricula": "matrícula inscrição início turma vagas",
+    "docentes": "professores corpo docente coordenação preceptores",
+    "requisitos": "requisitos residência crm formação pré-requisito",
+}
+
+def build_corpus(chunks: int) -> list:
+    corpus = []
+    for specialty in config.ALLOWED_SPECIALTIES:
+        names = " ".join([specialty, *config.SPECIALTY_ALIASES.get(specialty, [])])
+        for topic, words in TOPICS.items():
+            text = f"{specialty}: {words}."
+            corpus.append({
+                "name": f"{fold_text(specialty).replace(' ', '_')}_{topic}.pdf",
+                "specialty": specialty,
+                "text": text,
+                "words": set(fold_text(f"{names} {words}").split()),
+                "chunks": chunks,
+            })
+    return corpus
+
+def corpus_responder(corpus: list, scanned: list, scan_us: float, answer_ms: float, top_k: int, state: dict):
+    """
+    `responder` do PineconeStandIn: busca lexical na base sintética, respeitando o filtro por
+    especialidade (com `state["metadata"]` falso, os arquivos não têm o metadado).
+    """
+    field = config.PINECONE_SPECIALTY_METADATA_FIELD
+
+    def respond(payload: dict):
+        question = payload["messages"][-1]["content"]
+        allowed = ((payload.get("filter") or {}).get(field) or {}).get("$in")
+        candidates = [doc for doc in corpus if allowed is None or (state["metadata"] and doc["specialty"] in allowed)]
+        chunks = sum(doc["chunks"] for doc in candidates)
+        scanned.append(chunks)
+        time.sleep(chunks * scan_us / 1e6 + answer_ms / 1000)
+
+        words = set(fold_text(question).split())
+        ranked = sorted(candidates, key=lambda doc: len(words & doc["words"]), reverse=True)[:top_k]
+        if not ranked:
+            return "Não encontrei informações sobre isso nos documentos disponíveis.", []
+        citations = [
+            {"position": 0, "references": [{"file": {"name": doc["name"], "metadata": {field: doc["specialty"]}}, "pages": [1]}]}
+            for doc in ranked
+        ]
+        return " ".join(doc["text"] for doc in ranked), citations
+    return respond
+
+def cited_specialties(citations: str) -> list:
+    field = config.PINECONE_SPECIALTY_METADATA_FIELD
+    return [
+        reference["file"]["metadata"].get(field)
+        for citation in json.loads(citations)
+        for reference in citation.get("references", [])
+    ]
+
+def run_mode(questions: list, routing: bool, standin: PineconeStandIn, scanned: list) -> dict:
+    config.PINECONE_SPECIALTY_ROUTING = routing
+    services.get_rag_cache.clear()
+    requests_before, scanned_before = standin.requests, len(scanned)
+    totals, searches, precision = [], [], []
+    for item in questions:
+        result = services.run_rag_pipeline(item["question"], config.CLASSIFIER_SYSTEM_PROMPT, config.SALES_COACH_SYSTEM_PROMPT)
+        totals.append(result["timings"]["total"] * 1000)
+        searches.append(result["timings"]["busca_rag"] * 1000)
+        cited = cited_specialties(result["citations"])
+        if item["specialties"] and cited:
+            precision.append(sum(specialty in item["specialties"] for specialty in cited) / len(cited))
+    return {
+        "total_p50": statistics.median(totals),
+        "total_p95": tracing.percentile(totals, 0.95),
+        "busca_p50": statistics.median(searches),
+        "busca_p95": tracing.percentile(searches, 0.95),
+        "trechos": sum(scanned[scanned_before:]) / len(questions),
+        "requisicoes": standin.requests - requests_before,
+        "relevancia": statistics.mean(precision),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50, help="trechos por documento da base sintética")
+    parser.add_argument("--scan-us", type=float, default=20.0, help="custo modelado por trecho examinado (µs)")
+    parser.add_argument("--answer-ms", type=float, default=300.0, help="tempo modelado de geração da resposta do assistente (ms)")
+    parser.add_argument("--top-k", type=int, default=3, help="documentos citados por resposta")
+    args = parser.parse_args()
+
+    tracing.set_exporter(None)
+    questions = json.load(open(QUESTIONS_PATH, encoding="utf-8"))
+    corpus = build_corpus(args.chunks)
+    scanned = []
+    state = {"metadata": True}
+    responder = corpus_responder(corpus, scanned, args.scan_us, args.answer_ms, args.top_k, state)
+
+    with offline(), FakeOpenAI(load_recorded(OPENAI_FILE)), PineconeStandIn(responder=responder) as standin:
+        client = pinecone_client.PineconeAssistantClient(standin.url, "chave-falsa")
+        services.get_pinecone_client = lambda: client
+        print(f"{len(questions)} perguntas, base com {len(corpus)} documentos / {sum(doc['chunks'] for doc in corpus):,} trechos")
+        print("latências pelo modelo de custo (--scan-us, --answer-ms), não medidas contra o Pinecone")
+        print(f"{'busca':<26} | {'total p50':>9} | {'total p95':>9} | {'busca p50':>9} | {'busca p95':>9} | {'trechos/pergunta':>16} | {'requisições':>11} | {'relevância':>10}")
+        for label, routing, metadata in (("global", False, True), ("roteada", True, True), ("roteada, sem metadado", True, False)):
+            state["metadata"] = metadata
+            r = run_mode(questions, routing, standin, scanned)
+            print(
+                f"{label:<26} | {r['total_p50']:>9.1f} | {r['total_p95']:>9.1f} | {r['busca_p50']:>9.1f} | {r['busca_p95']:>9.1f}"
+                f" | {r['trechos']:>16,.0f} | {r['requisicoes']:>11} | {r['relevancia']:>10.0%}"
+            )
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+# benchmarks/bench_ticket_summary.py
+"""
+Compara o custo por rerun da página de conversas: os três laços por grupo do
+código anterior (KPI, filtro e última mensagem) contra as operações de coluna
+sobre o resumo por ticket (conversations.build_ticket_summary).
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_ticket_summary.py --tickets 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+import conversations
+from synthetic import make_messages
+
+def rerun_with_group_loops(messages: pd.DataFrame, search_term: str):
+    """Reprodução da lógica anterior da página, sem os widgets."""
+    groups = messages.groupby('ticket_id')
+    negotiating = sum(1 for _, group in groups if group['em_negociacao'].any())
+    filtered = []
+    for ticket_id, group in groups:
+        if not group['em_negociacao'].any():
+            continue
+        if search_term and not (group['user_identity'].iloc[0].lower().strip().startswith(search_term) or group['mensagem'].str.lower().str.contains(search_term, na=False).any()):
+            continue
+        filtered.append((ticket_id, group))
+    rows = [group.sort_values('ordemmensagens', ascending=False).iloc[0] for _, group in filtered]
+    return negotiating, len(rows)
+
+def rerun_with_summary(summary: pd.DataFrame, matching_ticket_ids: set):
+    negotiating = int(summary['em_negociacao'].sum())
+    mask = summary['em_negociacao'] & summary.index.isin(list(matching_ticket_ids))
+    return negotiating, len(summary[mask])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=50_000)
+    parser.add_argument("--messages-per-ticket", type=int, default=10)
+    parser.add_argument("--search", default="caro")
+    args = parser.parse_args()
+
+    messages = conversations.prepare_messages(make_messages(args.tickets * args.messages_per_ticket, messages_per_ticket=args.messages_per_ticket))
+
+    start = time.perf_counter()
+    rerun_with_group_loops(messages, args.search)
+    loops_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary = conversations.build_ticket_summary(messages)
+    build_time = time.perf_counter() - start
+
+    # A busca vem do banco; aqui o conjunto de tickets é simulado com o mesmo critério
+    matching = set(messages.loc[messages['mensagem'].str.lower().str.contains(args.search, na=False), 'ticket_id'])
+    start = time.perf_counter()
+    rerun_with_summary(summary, matching)
+    summary_time = time.perf_counter() - start
+
+    print(f"tickets: {summary.shape[0]:,} | mensagens: {len(messages):,}")
+    print(f"laços por grupo (por rerun):       {loops_time * 1000:10.1f} ms")
+    print(f"resumo por ticket (uma vez/sync):  {build_time * 1000:10.1f} ms")
+    print(f"operações de coluna (por rerun):   {summary_time * 1000:10.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/fixtures.py
+"""
+Respostas gravadas dos serviços externos (benchmarks/data/recorded) e a reprodução do
+payload gravado do RPC `get_messages_data` em escala. Os arquivos são gerados por
+record_fixtures.py (dados de clientes anonimizados).
+"""
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import config
+from synthetic import FIRST_NAMES, LAST_NAMES
+
+RECORDED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recorded")
+MESSAGES_FILE = "get_messages_data.json"
+OPENAI_FILE = "openai_responses.json"
+PINECONE_FILE = "pinecone_responses.json"
+
+def load_recorded(name: str):
+    with open(os.path.join(RECORDED_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+def replay_messages(n_messages: int, seed: int = 42, start: datetime | None = None, ticket_prefix: str = "R") -> list:
+    """
+    Reproduz as conversas gravadas até `n_messages` linhas. Cada cópia de uma conversa
+    vira um ticket novo (cliente e curso sorteados), mantendo o texto, a ordem e o
+    intervalo entre as mensagens; os tickets começam a cada 30 segundos, então as
+    conversas se intercalam como no banco. Linhas em ordem de `data_hora`.
+    """
+    rng = random.Random(seed)
+    start = start or datetime(2025, 1, 1, tzinfo=timezone.utc)
+    recorded = {}
+    for row in load_recorded(MESSAGES_FILE):
+        recorded.setdefault(row["ticket_id"], []).append(row)
+    templates = []
+    for rows in recorded.values():
+        rows = sorted(rows, key=lambda row: row["ordemmensagens"])
+        first = datetime.fromisoformat(rows[0]["data_hora"])
+        templates.append([(datetime.fromisoformat(row["data_hora"]) - first, row) for row in rows])
+
+    rows = []
+    copy = 0
+    while len(rows) < n_messages:
+        template = rng.choice(templates)
+        ticket_start = start + timedelta(seconds=30 * copy)
+        identity = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        extra_tags = template[0][1]["tags"].split(",")[1:]
+        tags = ",".join([rng.choice(config.ALLOWED_SPECIALTIES), *extra_tags])
+        for offset, row in template[:n_messages - len(rows)]:
+            rows.append(dict(
+                row,
+                ticket_id=f"{ticket_prefix}{copy:07d}",
+                tags=tags,
+                user_identity=identity,
+                message_id=f"{row['message_id']}.{copy}",
+                data_hora=(ticket_start + offset).isoformat(),
+            ))
+        copy += 1
+    rows.sort(key=lambda row: (row["data_hora"], row["message_id"]))
+    return rows
+
+def pinecone_responder(records: list, latency_scale: float = 0.0):
+    """
+    `responder` do PineconeStandIn a partir das respostas gravadas: usa a gravação da
+    mesma pergunta, ou uma escolhida pelo hash da pergunta (determinística).
+    `latency_scale` > 0 reproduz a latência gravada.
+    """
+    by_question = {record["question"]: record for record in records}
+
+    def respond(payload: dict):
+        question = payload["messages"][-1]["content"]
+        record = by_question.get(question) or records[sum(question.encode("utf-8")) % len(records)]
+        if latency_scale:
+            time.sleep(record["latency_ms"] / 1000 * latency_scale)
+        response = record["response"]
+        return response["message"]["content"], response["citations"], response.get("usage")
+    return respond
\ No newline at end of file
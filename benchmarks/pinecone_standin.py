@@ -0,0 +1,140 @@
+# benchmarks/pinecone_standin.py
+"""
+Servidor HTTP local que imita o endpoint de chat do assistente do Pinecone
+(`POST /assistant/chat/<assistente>`), com latência e falhas configuráveis.
+Responde JSON (`"stream": false`) ou eventos SSE (`"stream": true`).
+"""
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = "O curso de Cardiologia tem 360 horas e certificado reconhecido pelo MEC."
+DEFAULT_CITATIONS = [{"position": 10, "references": [{"file": {"name": "cardiologia.pdf", "metadata": {"especialidade": "Cardiologia"}}, "pages": [2]}]}]
+
+class PineconeStandIn:
+    """
+    Uso:
+        with PineconeStandIn(latency=0.05, failure_rate=0.3) as server:
+            client = PineconeAssistantClient(server.url, "chave-falsa")
+
+    - `latency`: segundos antes de responder (simula lentidão; acima do read timeout gera timeout no cliente)
+    - `failure_rate`: fração das requisições respondidas com `failure_status`
+    - `fail_next`: lista de status a devolver nas próximas requisições, em ordem
+    - `retry_after`: valor do header Retry-After nas respostas de falha (None = sem o header)
+    - `truncate_next`: quantas das próximas respostas de sucesso são cortadas no meio do corpo
+    - `responder`: função opcional (corpo da requisição) -> (resposta, citações) ou (resposta, citações, uso
+      de tokens), para respostas por pergunta
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, failure_status: int = 503,
+                 fail_next: list | None = None, responder=None, token_delay: float = 0.0, seed: int = 0,
+                 retry_after: float | None = None, truncate_next: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.fail_next = list(fail_next or [])
+        self.retry_after = retry_after
+        self.truncate_next = truncate_next
+        self.responder = responder
+        self.token_delay = token_delay
+        self.requests = 0
+        self.requests_by_path = {}
+        self.connections = set()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/assistant/chat/ia-assistant"
+
+    def _next_failure(self) -> int | None:
+        with self._lock:
+            self.requests += 1
+            if self.fail_next:
+                return self.fail_next.pop(0)
+            if self._random.random() < self.failure_rate:
+                return self.failure_status
+        return None
+
+    def _truncate(self) -> bool:
+        with self._lock:
+            if self.truncate_next:
+                self.truncate_next -= 1
+                return True
+        return False
+
+    def __enter__(self) -> "PineconeStandIn":
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Mantém a conexão aberta (keep-alive)
+
+            def setup(self):
+                super().setup()
+                # Sem Nagle: evita o atraso artificial de ~40ms entre headers e corpo no keep-alive
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if status >= 400 and standin.retry_after is not None:
+                    self.send_header("Retry-After", str(standin.retry_after))
+                self.end_headers()
+                if status < 400 and standin._truncate():
+                    # Metade do corpo prometido e a conexão fecha: o cliente vê a resposta incompleta
+                    self.wfile.write(body[:len(body) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def do_POST(self):
+                with standin._lock:
+                    standin.connections.add(self.client_address)
+                    standin.requests_by_path[self.path] = standin.requests_by_path.get(self.path, 0) + 1
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                failure = standin._next_failure()
+                time.sleep(standin.latency)
+                if failure is not None:
+                    self._send(failure, json.dumps({"error": {"code": failure}}).encode())
+                    return
+
+                answer, citations, *usage = standin.responder(payload) if standin.responder else (DEFAULT_ANSWER, DEFAULT_CITATIONS)
+                usage = usage[0] if usage else None
+                if not payload.get("stream"):
+                    body = {"message": {"role": "assistant", "content": answer}, "citations": citations, "usage": usage}
+                    self._send(200, json.dumps(body, ensure_ascii=False).encode("utf-8"))
+                    return
+
+                events = [{"type": "message_start", "role": "assistant"}]
+                events += [{"type": "content_chunk", "delta": {"content": word + " "}} for word in answer.split()]
+                events += [{"type": "citation", "citation": c} for c in citations]
+                events += [{"type": "message_end", "finish_reason": "stop", "usage": usage}]
+                chunks = [f"data:{json.dumps(e, ensure_ascii=False)}\n\n".encode("utf-8") for e in events]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Content-Length", str(sum(len(c) for c in chunks)))
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+                    time.sleep(standin.token_delay)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
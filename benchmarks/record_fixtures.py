@@ -0,0 +1,154 @@
+# benchmarks/record_fixtures.py
+"""
+Grava as respostas reais usadas pela suíte de benchmarks (benchmarks/data/recorded):
+uma amostra do RPC `get_messages_data` (com nomes e números de telefone anonimizados),
+uma resposta de cada tipo da OpenAI (classificador, coach, insight e resumo de conversa) e as
+respostas do assistente do Pinecone para algumas perguntas de referência, com as
+latências observadas. Precisa de rede e das credenciais (variáveis de ambiente ou
+.streamlit/secrets.toml); a suíte em si roda sem nada disso.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/record_fixtures.py --tickets 6 --questions 3
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openai
+from supabase import create_client
+
+import config
+import conversations
+import insights as insights_lib
+import pinecone_client
+from batch_insights import load_secret
+from fixtures import MESSAGES_FILE, OPENAI_FILE, PINECONE_FILE, RECORDED_DIR
+from synthetic import FIRST_NAMES, LAST_NAMES
+
+QUESTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "specialty_questions.json")
+
+def anonymize(rows: list) -> list:
+    """Troca o nome de cada cliente por um nome fictício e mascara sequências longas de dígitos."""
+    names = {}
+    for row in rows:
+        identity = row.get("user_identity")
+        if identity not in names:
+            n = len(names)
+            names[identity] = f"{FIRST_NAMES[n % len(FIRST_NAMES)]} {LAST_NAMES[n // len(FIRST_NAMES) % len(LAST_NAMES)]}"
+        row["user_identity"] = names[identity]
+        row["mensagem"] = re.sub(r"\d{6,}", lambda m: "0" * len(m.group()), row.get("mensagem") or "")
+    return rows
+
+def timed_completion(**kwargs) -> dict:
+    """Chamada real à OpenAI com latência total e (em streaming) tempo até o primeiro token."""
+    start = time.perf_counter()
+    response = openai.chat.completions.create(**kwargs)
+    latency_ms = (time.perf_counter() - start) * 1000
+    record = {"latency_ms": round(latency_ms), "ttft_ms": None, "response": response.model_dump()}
+    # Uma segunda chamada em streaming mede o TTFT do mesmo prompt
+    start = time.perf_counter()
+    for chunk in openai.chat.completions.create(**kwargs, stream=True):
+        if chunk.choices and chunk.choices[0].delta.content:
+            record["ttft_ms"] = round((time.perf_counter() - start) * 1000)
+            break
+    return record
+
+def record_messages(conn, tickets: int) -> list:
+    records = conversations.fetch_messages(conn)
+    summary = conversations.build_ticket_summary(conversations.prepare_messages(records))
+    # Conversas mais longas primeiro: representam melhor a carga real
+    ticket_ids = set(summary.sort_values("mensagens", ascending=False).index[:tickets])
+    return anonymize([row for row in records if row["ticket_id"] in ticket_ids])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=6, help="conversas gravadas do RPC")
+    parser.add_argument("--questions", type=int, default=3, help="perguntas gravadas do assistente do Pinecone")
+    args = parser.parse_args()
+
+    openai.api_key = load_secret("OPENAI_API_KEY")
+    conn = create_client(load_secret("supabase_url", "SUPABASE_URL"), load_secret("supabase_key", "SUPABASE_KEY"))
+    client = pinecone_client.PineconeAssistantClient(
+        url=load_secret("PINECONE_ASSISTANT_URL") or config.PINECONE_ASSISTANT_URL,
+        api_key=load_secret("PINECONE_API_KEY"),
+    )
+    os.makedirs(RECORDED_DIR, exist_ok=True)
+
+    rows = record_messages(conn, args.tickets)
+    with open(os.path.join(RECORDED_DIR, MESSAGES_FILE), "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+    print(f"{len(rows)} mensagens gravadas")
+
+    with open(QUESTIONS_PATH, encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)][:args.questions]
+
+    pinecone_records = []
+    for question in questions:
+        start = time.perf_counter()
+        data = client.chat(question).json()
+        latency_ms = (time.perf_counter() - start) * 1000
+        with client.chat(question, stream=True) as response:
+            start = time.perf_counter()
+            ttft_ms = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line and '"content_chunk"' in line:
+                    ttft_ms = round((time.perf_counter() - start) * 1000)
+                    break
+        pinecone_records.append({"question": question, "latency_ms": round(latency_ms), "ttft_ms": ttft_ms, "response": data})
+    with open(os.path.join(RECORDED_DIR, PINECONE_FILE), "w", encoding="utf-8") as f:
+        json.dump(pinecone_records, f, ensure_ascii=False, indent=2)
+    print(f"{len(pinecone_records)} respostas do Pinecone gravadas")
+
+    first = pinecone_records[0]
+    coach_prompt = config.SALES_COACH_SYSTEM_PROMPT.format(
+        specialties="Cardiologia",
+        user_query=first["question"],
+        rag_content=first["response"]["message"]["content"],
+        citations=json.dumps(first["response"].get("citations", []), indent=2, ensure_ascii=False),
+    )
+    ticket_df = conversations.prepare_messages(rows)
+    ticket_df = ticket_df[ticket_df["ticket_id"] == ticket_df["ticket_id"].iloc[0]]
+    conversation_text = insights_lib.build_conversation_text(ticket_df)
+    summary_prompt = config.CONVERSATION_SUMMARY_PROMPT.format(
+        previous_summary="(ainda não há resumo)",
+        new_messages=conversation_text,
+        max_words=int(config.INSIGHT_SUMMARY_MAX_TOKENS * 0.6),
+    )
+    openai_records = {
+        "classifier": timed_completion(
+            model="gpt-4o",
+            messages=[{"role": "system", "content": config.CLASSIFIER_SYSTEM_PROMPT}, {"role": "user", "content": "qual a forma de pagamento?"}],
+            response_format={"type": "json_object"},
+            temperature=0.0,
+        ),
+        "coach": timed_completion(model="gpt-4o", messages=[{"role": "system", "content": coach_prompt}], temperature=0.3),
+        "insight": timed_completion(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": config.INSIGHT_SYSTEM_PROMPT},
+                {"role": "user", "content": config.CONVERSATION_INSIGHT_PROMPT.format(conversation_text=conversation_text)},
+            ],
+            response_format={"type": "json_object"},
+        ),
+        "summary": timed_completion(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": config.CONVERSATION_SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": summary_prompt},
+            ],
+            max_tokens=config.INSIGHT_SUMMARY_MAX_TOKENS,
+            temperature=0.2,
+        ),
+    }
+    with open(os.path.join(RECORDED_DIR, OPENAI_FILE), "w", encoding="utf-8") as f:
+        json.dump(openai_records, f, ensure_ascii=False, indent=2)
+    print("Respostas da OpenAI gravadas")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
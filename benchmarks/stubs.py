@@ -0,0 +1,271 @@
+# benchmarks/stubs.py
+"""
+Dublês locais dos serviços externos, para rodar os benchmarks sem rede.
+`FakeSupabase` imita o cliente do supabase-py para o RPC `get_messages_data`,
+incluindo os filtros/ordenação/paginação que o PostgREST aplica no banco;
+`FakeOpenAI` devolve respostas gravadas da OpenAI e `offline()` bloqueia a rede.
+"""
+import bisect
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import openai
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+import config
+
+# Continuação por keyset que o fetch_messages envia em `or`: (coluna1, coluna2) > (X, Y)
+_KEYSET = re.compile(r'(\w+)\.gt\."(.*)",and\(\1\.eq\."\2",(\w+)\.gt\."(.*)"\)$')
+_INDEX = ('data_hora', 'message_id')
+
+def _nulls_last(column):
+    return lambda row: (row.get(column) is None, row.get(column) if row.get(column) is not None else '')
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+class _RpcQuery:
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+        self._filters = []
+        self._columns = None
+        self._order = []
+        self._range = None
+        self._limit = None
+        self._since = None
+        self._after = None
+        self._negate = False
+        self._not_null = set()
+
+    def select(self, *columns):
+        self._columns = [c.strip() for col in columns for c in col.split(',')]
+        return self
+
+    def gte(self, column, value):
+        if column == 'data_hora':
+            # Simula o índice em data_hora: busca binária em vez de varrer a tabela
+            self._since = value
+        else:
+            self._filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def gt(self, column, value):
+        self._filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def is_(self, column, value):
+        if value != 'null':
+            raise NotImplementedError(value)
+        negate, self._negate = self._negate, False
+        if negate and column in _INDEX:
+            self._not_null.add(column)  # Vale para todo o índice: só as linhas fora dele são testadas
+        else:
+            self._filters.append(lambda row: (row.get(column) is None) != negate)
+        return self
+
+    def or_(self, expression):
+        keyset = _KEYSET.match(expression)
+        if not keyset:
+            raise NotImplementedError(expression)
+        first, a, second, b = keyset.groups()
+        if (first, second) == _INDEX:
+            # Simula o índice em (data_hora, message_id): busca binária em vez de varrer a tabela
+            self._after = (a, b)
+        else:
+            self._filters.append(lambda row: row.get(first) is not None and row.get(second) is not None and (row[first], row[second]) > (a, b))
+        return self
+
+    def order(self, column, desc=False):
+        self._order.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def limit(self, size):
+        self._limit = size
+        return self
+
+    def _in_index_range(self, row) -> bool:
+        if self._since is not None and (row.get('data_hora') is None or row['data_hora'] < self._since):
+            return False
+        if self._after is not None and (row.get('data_hora') is None or row.get('message_id') is None or (row['data_hora'], row['message_id']) <= self._after):
+            return False
+        return True
+
+    def execute(self):
+        self._client.calls += 1
+        start = 0
+        if self._since is not None:
+            start = bisect.bisect_left(self._client.timestamps, self._since)
+        if self._after is not None:
+            start = max(start, bisect.bisect_right(self._client.keys, self._after))
+        # As linhas sem data_hora/message_id ficam fora do índice e passam pelos mesmos filtros
+        outside = [row for row in self._client.unindexed if self._in_index_range(row) and all(row.get(c) is not None for c in self._not_null)]
+        rows = self._client.indexed[start:] + outside
+        if self._filters:
+            rows = [row for row in rows if all(f(row) for f in self._filters)]
+        # O índice já está ordenado por data_hora/message_id; outras ordenações são aplicadas aqui (nulos por último)
+        if [column for column, _ in self._order] != list(_INDEX) or outside:
+            for column, desc in reversed(self._order):
+                rows = sorted(rows, key=_nulls_last(column), reverse=desc)
+        if self._range is not None:
+            rows = rows[self._range[0]:self._range[1] + 1]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        if self._columns is not None:
+            rows = [{c: row.get(c) for c in self._columns} for row in rows]
+        self._client.rows_transferred += len(rows)
+        return _Response(list(rows))
+
+class FakeSupabase:
+    """Cliente Supabase em memória: `rpc('get_messages_data')` retorna `rows` com os filtros aplicados."""
+
+    def __init__(self, rows: list):
+        self._set_rows(rows)
+        self.calls = 0
+        self.rows_transferred = 0
+
+    def _set_rows(self, rows: list):
+        self.indexed = sorted((row for row in rows if row.get('data_hora') is not None and row.get('message_id') is not None), key=lambda row: (row['data_hora'], row['message_id']))
+        self.unindexed = [row for row in rows if row.get('data_hora') is None or row.get('message_id') is None]
+        self.rows = self.indexed + self.unindexed
+        self.timestamps = [row['data_hora'] for row in self.indexed]
+        self.keys = [(row['data_hora'], row['message_id']) for row in self.indexed]
+
+    def insert(self, rows: list):
+        self._set_rows(self.rows + rows)
+
+    def update(self, message_id, **values):
+        """Altera as colunas da mensagem `message_id` (como um UPDATE no banco)."""
+        self._set_rows([{**row, **values} if row['message_id'] == message_id else row for row in self.rows])
+
+    def delete(self, message_ids):
+        message_ids = set(message_ids)
+        self._set_rows([row for row in self.rows if row['message_id'] not in message_ids])
+
+    def rpc(self, name, params=None):
+        if name != 'get_messages_data':
+            raise NotImplementedError(name)
+        return _RpcQuery(self, name)
+
+class FakeOpenAI:
+    """
+    Substitui `openai.chat.completions.create` por respostas gravadas (ChatCompletion
+    serializado). O tipo de chamada é reconhecido pelo prompt de sistema: classificador,
+    insight da conversa ou coach (as demais). Com `stream=True`, a resposta gravada é
+    devolvida em chunks, incluindo o chunk final de uso quando `include_usage` é pedido.
+    `latency_scale` > 0 reproduz a latência gravada (1.0 = tempo real).
+
+    Uso:
+        with FakeOpenAI(responses) as fake:
+            ...
+        fake.calls  # {"classifier": 3, "coach": 10, ...}
+    """
+
+    def __init__(self, responses: dict, latency_scale: float = 0.0):
+        self.responses = responses
+        self.latency_scale = latency_scale
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._original = None
+
+    @property
+    def total_calls(self) -> int:
+        with self._lock:
+            return sum(self.calls.values())
+
+    @staticmethod
+    def _kind(messages: list) -> str:
+        system_prompt = messages[0]["content"] if messages else ""
+        if system_prompt == config.CLASSIFIER_SYSTEM_PROMPT:
+            return "classifier"
+        if system_prompt == config.INSIGHT_SYSTEM_PROMPT:
+            return "insight"
+        if system_prompt == config.CONVERSATION_SUMMARY_SYSTEM_PROMPT:
+            return "summary"
+        return "coach"
+
+    def create(self, **kwargs):
+        kind = self._kind(kwargs.get("messages", []))
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+        record = self.responses[kind]
+        completion = ChatCompletion.model_validate(record["response"])
+        if kwargs.get("stream"):
+            include_usage = bool((kwargs.get("stream_options") or {}).get("include_usage"))
+            return self._stream(completion, record, include_usage)
+        self._sleep(record["latency_ms"])
+        return completion
+
+    def _stream(self, completion, record: dict, include_usage: bool):
+        words = completion.choices[0].message.content.split(" ")
+        ttft_ms = record.get("ttft_ms") or 0
+        per_chunk_ms = (record["latency_ms"] - ttft_ms) / max(1, len(words))
+        self._sleep(ttft_ms)
+        base = {"id": completion.id, "object": "chat.completion.chunk", "created": completion.created, "model": completion.model}
+        for i, word in enumerate(words):
+            content = word if i == len(words) - 1 else f"{word} "
+            yield ChatCompletionChunk.model_validate(dict(base, choices=[{"index": 0, "delta": {"content": content}, "finish_reason": None}]))
+            self._sleep(per_chunk_ms)
+        if include_usage:
+            yield ChatCompletionChunk.model_validate(dict(base, choices=[], usage=completion.usage.model_dump()))
+
+    def _sleep(self, milliseconds):
+        if self.latency_scale and milliseconds:
+            time.sleep(milliseconds / 1000 * self.latency_scale)
+
+    def __enter__(self) -> "FakeOpenAI":
+        openai.api_key = openai.api_key or "chave-falsa"  # O cliente do módulo exige uma chave para ser criado
+        self._original = openai.chat.completions.create
+        openai.chat.completions.create = self.create
+        return self
+
+    def __exit__(self, *exc):
+        openai.chat.completions.create = self._original
+
+_LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+@contextmanager
+def offline():
+    """Garante que nada sai para a rede: conexões e resoluções de DNS fora do loopback levantam OSError."""
+    original_connect = socket.socket.connect
+    original_getaddrinfo = socket.getaddrinfo
+
+    def guarded_connect(sock, address):
+        if sock.family in (socket.AF_INET, socket.AF_INET6) and address[0] not in _LOOPBACK_HOSTS:
+            raise OSError(f"Benchmark offline: conexão bloqueada para {address}")
+        return original_connect(sock, address)
+
+    def guarded_getaddrinfo(host, *args, **kwargs):
+        if host not in _LOOPBACK_HOSTS and host is not None:
+            raise OSError(f"Benchmark offline: resolução de DNS bloqueada para {host}")
+        return original_getaddrinfo(host, *args, **kwargs)
+
+    socket.socket.connect = guarded_connect
+    socket.getaddrinfo = guarded_getaddrinfo
+    try:
+        yield
+    finally:
+        socket.socket.connect = original_connect
+        socket.getaddrinfo = original_getaddrinfo
\ No newline at end of file
@@ -0,0 +1,231 @@
+# benchmarks/suite.py
+"""
+Suíte de benchmarks do app inteiro, sem rede: o payload gravado do RPC
+`get_messages_data` é reproduzido em escala (FakeSupabase) e as respostas gravadas da
+OpenAI e do Pinecone são servidas por dublês locais (FakeOpenAI e PineconeStandIn).
+Qualquer tentativa de conexão externa falha (stubs.offline).
+
+Cenários:
+    conversas.carga_inicial/N     get_conversations com a store vazia (RPC + pandas + resumo + índice)
+    conversas.sync_incremental/N  get_conversations com 200 mensagens novas
+    conversas.filtros/N           KPIs, filtros, busca, ordenação e paginação da lista de conversas
+    conversas.insights/N          detalhe de 20 conversas + contexto com orçamento de tokens + geração de insights
+                                  (caches de conteúdo e de resumos começam vazios; as cópias repetem o texto
+                                  gravado, então parte delas é atendida pelo cache)
+    rag.pipeline                  run_rag_pipeline para as perguntas de referência, cache vazio
+    rag.pipeline_stream           o mesmo, em streaming (consome os streams como a página)
+    rag.cache_quente              as mesmas perguntas com o cache de respostas já preenchido
+
+Para cada cenário: mediana do tempo de parede em `--repeat` execuções (padrão 5), pico de memória
+(tracemalloc, em uma execução separada) e chamadas a LLM/RAG (OpenAI + Pinecone).
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/suite.py --sizes 10000 100000
+    python benchmarks/suite.py --save benchmarks/baseline.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json --tolerance 0.25   # sai com 1 se regredir
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import conversations
+import insights as insights_lib
+import pinecone_client
+import services
+import tracing
+from fixtures import OPENAI_FILE, PINECONE_FILE, load_recorded, pinecone_responder, replay_messages
+from pinecone_standin import PineconeStandIn
+from stubs import FakeOpenAI, FakeSupabase, offline
+
+QUESTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "specialty_questions.json")
+SEARCH_TERMS = ["", "caro", "parcelar cartao", "mariana", "vou pensar"]
+NEW_MESSAGES = 200
+DETAIL_TICKETS = 20
+
+# --- CENÁRIOS ---
+# Cada cenário é uma função de preparo (fora da medição) que devolve a função medida.
+
+def conversation_scenarios(size: int) -> list:
+    rows = replay_messages(size)
+    last = datetime.fromisoformat(rows[-1]["data_hora"])
+    new_rows = replay_messages(NEW_MESSAGES, seed=7, start=last + timedelta(seconds=30), ticket_prefix="N")
+    # Parte das mensagens novas cai em tickets já existentes
+    for row in new_rows[::2]:
+        row["ticket_id"] = rows[len(rows) // 2]["ticket_id"]
+
+    def get_conversations(store, conn):
+        store.sync(conn)
+        return store.snapshot()
+
+    def initial_load():
+        conn = FakeSupabase(rows)
+        return lambda: get_conversations(conversations.ConversationStore(), conn)
+
+    warm_store = conversations.ConversationStore()
+    warm_conn = FakeSupabase(rows)
+    warm_store.sync(warm_conn)
+    warm_state = (warm_store.messages, warm_store.summary, warm_store.watermark)
+    warm_conn.insert(new_rows)
+
+    def incremental_sync():
+        # Volta a store ao estado anterior às mensagens novas (o índice é atualizado por ticket, então é idempotente);
+        # sem `min_interval`, o sync sempre consulta o banco
+        warm_store.messages, warm_store.summary, warm_store.watermark = warm_state
+        return lambda: get_conversations(warm_store, warm_conn)
+
+    store = conversations.ConversationStore()
+    store.sync(FakeSupabase(rows))
+    messages, summary = store.snapshot()
+
+    def list_filters():
+        def run():
+            negotiating = int(summary['em_negociacao'].sum())
+            kpis = (len(summary), negotiating, negotiating / len(summary) if len(summary) else 0)
+            pages = []
+            for term in SEARCH_TERMS:
+                for only_negotiating in (False, True):
+                    for sort_order in conversations.SORT_OPTIONS:
+                        filtered = conversations.filter_conversations(summary, store.search_index, term, only_negotiating, sort_order)
+                        pages.append(filtered.iloc[:config.CONVERSATIONS_PAGE_SIZES[0]])
+            return kpis, pages
+        return run
+
+    def conversation_insights():
+        cache_dir = tempfile.mkdtemp(prefix="bench-insights-")
+        cache = insights_lib.InsightCache(os.path.join(cache_dir, "cache.sqlite3"))
+        summaries = insights_lib.SummaryStore(os.path.join(cache_dir, "summaries"))
+        ticket_ids = list(summary.index[::max(1, len(summary) // DETAIL_TICKETS)][:DETAIL_TICKETS])
+
+        def run():
+            for ticket_id in ticket_ids:
+                ticket_df = conversations.ticket_messages(messages, ticket_id)
+                text = insights_lib.build_conversation_context(ticket_id, ticket_df, summaries)
+                insights_lib.generate_insights(text, cache=cache)
+        return run
+
+    return [
+        (f"conversas.carga_inicial/{size}", initial_load),
+        (f"conversas.sync_incremental/{size}", incremental_sync),
+        (f"conversas.filtros/{size}", list_filters),
+        (f"conversas.insights/{size}", conversation_insights),
+    ]
+
+def rag_scenarios(questions: list) -> list:
+    def ask_all(stream: bool):
+        for question in questions:
+            result = services.run_rag_pipeline(
+                question, config.CLASSIFIER_SYSTEM_PROMPT, config.SALES_COACH_SYSTEM_PROMPT,
+                stream=stream, on_rag_stream=(lambda rag_stream: "".join(rag_stream)) if stream else None,
+            )
+            if stream and result["insight"] is not None:
+                "".join(result["insight"])
+
+    def cold(stream: bool):
+        def prepare():
+            services.get_rag_cache.clear()
+            return lambda: ask_all(stream)
+        return prepare
+
+    def warm():
+        services.get_rag_cache.clear()
+        ask_all(False)
+        return lambda: ask_all(False)
+
+    return [
+        ("rag.pipeline", cold(False)),
+        ("rag.pipeline_stream", cold(True)),
+        ("rag.cache_quente", warm),
+    ]
+
+# --- MEDIÇÃO ---
+
+def measure(prepare, repeat: int, llm_calls) -> dict:
+    """Tempo (mediana de `repeat` execuções), pico de memória e chamadas externas de uma execução."""
+    durations = []
+    for _ in range(repeat):
+        run = prepare()
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+
+    run = prepare()
+    calls_before = llm_calls()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "wall_ms": statistics.median(durations) * 1000,
+        "peak_mb": peak / 1024 / 1024,
+        "llm_calls": llm_calls() - calls_before,
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressões em relação ao baseline: tempo ou memória acima da tolerância, ou mais chamadas a LLM."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ("wall_ms", "peak_mb"):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {previous[metric]:.1f} -> {current[metric]:.1f}")
+        if current["llm_calls"] > previous["llm_calls"]:
+            regressions.append(f"{name}: llm_calls {previous['llm_calls']} -> {current['llm_calls']}")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="mensagens reproduzidas (ex.: 10000 ... 1000000)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="roda apenas os cenários cujo nome contém este texto")
+    parser.add_argument("--latency", type=float, default=0.0, help="escala da latência gravada das APIs (0 = sem espera, 1 = tempo real)")
+    parser.add_argument("--save", help="grava os resultados em JSON (para usar como baseline)")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="piora relativa aceita em tempo e memória")
+    args = parser.parse_args()
+
+    tracing.set_exporter(None)  # Os spans não devem ir para o arquivo de traces do app
+    questions = [item["question"] for item in json.load(open(QUESTIONS_PATH, encoding="utf-8"))]
+    results = {}
+
+    with offline(), FakeOpenAI(load_recorded(OPENAI_FILE), latency_scale=args.latency) as fake_openai, \
+            PineconeStandIn(responder=pinecone_responder(load_recorded(PINECONE_FILE), args.latency)) as standin:
+        client = pinecone_client.PineconeAssistantClient(standin.url, "chave-falsa")
+        services.get_pinecone_client = lambda: client
+        llm_calls = lambda: fake_openai.total_calls + standin.requests
+
+        print(f"{'cenário':<34} | {'tempo (ms)':>11} | {'pico (MB)':>9} | {'chamadas LLM':>12}")
+        # Os dados de cada tamanho são montados só quando chega a vez dele, e descartados depois
+        groups = [lambda: rag_scenarios(questions)] + [lambda size=size: conversation_scenarios(size) for size in args.sizes]
+        for build in groups:
+            for name, prepare in build():
+                if args.only and args.only not in name:
+                    continue
+                results[name] = measure(prepare, args.repeat, llm_calls)
+                r = results[name]
+                print(f"{name:<34} | {r['wall_ms']:>11.1f} | {r['peak_mb']:>9.1f} | {r['llm_calls']:>12}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSÃO {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
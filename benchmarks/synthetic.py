@@ -0,0 +1,58 @@
+# benchmarks/synthetic.py
+"""Geração de payloads sintéticos no formato do RPC `get_messages_data`."""
+import random
+from datetime import datetime, timedelta, timezone
+
+import config
+
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Henrique", "Isabela", "João", "Larissa", "Marcos"]
+LAST_NAMES = ["Silva", "Souza", "Oliveira", "Santos", "Pereira", "Lima", "Costa", "Ribeiro", "Almeida", "Gomes"]
+CLIENT_MESSAGES = [
+    "Olá, gostaria de saber o valor do curso",
+    "Qual a carga horária?",
+    "O certificado é reconhecido pelo MEC?",
+    "Tem desconto à vista?",
+    "Consigo parcelar no cartão?",
+    "Vou pensar e te retorno",
+    "Achei um pouco caro",
+    "Quando começam as aulas?",
+]
+SELLER_MESSAGES = [
+    "Olá! Tudo bem? Posso te ajudar com o curso.",
+    "O investimento é de 12x no cartão.",
+    "Temos uma condição especial até sexta-feira.",
+    "Te envio o link de matrícula?",
+    "As aulas ficam disponíveis por 2 anos.",
+]
+
+def make_messages(n_messages: int, messages_per_ticket: int = 20, seed: int = 42, start: datetime | None = None) -> list:
+    """Gera `n_messages` linhas distribuídas em tickets de ~`messages_per_ticket` mensagens, em ordem cronológica."""
+    rng = random.Random(seed)
+    start = start or datetime(2025, 1, 1, tzinfo=timezone.utc)
+    n_tickets = max(1, n_messages // messages_per_ticket)
+    tickets = []
+    for t in range(n_tickets):
+        tickets.append({
+            "ticket_id": f"T{t:07d}",
+            "user_identity": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "tags": f"{rng.choice(config.ALLOWED_SPECIALTIES)}, Lead",
+            "em_negociacao": rng.random() < 0.3,
+            "next_order": 1,
+        })
+    rows = []
+    for i in range(n_messages):
+        ticket = tickets[rng.randrange(n_tickets)]
+        is_client = rng.random() < 0.5
+        rows.append({
+            "ticket_id": ticket["ticket_id"],
+            "tags": ticket["tags"],
+            "user_identity": ticket["user_identity"],
+            "from_message": "Vendedor Sanar",
+            "message_id": f"wamid.{i:09d}" if is_client else f"out.{i:09d}",
+            "mensagem": rng.choice(CLIENT_MESSAGES if is_client else SELLER_MESSAGES),
+            "data_hora": (start + timedelta(seconds=30 * i)).isoformat(),
+            "ordemmensagens": ticket["next_order"],
+            "em_negociacao": ticket["em_negociacao"],
+        })
+        ticket["next_order"] += 1
+    return rows
@@ -10,6 +10,111 @@ ALLOWED_SPECIALTIES = [
     "Psiquiatria da Infância e Adolescência", "Terapia Intensiva"
 ]
 
+# Apelidos/termos usados pelos vendedores para cada especialidade, consultados pelo
+# classificador local antes de recorrer ao LLM (comparação sem acentos e sem caixa).
+# O próprio nome da especialidade já é considerado automaticamente.
+SPECIALTY_ALIASES = {
+    "Cardiologia": ["cardio", "cardiologista"],
+    "Clínica Médica": ["clinica geral", "clinico geral", "medicina interna"],
+    "Cuidados Paliativos": ["paliativos", "paliativo", "paliativista"],
+    "Dermatologia": ["dermato", "dermatologista"],
+    "Endocrinologia": ["endocrino", "endocrinologista", "endocrinologia e metabologia"],
+    "Geriatria": ["geriatra", "gerontologia"],
+    "Ginecologia e Obstetrícia": ["ginecologia", "obstetricia", "gineco", "ginecologista", "obstetra"],
+    "Medicina da Dor": ["dor cronica", "tratamento da dor", "medico da dor"],
+    "Medicina de Emergência": ["emergencia", "urgencia e emergencia", "emergencista", "pronto socorro"],
+    "Medicina de Família e Comunidade": ["medicina de familia", "saude da familia", "mfc"],
+    "Medicina do Esporte": ["medicina esportiva", "medico do esporte"],
+    "Medicina do Trabalho": ["saude ocupacional", "medico do trabalho"],
+    "Medicina Endocanabinóide": ["endocanabinoide", "cannabis medicinal", "cannabis", "canabidiol", "cbd"],
+    "Neurologia": ["neuro", "neurologista"],
+    "Nutrologia": ["nutrologo", "nutrologa"],
+    "Obesidade e Emagrecimento": ["obesidade", "emagrecimento"],
+    "Pediatria": ["pediatra", "pediatrico"],
+    "Perícias Médicas": ["pericia", "pericia medica", "pericias", "perito", "medico perito"],
+    "Psiquiatria": ["psiquiatra", "psiq"],
+    "Psiquiatria da Infância e Adolescência": [
+        "psiquiatria infantil", "psiquiatria da infancia", "psiquiatria infantojuvenil",
+        "psiquiatria da infancia e da adolescencia", "psiquiatra infantil",
+    ],
+    "Terapia Intensiva": ["medicina intensiva", "uti", "intensivista"],
+}
+
+# Modelo local opcional (Naive Bayes) treinado a partir de perguntas rotuladas; usado
+# apenas se o arquivo existir (ver benchmarks/bench_specialty_classifier.py --save-model)
+SPECIALTY_MODEL_PATH = ".cache/specialty_model.json"
+SPECIALTY_MODEL_MIN_CONFIDENCE = 0.85
+
+# Sincronização incremental das conversas (pages/1_💬_Conversas_em_Aberto.py)
+CONVERSATION_STORE_PATH = ".cache/conversations.pkl"  # Cópia local persistente das mensagens
+CONVERSATIONS_SYNC_INTERVAL_SECONDS = 30               # Intervalo mínimo entre consultas ao banco
+CONVERSATIONS_SYNC_LOOKBACK_SECONDS = 10 * 60          # Folga do sync antes do watermark (linhas gravadas com atraso, atualizações)
+CONVERSATIONS_RECONCILE_SECONDS = 60 * 60              # Reconciliação completa (remoções, atrasos maiores que a folga)
+CONVERSATIONS_FETCH_PAGE_SIZE = 1000                   # Linhas por página do RPC (limite do PostgREST)
+CONVERSATIONS_PAGE_SIZES = [20, 50, 100]               # Opções de conversas por página na lista
+
+# Atualização em tempo real (Supabase Realtime): as mensagens chegam por push e a página se atualiza sozinha
+REALTIME_ENABLED = True
+REALTIME_SCHEMA = "public"
+REALTIME_TABLE = "mensagens"        # Tabela (com Realtime habilitado) de onde saem as linhas do RPC get_messages_data
+REALTIME_BATCH_SECONDS = 1.0        # Eventos que chegam juntos são aplicados em um único lote
+REALTIME_REFRESH_SECONDS = 3        # Intervalo em que a página relê a store (st.fragment)
+REALTIME_SAVE_INTERVAL_SECONDS = 60 # Gravação da store em disco durante o push (o banco cobre o que faltar)
+REALTIME_RESYNC_SECONDS = 600       # Com o canal conectado, sincronização de segurança pelo watermark
+REALTIME_HEALTH_CHECK_SECONDS = 5   # Verificação do canal e do socket (a biblioteca não avisa quando caem)
+REALTIME_RECONNECT_SECONDS = 60     # Canal fora por mais que isso: o cliente do Realtime é recriado
+REALTIME_RETRY_MAX_SECONDS = 30     # Espera máxima entre tentativas de aplicar um lote que falhou (backoff exponencial)
+REALTIME_RETRY_ATTEMPTS = 5         # Tentativas de um lote; depois ele é descartado e a sincronização pelo watermark o recupera
+
+# Insights por conversa (página de conversas e job batch_insights.py)
+INSIGHT_CONTEXT_MESSAGES = 30           # Últimas mensagens enviadas ao modelo
+INSIGHT_STORE_DIR = ".cache/insights"   # Um JSON por ticket com o último insight gerado
+INSIGHT_BATCH_CONCURRENCY = 4           # Chamadas simultâneas ao modelo no job em lote
+INSIGHT_BATCH_MAX_RETRIES = 5           # Tentativas por ticket em caso de rate limit/erro transitório
+INSIGHT_PROMPT_VERSION = "1"            # Mude ao alterar o prompt: invalida o cache de insights
+INSIGHT_CACHE_PATH = ".cache/insight_cache.sqlite3"
+INSIGHT_CACHE_MAX_BYTES = 50 * 1024 * 1024  # Acima disso, os menos acessados são descartados
+
+# Contexto de conversas longas: resumo acumulado por ticket + mensagens recentes dentro de um orçamento
+INSIGHT_CONTEXT_TOKENS = 1500           # Orçamento (estimado) das mensagens recentes enviadas ao modelo
+INSIGHT_SUMMARY_MAX_TOKENS = 300        # Tamanho máximo do resumo acumulado
+INSIGHT_SUMMARY_CHUNK_TOKENS = 4000     # Mensagens antigas incorporadas ao resumo por chamada
+INSIGHT_INTERACTIVE_MAX_FOLDS = 2       # Chamadas de resumo por clique na página; o atraso fica para o batch_insights.py
+INSIGHT_SUMMARY_DIR = ".cache/summaries"  # Um JSON por ticket com o resumo e até onde ele cobre
+INSIGHT_SUMMARY_PROMPT_VERSION = "1"    # Mude ao alterar o prompt de resumo: os resumos salvos são refeitos
+
+# Assistente de chat do Pinecone (a URL pode ser sobrescrita em st.secrets["PINECONE_ASSISTANT_URL"])
+PINECONE_ASSISTANT_URL = "https://prod-1-data.ke.pinecone.io/assistant/chat/ia-assistant"
+PINECONE_CONNECT_TIMEOUT = 5      # Segundos para abrir a conexão
+PINECONE_READ_TIMEOUT = 60        # Segundos aguardando a resposta
+PINECONE_MAX_RETRIES = 3          # Novas tentativas em 429/5xx/queda de conexão
+PINECONE_BACKOFF_BASE = 0.5       # Backoff exponencial com jitter: base * 2^tentativa
+PINECONE_BACKOFF_CAP = 8          # Espera máxima entre tentativas
+PINECONE_BREAKER_THRESHOLD = 5    # Falhas seguidas até abrir o circuit breaker
+PINECONE_BREAKER_COOLDOWN = 30    # Segundos com o circuito aberto antes de testar de novo
+PINECONE_POOL_SIZE = 8            # Conexões keep-alive reaproveitadas
+
+# Roteamento da busca por especialidade: quando o classificador local já sabe as especialidades,
+# a busca fica restrita aos documentos delas (filtro de metadados no assistente geral ou um
+# assistente dedicado à especialidade); sem classificação, a busca é global.
+# Desligado até os arquivos do assistente terem o metadado abaixo: sem ele o filtro não acha
+# nada e toda pergunta roteada cai na busca global depois de uma consulta a mais
+PINECONE_SPECIALTY_ROUTING = False
+PINECONE_SPECIALTY_METADATA_FIELD = "especialidade"  # Metadado dos arquivos enviados ao assistente
+PINECONE_SPECIALTY_ASSISTANTS = {}      # Especialidade -> URL de chat de um assistente só dela (mesma chave)
+PINECONE_MAX_ROUTED_SPECIALTIES = 3     # Perguntas que citam mais especialidades que isso usam a busca global
+
+# Cache de respostas do RAG (compartilhado entre as sessões)
+RAG_CACHE_MAX_ENTRIES = 256          # Limite de perguntas guardadas (LRU)
+RAG_CACHE_TTL_SECONDS = 6 * 60 * 60  # Respostas expiram após 6 horas
+RAG_CACHE_SIMILARITY_THRESHOLD = 0.93 # Similaridade mínima (cosseno) para reaproveitar uma resposta parecida
+                                      # (benchmarks/bench_rag_cache_similarity.py: 0 falsos positivos nos pares rotulados)
+
+# Tracing (spans exportados em JSONL, lidos pela página de diagnóstico: streamlit run diagnostics.py)
+TRACING_ENABLED = True
+TRACE_EXPORT_PATH = ".cache/traces.jsonl"
+TRACE_EXPORT_MAX_BYTES = 20 * 1024 * 1024  # Acima disso, o arquivo vira traces.jsonl.1 e recomeça
+
 # MUDANÇA: Prompt do classificador atualizado para corresponder ao n8n
 CLASSIFIER_SYSTEM_PROMPT = """
 Você é um assistente de IA especialista em triagem e classificação de informações médicas. Sua tarefa é analisar o texto de um usuário e classificá-lo estritamente dentro de UMA das especialidades da lista fornecida.
@@ -56,4 +161,35 @@ Com base em TODO o contexto e dados fornecidos, gere uma resposta para o vendedo
 - Responda de forma Muito certeira a dúvida;
 - SUA REPOSTA DEVE SER Objetiva e DIRECIONADA PARA O VENDEDOR;
 - A Mensagem deve ser formatada para um formato markdown.
+"""
+
+INSIGHT_SYSTEM_PROMPT = "You are a sales analysis AI. Always return valid, complete JSON only."
+
+CONVERSATION_INSIGHT_PROMPT = """
+Você é um especialista em análise de conversas de vendas B2C. Analise a conversa abaixo e retorne APENAS um JSON válido com os seguintes campos:
+=== CONVERSA ===
+{conversation_text}
+=== INSTRUÇÕES ===
+Responda APENAS com um objeto JSON contendo as seguintes chaves:
+- "resumo": "Um resumo conciso do que já foi conversado."
+- "objecao": "Se houver uma objeção clara (preço, tempo, etc.), descreva-a. Se não, retorne 'Nenhuma objeção clara identificada'."
+- "ponto_fraco": "Identifique um ponto de dor ou necessidade do cliente que pode ser explorado para facilitar a venda. Se não houver, retorne 'Nenhum ponto fraco evidente'."
+- "follow_up": {{
+    "estrategia": "Descreva em uma frase a estratégia para a próxima mensagem de follow up.",
+    "copy": "Escreva a mensagem exata (a 'copy') para ser enviada ao cliente, baseada na estratégia."
+  }}
+"""
+
+CONVERSATION_SUMMARY_SYSTEM_PROMPT = "Você resume conversas de vendas com precisão, sem inventar informações."
+
+CONVERSATION_SUMMARY_PROMPT = """
+Atualize o resumo de uma negociação de vendas com as mensagens novas abaixo.
+=== RESUMO ATUAL ===
+{previous_summary}
+=== MENSAGENS NOVAS ===
+{new_messages}
+=== INSTRUÇÕES ===
+Escreva um único resumo atualizado, em até {max_words} palavras, que preserve: interesse e perfil do cliente,
+curso e condições discutidas (valores, prazos, formas de pagamento), objeções levantadas, compromissos
+assumidos e o estado atual da negociação. Responda apenas com o texto do resumo.
 """
\ No newline at end of file
@@ -0,0 +1,428 @@
+# conversations.py
+"""
+Carregamento das mensagens das conversas a partir do RPC `get_messages_data`.
+A `ConversationStore` mantém uma cópia local persistente e busca no Supabase apenas
+as mensagens mais novas que a última sincronização (watermark em `data_hora`, com uma
+janela de folga para as linhas gravadas com atraso), reconciliando tudo de tempos em
+tempos, além de um resumo por ticket usado pelos KPIs, filtros e pela lista de conversas
+e de um índice invertido para a busca.
+
+As mensagens ficam em um esquema compacto (compact_messages): colunas repetidas como
+categorias, textos em strings do Arrow, `data_hora` já convertida e flags booleanas.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import config
+import tracing
+from search_index import ConversationSearchIndex
+
+MESSAGES_RPC = 'get_messages_data'
+# Colunas de cada linha do RPC (as linhas recebidas em tempo real sem alguma delas são buscadas no RPC)
+MESSAGE_COLUMNS = {
+    'ticket_id', 'tags', 'user_identity', 'from_message', 'message_id', 'mensagem',
+    'data_hora', 'ordemmensagens', 'em_negociacao',
+}
+
+# --- ESQUEMA COMPACTO ---
+CATEGORY_COLUMNS = ['ticket_id', 'tags', 'user_identity', 'from_message', 'curso']  # Poucos valores distintos, muito repetidos
+STRING_COLUMNS = ['message_id', 'mensagem']                                        # Textos únicos por mensagem
+STRING_DTYPE = pd.StringDtype('pyarrow')
+
+def _course_from_tags(tags) -> str:
+    return tags.split(',')[0].strip() if tags and isinstance(tags, str) else 'Não especificado'
+
+def _parse_timestamps(values: pd.Series) -> pd.Series:
+    """Converte textos ISO 8601 (com fuso) para datetime UTC; o parser do Arrow é bem mais rápido que o do pandas."""
+    try:
+        parsed = pc.cast(pa.array(values, type=pa.string()), pa.timestamp('ns', tz='UTC'))
+        return pd.Series(parsed.to_pandas(), index=values.index)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Algum valor fora do padrão: o pandas converte o que der e deixa o resto como NaT
+        return pd.to_datetime(values, utc=True, format='ISO8601', errors='coerce')
+
+def compact_messages(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte as mensagens para o esquema compacto: categorias para as colunas repetidas,
+    strings do Arrow para os textos, `data_hora` como datetime (UTC), `em_negociacao`
+    booleana e `ordemmensagens` int32. Colunas já convertidas são mantidas, então pode
+    ser aplicada a DataFrames salvos antes do esquema.
+    """
+    if df.empty:
+        return df
+    columns = {}
+    if 'data_hora' in df and not pd.api.types.is_datetime64_any_dtype(df['data_hora']):
+        columns['data_hora'] = _parse_timestamps(df['data_hora'])
+    if 'em_negociacao' in df and not pd.api.types.is_bool_dtype(df['em_negociacao']):
+        columns['em_negociacao'] = df['em_negociacao'].eq(True)
+    if 'ordemmensagens' in df and df['ordemmensagens'].dtype != 'int32':
+        columns['ordemmensagens'] = df['ordemmensagens'].astype('int32')
+    for column in CATEGORY_COLUMNS:
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            columns[column] = df[column].astype('category')
+    for column in STRING_COLUMNS:
+        if column in df and df[column].dtype != STRING_DTYPE:
+            columns[column] = df[column].astype(STRING_DTYPE)
+    return df.assign(**columns) if columns else df
+
+def concat_messages(frames: list) -> pd.DataFrame:
+    """Concatena DataFrames no esquema compacto, unindo as categorias (sem voltar a `object`)."""
+    frames = [frame for frame in frames if not frame.empty]
+    if len(frames) <= 1:
+        return frames[0].reset_index(drop=True) if frames else pd.DataFrame()
+    categories = {
+        column: pd.api.types.union_categoricals([frame[column] for frame in frames]).categories
+        for column in CATEGORY_COLUMNS
+        if all(column in frame for frame in frames)
+    }
+    return pd.concat(
+        [frame.assign(**{column: frame[column].cat.set_categories(values) for column, values in categories.items()}) for frame in frames],
+        ignore_index=True,
+    )
+
+@tracing.traced()
+def prepare_messages(records: list) -> pd.DataFrame:
+    """Transforma as linhas retornadas pelo RPC no DataFrame (esquema compacto) usado pelas páginas."""
+    tracing.set_attributes({"rows": len(records)})
+    if not records:
+        return pd.DataFrame()
+    df = pd.DataFrame(records)
+    tags = df['tags'].astype('category')
+    # O curso é derivado uma vez por combinação de tags, não por mensagem
+    courses = np.array([_course_from_tags(t) for t in tags.cat.categories] + ['Não especificado'], dtype=object)
+    df['tags'] = tags
+    df['curso'] = pd.Categorical(courses[tags.cat.codes.to_numpy()])
+    df['ordemmensagens'] = pd.to_numeric(df['ordemmensagens'], errors='coerce')
+    df.dropna(subset=['ordemmensagens'], inplace=True)
+    return compact_messages(df)
+
+SUMMARY_COLUMNS = [
+    'user_identity', 'curso', 'ultima_mensagem', 'ultima_data_hora',
+    'ultima_em_negociacao', 'mensagens', 'em_negociacao',
+]
+
+@tracing.traced()
+def build_ticket_summary(messages: pd.DataFrame) -> pd.DataFrame:
+    """
+    Resumo por ticket (índice `ticket_id`) calculado com operações vetorizadas:
+    última mensagem, quantidade de mensagens, se alguma mensagem está em negociação,
+    curso e identidade do cliente.
+    """
+    if messages.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS, index=pd.Index([], name='ticket_id'))
+
+    ordered = messages.assign(em_negociacao=messages['em_negociacao'].eq(True))
+    ordered = ordered.sort_values(['ticket_id', 'ordemmensagens'], kind='stable')
+    grouped = ordered.groupby('ticket_id', sort=True, observed=True)
+    last = grouped.tail(1).set_index('ticket_id')
+
+    summary = pd.DataFrame({
+        'user_identity': last['user_identity'].astype(object),
+        'curso': last['curso'].astype(object),
+        'ultima_mensagem': last['mensagem'],
+        'ultima_data_hora': last['data_hora'],
+        'ultima_em_negociacao': last['em_negociacao'],
+        'mensagens': grouped.size(),
+        'em_negociacao': grouped['em_negociacao'].any(),
+    })
+    # Índice com os valores originais do ticket_id (não categórico), para concatenar resumos parciais
+    summary.index = pd.Index(summary.index.to_numpy(), name='ticket_id')
+    return summary[SUMMARY_COLUMNS].sort_index()
+
+SORT_OPTIONS = ["Relevância", "Mais recentes", "Mais mensagens"]
+
+def filter_conversations(summary: pd.DataFrame, search_index: ConversationSearchIndex, search_term: str = '',
+                         only_negotiating: bool = False, sort_order: str = SORT_OPTIONS[0]) -> pd.DataFrame:
+    """
+    Filtros e ordenação da lista de conversas, como operações de coluna sobre o resumo
+    por ticket. A busca usa o índice invertido; com busca ativa e ordenação por
+    "Relevância", a lista segue a ordem da busca (sem busca, equivale a "Mais recentes").
+    Rodam sobre a store local, e não no RPC: a cada tecla, nenhuma consulta ao banco.
+    """
+    filtered = summary
+    if only_negotiating:
+        filtered = filtered[filtered['em_negociacao']]
+    term = search_term.strip()
+    if term:
+        ranked_ticket_ids = search_index.search(term)
+        visible_ids = filtered.index
+        filtered = filtered.loc[[t for t in ranked_ticket_ids if t in visible_ids]]
+
+    if sort_order == "Mais mensagens":
+        filtered = filtered.sort_values('mensagens', ascending=False, kind='stable')
+    elif sort_order == "Mais recentes" or not term:
+        filtered = filtered.sort_values('ultima_data_hora', ascending=False, kind='stable')
+    return filtered
+
+def ticket_messages(messages: pd.DataFrame, ticket_id) -> pd.DataFrame:
+    """Mensagens de um ticket, em ordem."""
+    if messages.empty:
+        return messages
+    return messages[messages['ticket_id'] == ticket_id].sort_values('ordemmensagens')
+
+def _quoted(value) -> str:
+    """Valor entre aspas para os filtros do PostgREST (datas com `+` e `:`, ids com `.`)."""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def _fetch_pages(conn, key: tuple, filters, page_size: int) -> tuple[list, int]:
+    """Linhas do RPC com `filters` aplicado, em páginas por keyset nas duas colunas de `key` (não nulas)."""
+    first, second = key
+    records = []
+    pages = 0
+    after = None
+    while True:
+        query = filters(conn.rpc(MESSAGES_RPC)).not_.is_(first, 'null').not_.is_(second, 'null')
+        if after is not None:
+            a, b = map(_quoted, after)
+            query = query.or_(f'{first}.gt.{a},and({first}.eq.{a},{second}.gt.{b})')
+        response = query.order(first).order(second).limit(page_size).execute()
+        page = response.data if isinstance(response.data, list) else []
+        records.extend(page)
+        pages += 1
+        if len(page) < page_size:
+            return records, pages
+        after = (page[-1][first], page[-1][second])
+
+@tracing.traced()
+def fetch_messages(conn, since: str | None = None, page_size: int = config.CONVERSATIONS_FETCH_PAGE_SIZE) -> list:
+    """
+    Busca as mensagens do RPC em páginas por keyset em (`data_hora`, `message_id`), em vez de OFFSET.
+    Com `since`, só as de `data_hora >= since`; sem, também as sem `data_hora` (por ticket).
+    Linhas sem `message_id` (ou sem data e sem ticket) ficam de fora: o keyset depende delas.
+    """
+    records, pages = _fetch_pages(conn, ('data_hora', 'message_id'), lambda query: query.gte('data_hora', since) if since is not None else query, page_size)
+    undated = 0
+    if since is None:
+        undated_records, undated_pages = _fetch_pages(conn, ('ticket_id', 'message_id'), lambda query: query.is_('data_hora', 'null'), page_size)
+        records += undated_records
+        pages += undated_pages
+        undated = len(undated_records)
+    tracing.set_attributes({"rows": len(records), "pages": pages, "undated": undated, "incremental": since is not None})
+    return records
+
+@tracing.traced()
+def fetch_messages_by_id(conn, message_ids: list, batch_size: int = 200) -> list:
+    """Linhas do RPC para mensagens específicas (`message_id`), em lotes para não estourar o tamanho da URL."""
+    records = []
+    for start in range(0, len(message_ids), batch_size):
+        response = conn.rpc(MESSAGES_RPC).in_('message_id', message_ids[start:start + batch_size]).execute()
+        records.extend(response.data if isinstance(response.data, list) else [])
+    tracing.set_attributes({"requested": len(message_ids), "rows": len(records)})
+    return records
+
+def _upsert_summary(summary: pd.DataFrame, refreshed: pd.DataFrame) -> pd.DataFrame:
+    """
+    Novo resumo com as linhas de `refreshed` no lugar das antigas e os tickets novos
+    inseridos na ordem do índice, sem reordenar o resumo inteiro a cada lote.
+    """
+    if summary.empty or not summary.index.is_monotonic_increasing:
+        return pd.concat([summary.drop(index=refreshed.index, errors='ignore'), refreshed]).sort_index() if not summary.empty else refreshed
+    positions = summary.index.get_indexer(refreshed.index)
+    existing = positions >= 0
+    columns = {}
+    for column in summary.columns:
+        values = summary[column].array.copy()
+        values[positions[existing]] = refreshed[column].array[existing]
+        columns[column] = values
+    updated = pd.DataFrame(columns, index=summary.index)
+    if existing.all():
+        return updated
+    new_rows = refreshed[~existing].sort_index()
+    # Posição de cada ticket novo no índice ordenado; os antigos mantêm a ordem relativa
+    insert_at = summary.index.searchsorted(new_rows.index)
+    order = np.insert(np.arange(len(summary)), insert_at, len(summary) + np.arange(len(new_rows)))
+    return pd.concat([updated, new_rows]).take(order)
+
+class ConversationStore:
+    """
+    Cópia local das mensagens, persistida em disco e atualizada de forma incremental
+    (sync), com uma reconciliação completa periódica (reconcile) que traz as remoções e o
+    que chegou ao banco fora da janela do sync.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self.messages = pd.DataFrame()
+        self.summary = build_ticket_summary(self.messages)
+        self.search_index = ConversationSearchIndex()
+        self.watermark = None  # maior data_hora já sincronizada
+        self.version = 0       # incrementado a cada mudança em `messages`
+        self.last_error = None # falha da última reconciliação em segundo plano
+        self._last_sync = None
+        self._saved_at = None
+        self._reconciled_at = None  # time.time() da última reconciliação iniciada com sucesso (persistido)
+        self._replay = None         # durante uma reconciliação, o que o merge incorporou (reaplicado no fim)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            data = pd.read_pickle(self.path)
+            self.messages = compact_messages(data['messages'])
+            self.watermark = data['watermark']
+            self._reconciled_at = data.get('reconciled_at')
+        except Exception:
+            # Arquivo corrompido ou de uma versão antiga: recomeça do zero
+            self.messages, self.watermark = pd.DataFrame(), None
+        self.summary = build_ticket_summary(self.messages)
+        self.search_index.update_tickets(self.messages)
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        pd.to_pickle({'messages': self.messages, 'watermark': self.watermark, 'reconciled_at': self._reconciled_at}, tmp_path)
+        os.replace(tmp_path, self.path)
+        self._saved_at = time.monotonic()
+
+    @tracing.traced("conversations.ConversationStore.merge")
+    def merge(self, new_messages: pd.DataFrame, save_interval: float = 0) -> int:
+        """
+        Incorpora mensagens novas ou atualizadas; retorna quantas linhas chegaram. Com
+        `save_interval`, o arquivo só é regravado se a última gravação tiver mais que isso
+        (o que não chegou ao disco volta do banco na próxima sincronização pelo watermark).
+        """
+        if new_messages.empty:
+            return 0
+        with self._lock:
+            new_messages = compact_messages(new_messages)
+            if self._replay is not None:
+                self._replay.append(new_messages)
+            self._apply(new_messages)
+            self.version += 1
+            if self._saved_at is None or time.monotonic() - self._saved_at >= save_interval:
+                self._save()
+        return len(new_messages)
+
+    def _apply(self, new_messages: pd.DataFrame):
+        """Incorpora `new_messages` (esquema compacto) às mensagens, ao resumo e ao índice; requer o lock."""
+        ticket_ids = new_messages['ticket_id'].unique()
+        merged = concat_messages([self.messages, new_messages])
+        # Só as mensagens dos tickets que receberam linhas podem se repetir: a deduplicação fica restrita a elas
+        affected = merged[merged['ticket_id'].isin(ticket_ids)]
+        duplicated = affected.duplicated(subset=['ticket_id', 'ordemmensagens', 'message_id'], keep='last')
+        if duplicated.any():
+            merged = merged.drop(index=affected.index[duplicated.to_numpy()])
+            affected = affected[~duplicated]
+        self.messages = merged.reset_index(drop=True)
+        self._refresh_tickets(ticket_ids, affected)
+        self._update_watermark()
+
+    def _update_watermark(self):
+        timestamps = self.messages['data_hora'].dropna() if not self.messages.empty else pd.Series(dtype=object)
+        # O watermark segue em ISO 8601, o formato do filtro enviado ao PostgREST
+        self.watermark = timestamps.max().isoformat() if not timestamps.empty else None
+
+    def _refresh_tickets(self, ticket_ids, affected: pd.DataFrame | None = None):
+        """
+        Recalcula o resumo e o índice de busca apenas dos tickets afetados (`affected`:
+        todas as mensagens deles), preservando os demais.
+        """
+        if affected is None:
+            affected = self.messages[self.messages['ticket_id'].isin(ticket_ids)]
+        # Sem as categorias dos outros tickets, o agrupamento de poucas linhas fica barato
+        affected = affected.assign(**{
+            column: affected[column].cat.remove_unused_categories()
+            for column in CATEGORY_COLUMNS
+            if column in affected and isinstance(affected[column].dtype, pd.CategoricalDtype)
+        })
+        self.summary = _upsert_summary(self.summary, build_ticket_summary(affected))
+        self.search_index.update_tickets(affected)
+
+    def snapshot(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Mensagens e resumo por ticket da mesma versão (não são alterados depois, apenas substituídos)."""
+        with self._lock:
+            return self.messages, self.summary
+
+    def _changed_rows(self, fresh: pd.DataFrame, since: pd.Timestamp) -> pd.DataFrame:
+        """Linhas de `fresh` que a store ainda não tem exatamente iguais (a janela de folga do sync as repete)."""
+        if fresh.empty or self.messages.empty:
+            return fresh
+        window = self.messages[self.messages['data_hora'] >= since]
+        if window.empty:
+            return fresh
+        columns = [column for column in fresh.columns if column in window.columns]
+        known = pd.util.hash_pandas_object(window[columns].astype(object), index=False)
+        hashes = pd.util.hash_pandas_object(fresh[columns].astype(object), index=False)
+        return fresh[~hashes.isin(known).to_numpy()]
+
+    def sync_due(self, min_interval: float = 0) -> bool:
+        """Se já se passaram `min_interval` segundos desde a última sincronização."""
+        return self._last_sync is None or time.monotonic() - self._last_sync >= min_interval
+
+    def sync(self, conn, min_interval: float = 0) -> int:
+        """
+        Busca as mensagens com `data_hora` a partir do watermark menos
+        CONVERSATIONS_SYNC_LOOKBACK_SECONDS e incorpora as novas ou alteradas: a folga pega
+        as linhas gravadas com atraso (webhooks atrasados) e as atualizações recentes. A
+        cada CONVERSATIONS_RECONCILE_SECONDS dispara também uma reconciliação completa em
+        segundo plano. Chamadas dentro de `min_interval` segundos da anterior não consultam
+        o banco nem geram span (a página chama a cada poucos segundos).
+        """
+        if not self.sync_due(min_interval):
+            return 0
+        self._last_sync = time.monotonic()
+        return self._sync(conn)
+
+    @tracing.traced("conversations.ConversationStore.sync")
+    def _sync(self, conn) -> int:
+        if self.watermark is None:
+            return self.reconcile(conn)  # Carga inicial: tudo do banco
+        if self._reconciled_at is None or time.time() - self._reconciled_at >= config.CONVERSATIONS_RECONCILE_SECONDS:
+            threading.Thread(target=self._reconcile_in_background, args=(conn,), name="conversas-reconciliacao", daemon=True).start()
+        since = pd.Timestamp(self.watermark) - pd.Timedelta(seconds=config.CONVERSATIONS_SYNC_LOOKBACK_SECONDS)
+        fresh = prepare_messages(fetch_messages(conn, since=since.isoformat()))
+        changed = self._changed_rows(fresh, since)
+        tracing.set_attributes({"rows": len(fresh), "changed": len(changed)})
+        return self.merge(changed)
+
+    @tracing.traced("conversations.ConversationStore.reconcile")
+    def reconcile(self, conn) -> int:
+        """
+        Recarrega todas as mensagens do banco e substitui a cópia local, o resumo e o índice:
+        traz as remoções e as linhas que ficaram fora da janela do sync. A carga e os
+        cálculos são feitos fora do lock; o que o merge incorporar enquanto isso é reaplicado
+        por cima. Retorna quantas linhas vieram (0 se já houver uma em andamento).
+        """
+        with self._lock:
+            if self._replay is not None:
+                return 0
+            self._replay = []
+            started_at = time.time()
+        try:
+            messages = prepare_messages(fetch_messages(conn)).reset_index(drop=True)
+            summary = build_ticket_summary(messages)
+            search_index = ConversationSearchIndex()
+            search_index.update_tickets(messages)
+        except BaseException:
+            with self._lock:
+                self._replay = None
+            raise
+        with self._lock:
+            replay, self._replay = self._replay, None
+            self.messages, self.summary, self.search_index = messages, summary, search_index
+            self._update_watermark()
+            for new_messages in replay:
+                self._apply(new_messages)
+            tracing.set_attributes({"rows": len(messages), "replayed": sum(len(frame) for frame in replay)})
+            self._reconciled_at = started_at
+            self.version += 1
+            self._save()
+        return len(messages)
+
+    def _reconcile_in_background(self, conn):
+        try:
+            self.reconcile(conn)
+            self.last_error = None
+        except Exception as e:
+            # O span da reconciliação já registra a falha; o sync incremental segue e ela é tentada de novo
+            self.last_error = str(e)
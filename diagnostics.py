@@ -0,0 +1,112 @@
+# diagnostics.py
+"""
+Página de diagnóstico (fora do menu do app): latência p50/p95 por etapa e estado do
+cliente do Pinecone (circuit breaker, novas tentativas, histograma de latência), a partir
+dos spans exportados pelo tracing. Rode com `streamlit run diagnostics.py`.
+"""
+import json
+import time
+
+import pandas as pd
+import streamlit as st
+
+import config
+import tracing
+
+st.set_page_config(page_title="Diagnóstico", page_icon="🩺", layout="wide")
+
+WINDOWS = {
+    "Última hora": 60 * 60,
+    "Últimas 24 horas": 24 * 60 * 60,
+    "Últimos 7 dias": 7 * 24 * 60 * 60,
+    "Tudo": None,
+}
+
+st.title("🩺 Diagnóstico de latência")
+st.caption(f"Spans lidos de `{config.TRACE_EXPORT_PATH}`.")
+
+window_col, limit_col, _ = st.columns([1, 1, 2])
+window = window_col.selectbox("Período", list(WINDOWS), index=1)
+limit = limit_col.number_input("Spans mais recentes", min_value=100, max_value=200_000, value=20_000, step=1000)
+
+spans = tracing.load_spans(config.TRACE_EXPORT_PATH, limit=int(limit))
+if WINDOWS[window] is not None:
+    cutoff = time.time_ns() - WINDOWS[window] * 1_000_000_000
+    spans = [item for item in spans if item["start_time_unix_nano"] >= cutoff]
+
+if not spans:
+    st.info("Nenhum span registrado no período. Use o app para gerar dados.")
+    st.stop()
+
+# --- LATÊNCIA POR ETAPA ---
+summary = pd.DataFrame(tracing.summarize_spans(spans))
+st.subheader("Latência por etapa")
+st.dataframe(
+    summary,
+    hide_index=True,
+    use_container_width=True,
+    column_config={
+        "p50_ms": st.column_config.NumberColumn("p50 (ms)", format="%.1f"),
+        "p95_ms": st.column_config.NumberColumn("p95 (ms)", format="%.1f"),
+        "max_ms": st.column_config.NumberColumn("máx (ms)", format="%.1f"),
+        "tokens_medios": st.column_config.NumberColumn("tokens (média)", format="%.0f"),
+    },
+)
+st.bar_chart(summary.set_index("etapa")[["p50_ms", "p95_ms"]], stack=False)
+
+# --- CLIENTE DO PINECONE ---
+# O cliente vive no processo do app; cada busca grava o `stats()` dele no span, e aqui vale o mais recente
+client_spans = [item for item in spans if "pinecone.client" in item["attributes"]]
+if client_spans:
+    client_stats = max(client_spans, key=lambda item: item["end_time_unix_nano"])["attributes"]["pinecone.client"]
+    st.subheader("Cliente do Pinecone")
+    st.caption("Acumulado desde que o app subiu, conforme a busca mais recente do período.")
+    breaker_col, retries_col, calls_col, p50_col, p95_col = st.columns(5)
+    breaker_col.metric("Circuit breaker", client_stats["breaker"])
+    retries_col.metric("Novas tentativas", client_stats["retries"])
+    calls_col.metric("Requisições", client_stats["latency"]["count"])
+    p50_col.metric("p50 (s)", f"≤ {client_stats['p50']:g}")
+    p95_col.metric("p95 (s)", f"≤ {client_stats['p95']:g}")
+
+    # Os buckets são cumulativos (formato Prometheus): a contagem de cada faixa é a diferença para o anterior
+    cumulative = list(client_stats["latency"]["buckets"].items())
+    bounds = [bound.removeprefix("le_") for bound, _ in cumulative]
+    histogram = pd.DataFrame({
+        "latência": [f"≤ {bound} s" for bound in bounds[:-1]] + [f"> {bounds[-2]} s"],
+        "requisições": [count - (cumulative[i - 1][1] if i else 0) for i, (_, count) in enumerate(cumulative)],
+    })
+    st.dataframe(
+        histogram,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "requisições": st.column_config.ProgressColumn("requisições", format="%d", min_value=0, max_value=max(1, client_stats["latency"]["count"])),
+        },
+    )
+
+# --- TRACES RECENTES ---
+st.subheader("Traces recentes")
+by_trace = {}
+for item in spans:
+    by_trace.setdefault(item["trace_id"], []).append(item)
+roots = [item for item in spans if item["parent_span_id"] is None]
+
+for root in sorted(roots, key=lambda item: item["start_time_unix_nano"], reverse=True)[:20]:
+    started = pd.Timestamp(root["start_time_unix_nano"], unit="ns", tz="UTC").tz_convert("America/Sao_Paulo")
+    status = "⚠️ " if any(item["status"] == "ERROR" for item in by_trace[root["trace_id"]]) else ""
+    with st.expander(f"{status}{started:%d/%m %H:%M:%S} · {root['name']} · {root['duration_ms']:.0f} ms"):
+        trace_spans = sorted(by_trace[root["trace_id"]], key=lambda item: item["start_time_unix_nano"])
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "etapa": item["name"],
+                    "início (ms)": (item["start_time_unix_nano"] - root["start_time_unix_nano"]) / 1e6,
+                    "duração (ms)": item["duration_ms"],
+                    "status": item["status"],
+                    "atributos": json.dumps(item["attributes"], ensure_ascii=False),
+                }
+                for item in trace_spans
+            ]),
+            hide_index=True,
+            use_container_width=True,
+        )
\ No newline at end of file
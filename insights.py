@@ -0,0 +1,322 @@
+# insights.py
+"""
+Geração e armazenamento dos insights de IA por conversa. Usado pela página de
+conversas (sob demanda) e pelo job batch_insights.py (em lote, todas as manhãs).
+
+Conversas longas são enviadas ao modelo como um resumo acumulado (persistido por
+ticket e atualizado só com as mensagens que saíram da janela) mais as mensagens
+recentes que cabem no orçamento de tokens; o prompt não cresce com a conversa.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import openai
+import pandas as pd
+
+import config
+import tracing
+
+def format_message(message_id, text) -> str:
+    """Linha da conversa identificando quem falou (mensagens do cliente têm id `wamid...`)."""
+    return f"{'Cliente' if str(message_id).startswith('wamid') else 'Vendedor'}: {text}"
+
+def build_conversation_text(messages_df: pd.DataFrame, max_messages: int = config.INSIGHT_CONTEXT_MESSAGES) -> str:
+    """Últimas `max_messages` mensagens da conversa, identificando quem falou."""
+    messages_df = messages_df.sort_values('ordemmensagens').tail(max_messages)
+    return "\n".join(map(format_message, messages_df['message_id'], messages_df['mensagem']))
+
+# --- CONTEXTO COM ORÇAMENTO DE TOKENS ---
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa conservadora de tokens (~4 caracteres por token em português), sem depender de tokenizador."""
+    return len(text) // 4 + 1
+
+def _take_recent(lines: list, budget: int) -> int:
+    """Quantas linhas do final cabem em `budget` tokens (ao menos uma)."""
+    used = 0
+    for count, line in enumerate(reversed(lines)):
+        used += estimate_tokens(line)
+        if used > budget:
+            return max(count, 1)
+    return len(lines)
+
+class _TicketJsonStore:
+    """Um arquivo JSON por ticket em `directory`, gravado de forma atômica (arquivo temporário + os.replace)."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, ticket_id) -> str:
+        name = str(ticket_id)
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+        if safe_name != name:
+            # `a/b` e `a_b` não podem cair no mesmo arquivo
+            safe_name = f"{safe_name}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:10]}"
+        return os.path.join(self.directory, f"{safe_name}.json")
+
+    def _read(self, ticket_id) -> dict | None:
+        try:
+            with open(self._path(ticket_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write(self, ticket_id, record: dict) -> dict:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(ticket_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return record
+
+class SummaryStore(_TicketJsonStore):
+    """
+    Resumo acumulado de cada ticket, salvo como JSON em `directory`, com a maior
+    `ordemmensagens` que ele já cobre. Reaproveitado entre execuções (página e job).
+    """
+
+    def __init__(self, directory: str = config.INSIGHT_SUMMARY_DIR):
+        super().__init__(directory)
+
+    def get(self, ticket_id) -> dict | None:
+        """Registro salvo (`summary`, `last_ordemmensagens`), se houver e for da versão atual do prompt."""
+        record = self._read(ticket_id)
+        return record if record and record.get("prompt_version") == config.INSIGHT_SUMMARY_PROMPT_VERSION else None
+
+    def save(self, ticket_id, summary: str, last_ordemmensagens: int) -> dict:
+        return self._write(ticket_id, {
+            "ticket_id": str(ticket_id),
+            "summary": summary,
+            "last_ordemmensagens": int(last_ordemmensagens),
+            "prompt_version": config.INSIGHT_SUMMARY_PROMPT_VERSION,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+@tracing.traced()
+def summarize_messages(previous_summary: str | None, lines: list) -> str:
+    """Incorpora `lines` ao resumo anterior, em uma chamada ao modelo com saída limitada."""
+    prompt = config.CONVERSATION_SUMMARY_PROMPT.format(
+        previous_summary=previous_summary or "(ainda não há resumo)",
+        new_messages="\n".join(lines),
+        max_words=int(config.INSIGHT_SUMMARY_MAX_TOKENS * 0.6),
+    )
+    tracing.set_attributes({"request.chars": len(prompt), "messages": len(lines)})
+    response = openai.chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": config.CONVERSATION_SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=config.INSIGHT_SUMMARY_MAX_TOKENS,
+        temperature=0.2
+    )
+    tracing.set_token_usage(tracing.current_span(), response.usage)
+    return response.choices[0].message.content.strip()
+
+def _uncovered(ticket_id, messages_df: pd.DataFrame, summaries: SummaryStore) -> tuple:
+    """Resumo salvo do ticket e as linhas (com suas `ordemmensagens`) que ele ainda não cobre."""
+    messages_df = messages_df.sort_values('ordemmensagens')
+    record = summaries.get(ticket_id)
+    summary = record["summary"] if record else None
+    if record:
+        messages_df = messages_df[messages_df['ordemmensagens'] > record["last_ordemmensagens"]]
+    lines = list(map(format_message, messages_df['message_id'], messages_df['mensagem']))
+    return summary, lines, messages_df['ordemmensagens'].tolist()
+
+def has_summary_backlog(ticket_id, messages_df: pd.DataFrame, summaries: SummaryStore, budget: int = config.INSIGHT_CONTEXT_TOKENS) -> bool:
+    """Se o resumo salvo ficou para trás (o que build_conversation_context com `max_folds` deixa para o job)."""
+    _, lines, _ = _uncovered(ticket_id, messages_df, summaries)
+    return sum(map(estimate_tokens, lines)) > budget
+
+@tracing.traced()
+def build_conversation_context(ticket_id, messages_df: pd.DataFrame, summaries: SummaryStore,
+                               budget: int = config.INSIGHT_CONTEXT_TOKENS, summarize=summarize_messages,
+                               max_folds: int | None = None) -> str:
+    """
+    Texto da conversa para o prompt de insights. Se as mensagens ainda não cobertas pelo
+    resumo salvo cabem em `budget`, vão todas (sem resumo, é o mesmo texto de antes).
+    Senão, as mais antigas são incorporadas ao resumo, em blocos de até
+    INSIGHT_SUMMARY_CHUNK_TOKENS, e ficam só as recentes que cabem em metade do
+    orçamento: assim o resumo é refeito uma vez a cada ~meio orçamento de mensagens
+    novas, e não a cada mensagem. Erros do modelo são propagados para quem chamou.
+
+    Com `max_folds` (a página), no máximo esse número de blocos é incorporado: se houver
+    mais, só os últimos antes das recentes entram, e esse resumo parcial não é salvo; o
+    atraso fica para o batch_insights.py (has_summary_backlog).
+    """
+    summary, lines, orders = _uncovered(ticket_id, messages_df, summaries)
+    skipped = 0
+
+    if sum(map(estimate_tokens, lines)) > budget:
+        keep = _take_recent(lines, budget // 2)
+        pending, pending_orders = lines[:-keep], orders[:-keep]
+        chunks = []  # (início, fim) dos blocos incorporados, em ordem
+        if max_folds is None:
+            start = 0
+            while start < len(pending):
+                size = _take_recent(pending[start:][::-1], config.INSIGHT_SUMMARY_CHUNK_TOKENS)  # Linhas a partir de `start`
+                chunks.append((start, start + size))
+                start += size
+        else:
+            end = len(pending)
+            while end > 0 and len(chunks) < max_folds:
+                size = _take_recent(pending[:end], config.INSIGHT_SUMMARY_CHUNK_TOKENS)  # Linhas que terminam em `end`
+                chunks.insert(0, (end - size, end))
+                end -= size
+            skipped = end
+        for start, end in chunks:
+            summary = summarize(summary, pending[start:end])
+            if not skipped:
+                summaries.save(ticket_id, summary, pending_orders[end - 1])
+        lines = lines[-keep:]
+    tracing.set_attributes({"summary": summary is not None, "recent_messages": len(lines), "skipped_messages": skipped})
+
+    recent = "\n".join(lines)
+    if summary is None:
+        return recent
+    return f"[Resumo das mensagens anteriores]\n{summary}\n\n[Mensagens mais recentes]\n{recent}"
+
+class InsightCache:
+    """
+    Cache persistente (SQLite) de insights, endereçado pelo conteúdo: a chave é o hash
+    do texto exato da conversa mais a versão do prompt. Compartilhado entre sessões e
+    processos; quando passa de `max_bytes`, descarta os menos acessados recentemente.
+    """
+
+    def __init__(self, path: str = config.INSIGHT_CACHE_PATH, max_bytes: int = config.INSIGHT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS insights ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS insights_last_access ON insights (last_access)")
+            db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            db.execute("INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0)")
+
+    @contextmanager
+    def _connect(self):
+        """Uma conexão por operação (segura entre threads e processos), com commit ao final."""
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def key(conversation_text: str, prompt_version: str = config.INSIGHT_PROMPT_VERSION) -> str:
+        return hashlib.sha256(f"{prompt_version}\n{conversation_text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM insights WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                db.execute("UPDATE stats SET value = value + 1 WHERE name = 'misses'")
+                return None
+            db.execute("UPDATE insights SET last_access = ? WHERE key = ?", (time.time(), key))
+            db.execute("UPDATE stats SET value = value + 1 WHERE name = 'hits'")
+        return json.loads(row[0])
+
+    def put(self, key: str, insights: dict):
+        value = json.dumps(insights, ensure_ascii=False)
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO insights (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict(db)
+
+    def _evict(self, db: sqlite3.Connection):
+        """Remove as entradas acessadas há mais tempo até o total caber em `max_bytes`."""
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM insights").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM insights ORDER BY last_access").fetchall():
+            db.execute("DELETE FROM insights WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        with self._connect() as db:
+            counters = dict(db.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM insights").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+@tracing.traced()
+def generate_insights(conversation_text: str, cache: InsightCache | None = None) -> dict:
+    """
+    Chama o modelo e devolve o JSON de insights. Com `cache`, uma conversa idêntica já
+    analisada (com a mesma versão do prompt) é respondida sem chamar o modelo.
+    Erros da API são propagados para quem chamou.
+    """
+    tracing.set_attributes({"request.chars": len(conversation_text)})
+    key = InsightCache.key(conversation_text) if cache is not None else None
+    if cache is not None:
+        cached = cache.get(key)
+        tracing.set_attributes({"cache.hit": cached is not None})
+        if cached is not None:
+            return cached
+
+    response = openai.chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": config.INSIGHT_SYSTEM_PROMPT},
+            {"role": "user", "content": config.CONVERSATION_INSIGHT_PROMPT.format(conversation_text=conversation_text)}
+        ],
+        response_format={"type": "json_object"}
+    )
+    tracing.set_token_usage(tracing.current_span(), response.usage)
+    insights = json.loads(response.choices[0].message.content)
+    if cache is not None:
+        cache.put(key, insights)
+    return insights
+
+class InsightStore(_TicketJsonStore):
+    """
+    Último insight gerado para cada ticket, salvo como JSON em `directory`, junto com
+    a maior `ordemmensagens` considerada. Assim dá para saber se chegaram mensagens
+    novas desde a última geração.
+    """
+
+    def __init__(self, directory: str = config.INSIGHT_STORE_DIR):
+        super().__init__(directory)
+
+    def get(self, ticket_id) -> dict | None:
+        """Registro salvo do ticket (`insights`, `last_ordemmensagens`, `generated_at`), se houver."""
+        return self._read(ticket_id)
+
+    def save(self, ticket_id, insights: dict, last_ordemmensagens: int) -> dict:
+        return self._write(ticket_id, {
+            "ticket_id": str(ticket_id),
+            "insights": insights,
+            "last_ordemmensagens": int(last_ordemmensagens),
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+    @staticmethod
+    def is_fresh(record: dict | None, messages_df: pd.DataFrame) -> bool:
+        """True se o insight salvo já considerou a mensagem mais recente da conversa."""
+        if not record or messages_df.empty:
+            return False
+        return record["last_ordemmensagens"] >= int(messages_df['ordemmensagens'].max())
@@ -1,8 +1,13 @@
 import streamlit as st
 import pandas as pd
-import json
+import math
+import time
 from collections import defaultdict
-import services
+import config
+import conversations
+import insights as insights_lib
+import realtime_feed
+import tracing
 from datetime import datetime
 
 st.set_page_config(page_title="Conversas", layout="wide")
@@ -12,55 +17,79 @@ if 'conn' not in st.session_state:
     st.stop()
 conn = st.session_state.conn
 
-@st.cache_data(ttl=300)
-def get_conversations(_conn):
-    """Busca e processa todas as mensagens do Supabase."""
+@st.cache_resource
+def get_conversation_store():
+    """Cópia local das mensagens, compartilhada entre as sessões e persistida em disco."""
+    return conversations.ConversationStore(config.CONVERSATION_STORE_PATH)
+
+@st.cache_resource
+def get_message_feed(_conn):
+    """
+    Ingestão em tempo real (uma por servidor) alimentando a store compartilhada, ou None
+    se desligada ou se o canal não puder ser aberto (a página volta a consultar o banco).
+    """
+    if not config.REALTIME_ENABLED:
+        return None
     try:
-        response = _conn.rpc('get_messages_data').execute()
-        if not response.data or not isinstance(response.data, list):
-            return pd.DataFrame()
-        df = pd.DataFrame(response.data)
-        df['curso'] = df['tags'].apply(lambda x: x.split(',')[0].strip() if x and isinstance(x, str) else 'Não especificado')
-        df['ordemmensagens'] = pd.to_numeric(df['ordemmensagens'], errors='coerce')
-        df.dropna(subset=['ordemmensagens'], inplace=True)
-        df['ordemmensagens'] = df['ordemmensagens'].astype(int)
-        return df
+        source = realtime_feed.SupabaseRealtimeSource(st.secrets["supabase_url"], st.secrets["supabase_key"])
+        return realtime_feed.MessageFeed(get_conversation_store(), _conn, source).start()
     except Exception as e:
-        st.error(f"Ocorreu um erro ao executar a função do Supabase: {e}")
-        return pd.DataFrame()
+        st.warning(f"Atualização em tempo real indisponível: {e}")
+        return None
+
+def get_conversations(_conn):
+    """
+    Retorna todas as mensagens junto com o resumo por ticket (última mensagem, contagem,
+    negociação, curso). Com o canal em tempo real conectado, as mensagens novas já chegam
+    à store por push e o banco só é consultado de vez em quando, por segurança; sem ele,
+    sincroniza apenas as mensagens novas do Supabase. O painel chama isto a cada
+    REALTIME_REFRESH_SECONDS: só as chamadas que consultam o banco viram span.
+    """
+    store = get_conversation_store()
+    feed = get_message_feed(_conn)
+    pushing = feed is not None and feed.connected and not feed.last_error
+    interval = config.REALTIME_RESYNC_SECONDS if pushing else config.CONVERSATIONS_SYNC_INTERVAL_SECONDS
+    if store.sync_due(interval):
+        with tracing.span("conversas.get_conversations") as span:
+            try:
+                store.sync(_conn, min_interval=interval)
+            except Exception as e:
+                span.record_error(e)
+                st.error(f"Ocorreu um erro ao executar a função do Supabase: {e}")
+    return store.snapshot()
+
+@st.cache_resource
+def get_insight_store():
+    """Insights salvos por ticket (também preenchidos pelo job batch_insights.py)."""
+    return insights_lib.InsightStore(config.INSIGHT_STORE_DIR)
+
+@st.cache_resource
+def get_summary_store():
+    """Resumos acumulados das conversas longas, reaproveitados entre execuções (e pelo job em lote)."""
+    return insights_lib.SummaryStore(config.INSIGHT_SUMMARY_DIR)
+
+@st.cache_resource
+def get_insight_cache():
+    """Cache de insights endereçado pelo conteúdo da conversa, compartilhado entre as sessões."""
+    return insights_lib.InsightCache(config.INSIGHT_CACHE_PATH, config.INSIGHT_CACHE_MAX_BYTES)
+
+@tracing.traced("conversas.generate_insights_from_conversation")
+def generate_insights_from_conversation(ticket_id, messages_df: pd.DataFrame):
+    """Gera insights de IA a partir de uma conversa, reaproveitando o salvo se não houver mensagens novas."""
+    insight_store = get_insight_store()
+    record = insight_store.get(ticket_id)
+    if insight_store.is_fresh(record, messages_df):
+        st.session_state.insights = record['insights']
+        st.toast("Os insights já estão atualizados com a última mensagem.", icon="✅")
+        return
 
-def generate_insights_from_conversation(messages_df: pd.DataFrame):
-    """Gera insights de IA a partir de uma conversa."""
     with st.spinner("Analisando conversa com a IA..."):
         try:
-            messages_df = messages_df.sort_values('ordemmensagens')
-            conversation_text = "\n".join([
-                f"{'Cliente' if str(row['message_id']).startswith('wamid') else 'Vendedor'}: {row['mensagem']}"
-                for _, row in messages_df.tail(30).iterrows()
-            ])
-            prompt = f"""
-            Você é um especialista em análise de conversas de vendas B2C. Analise a conversa abaixo e retorne APENAS um JSON válido com os seguintes campos:
-            === CONVERSA ===
-            {conversation_text}
-            === INSTRUÇÕES ===
-            Responda APENAS com um objeto JSON contendo as seguintes chaves:
-            - "resumo": "Um resumo conciso do que já foi conversado."
-            - "objecao": "Se houver uma objeção clara (preço, tempo, etc.), descreva-a. Se não, retorne 'Nenhuma objeção clara identificada'."
-            - "ponto_fraco": "Identifique um ponto de dor ou necessidade do cliente que pode ser explorado para facilitar a venda. Se não houver, retorne 'Nenhum ponto fraco evidente'."
-            - "follow_up": {{
-                "estrategia": "Descreva em uma frase a estratégia para a próxima mensagem de follow up.",
-                "copy": "Escreva a mensagem exata (a 'copy') para ser enviada ao cliente, baseada na estratégia."
-              }}
-            """
-            response = services.openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a sales analysis AI. Always return valid, complete JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
+            conversation_text = insights_lib.build_conversation_context(
+                ticket_id, messages_df, get_summary_store(), max_folds=config.INSIGHT_INTERACTIVE_MAX_FOLDS,
             )
-            insights = json.loads(response.choices[0].message.content)
+            insights = insights_lib.generate_insights(conversation_text, cache=get_insight_cache())
+            insight_store.save(ticket_id, insights, messages_df['ordemmensagens'].max())
             st.session_state.insights = insights
             st.toast("Insights gerados com sucesso!", icon="✨")
         except Exception as e:
@@ -68,120 +97,173 @@ def generate_insights_from_conversation(messages_df: pd.DataFrame):
             if 'insights' in st.session_state:
                 del st.session_state.insights
 
-def format_timestamp(ts_str):
-    """Formata a data/hora para exibição de forma segura."""
-    if not ts_str or not isinstance(ts_str, str):
-        return "--"
-    try:
-        dt = datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
-        return dt.strftime('%d/%m %H:%M')
-    except ValueError:
+def format_timestamp(ts):
+    """Formata a data/hora para exibição de forma segura (datetime já convertido ou texto ISO)."""
+    if isinstance(ts, str):
+        try:
+            ts = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+        except ValueError:
+            return "--"
+    if not isinstance(ts, datetime) or pd.isna(ts):
         return "--"
+    return ts.strftime('%d/%m %H:%M')
+
+def realtime_status() -> str:
+    """Legenda com o estado da atualização das conversas."""
+    feed = get_message_feed(conn)
+    if feed is None:
+        return f"🟡 Atualização a cada {config.CONVERSATIONS_SYNC_INTERVAL_SECONDS} s"
+    error = f" (último erro: {feed.last_error})" if feed.last_error else ""
+    if not feed.connected:
+        return f"🟠 Tempo real fora do ar, reconectando; enquanto isso, atualização a cada {config.CONVERSATIONS_SYNC_INTERVAL_SECONDS} s{error}"
+    if feed.last_error:
+        return f"🟠 Falha ao aplicar as mensagens em tempo real, tentando de novo; enquanto isso, atualização a cada {config.CONVERSATIONS_SYNC_INTERVAL_SECONDS} s{error}"
+    if feed.last_event_at is None:
+        return "🟢 Tempo real: conectado"
+    return f"🟢 Tempo real: última mensagem recebida há {time.time() - feed.last_event_at:.0f} s"
 
 # --- RENDERIZAÇÃO DA PÁGINA ---
 st.title("📬 Dashboard de Vendas IA")
 st.caption("Insights acionáveis e métricas de conversão em tempo real")
 
-all_messages_df = get_conversations(conn)
+# Com o tempo real ligado, o painel se relê sozinho: as mensagens que chegaram por push
+# (já aplicadas à store em memória) aparecem sem recarregar a página nem consultar o banco
+@st.fragment(run_every=config.REALTIME_REFRESH_SECONDS if config.REALTIME_ENABLED else None)
+def render_dashboard():
+    all_messages_df, ticket_summary = get_conversations(conn)
+    st.caption(realtime_status())
 
-if all_messages_df.empty:
-    st.warning("Não há dados de conversas para exibir.")
-    st.stop()
-    
-conversations = all_messages_df.groupby('ticket_id')
-
-total_conversas = len(conversations)
-conversas_em_negociacao = sum(1 for _, group in conversations if group['em_negociacao'].any())
-taxa_conversao = (conversas_em_negociacao / total_conversas * 100) if total_conversas > 0 else 0
-
-kpi1, kpi2, kpi3 = st.columns(3)
-kpi1.metric(label="Conversas Totais", value=total_conversas)
-kpi2.metric(label="Em Negociação", value=conversas_em_negociacao)
-kpi3.metric(label="Taxa Conversão", value=f"{taxa_conversao:.0f}%")
-
-st.divider()
-
-# --- BARRA DE FERRAMENTAS ---
-search_col, filter_col, _ = st.columns([3, 1, 1]) # Adiciona coluna extra para espaçamento
-search_term = search_col.text_input("Buscar...", placeholder="Buscar por cliente ou conteúdo...", label_visibility="collapsed")
-negociacao_status = filter_col.toggle("Apenas em Negociação", value=True)
-
-# --- LÓGICA DE FILTRAGEM ---
-filtered_conversations = []
-for ticket_id, group in conversations:
-    if negociacao_status and not group['em_negociacao'].any():
-        continue
-    if search_term and not (group['user_identity'].iloc[0].lower().strip().startswith(search_term.lower().strip()) or group['mensagem'].str.lower().str.contains(search_term.lower(), na=False).any()):
-        continue
-    filtered_conversations.append((ticket_id, group))
-
-# --- INICIALIZAÇÃO DO ESTADO DA SESSÃO ---
-if 'selected_ticket_id' not in st.session_state:
-    st.session_state.selected_ticket_id = None
-
-# --- RENDERIZAÇÃO CONDICIONAL: LISTA OU DETALHES ---
-if st.session_state.selected_ticket_id:
-    # --- VISTA DE DETALHES DA CONVERSA ---
-    # (Esta parte já usa componentes padrão do Streamlit e não precisa de grandes mudanças)
-    ticket_id = st.session_state.selected_ticket_id
-    messages_df = conversations.get_group(ticket_id)
-    first_row = messages_df.iloc[0]
-
-    if st.button("⬅️ Voltar para a lista"):
-        st.session_state.selected_ticket_id = None
-        st.session_state.insights = None
-        st.rerun()
-
-    st.header(f"Conversa: {ticket_id}")
-    st.caption(f"Cliente: {first_row['user_identity']} | Curso de Interesse: {first_row['curso']}")
-    
-    if st.button("✨ Gerar Insights com IA"):
-        st.session_state.insights = None
-        generate_insights_from_conversation(messages_df)
-
-    if 'insights' in st.session_state and st.session_state.insights:
-        insights = st.session_state.insights
-        with st.container(border=True):
-            st.subheader("🧠 Insights Gerados pela IA")
-            st.markdown(f"**Resumo:** {insights.get('resumo', 'N/A')}")
-            st.markdown(f"**Objeção Identificada:** {insights.get('objecao', 'N/A')}")
-            st.markdown(f"**Ponto a Explorar:** {insights.get('ponto_fraco', 'N/A')}")
-            
-            follow_up = insights.get('follow_up', {})
-            with st.expander("**Estratégia e Copy de Follow-up**"):
-                st.markdown(f"**Estratégia:** {follow_up.get('estrategia', 'N/A')}")
-                st.markdown("**Próxima Mensagem (Copy):**")
-                st.code(follow_up.get('copy', 'N/A'), language=None)
+    if ticket_summary.empty:
+        st.warning("Não há dados de conversas para exibir.")
+        return
+
+    total_conversas = len(ticket_summary)
+    conversas_em_negociacao = int(ticket_summary['em_negociacao'].sum())
+    taxa_conversao = (conversas_em_negociacao / total_conversas * 100) if total_conversas > 0 else 0
+
+    kpi1, kpi2, kpi3 = st.columns(3)
+    kpi1.metric(label="Conversas Totais", value=total_conversas)
+    kpi2.metric(label="Em Negociação", value=conversas_em_negociacao)
+    kpi3.metric(label="Taxa Conversão", value=f"{taxa_conversao:.0f}%")
 
     st.divider()
-    
-    with st.container(height=500):
-        for _, msg in messages_df.sort_values('ordemmensagens').iterrows():
-            is_client = str(msg['message_id']).startswith('wamid')
-            sender_name = msg['user_identity'] if is_client else msg['from_message']
-            
-            with st.chat_message("user" if is_client else "assistant"):
-                st.write(msg.get('mensagem', '*Mensagem vazia*'))
-                st.caption(f"{sender_name} - {format_timestamp(msg.get('data_hora'))}")
-else:
-    # --- VISTA DE LISTA DE CONVERSAS ---
-    st.write(f"{len(filtered_conversations)} de {total_conversas} conversas")
-
-    for ticket_id, group in filtered_conversations:
-        group = group.sort_values('ordemmensagens', ascending=False)
-        last_msg = group.iloc[0]
-        
-        with st.container(border=True):
-            col1, col2, col3 = st.columns([4, 1, 1])
-            with col1:
-                st.subheader(f"{last_msg['user_identity']}")
-                st.caption(f"Ticket: {ticket_id} | Curso: {last_msg['curso']}")
-                st.text(f"{last_msg['mensagem']}")
-            with col2:
-                st.metric("Mensagens", len(group))
-                if last_msg['em_negociacao']:
-                    st.success("Negociando")
-            with col3:
-                if st.button("Analisar", key=ticket_id, use_container_width=True):
-                    st.session_state.selected_ticket_id = ticket_id
-                    st.rerun()
\ No newline at end of file
+
+    # --- BARRA DE FERRAMENTAS ---
+    search_col, filter_col, sort_col, size_col = st.columns([3, 1, 1, 1])
+    search_term = search_col.text_input("Buscar...", placeholder="Buscar por cliente ou conteúdo...", label_visibility="collapsed")
+    negociacao_status = filter_col.toggle("Apenas em Negociação", value=True)
+    sort_order = sort_col.selectbox("Ordenar por", conversations.SORT_OPTIONS, key="conv_sort", label_visibility="collapsed")
+    page_size = size_col.selectbox("Por página", config.CONVERSATIONS_PAGE_SIZES, key="conv_page_size", format_func=lambda n: f"{n} por página", label_visibility="collapsed")
+
+    # --- LÓGICA DE FILTRAGEM ---
+    filtered_conversations = conversations.filter_conversations(
+        ticket_summary, get_conversation_store().search_index, search_term, negociacao_status, sort_order
+    )
+
+    # --- INICIALIZAÇÃO DO ESTADO DA SESSÃO ---
+    if 'selected_ticket_id' not in st.session_state:
+        st.session_state.selected_ticket_id = None
+
+    # Volta para a primeira página sempre que a busca, o filtro ou a ordenação mudam
+    list_signature = (search_term.strip(), negociacao_status, sort_order, page_size)
+    if st.session_state.get('conv_list_signature') != list_signature:
+        st.session_state.conv_list_signature = list_signature
+        st.session_state.conv_page = 0
+
+    # --- RENDERIZAÇÃO CONDICIONAL: LISTA OU DETALHES ---
+    if st.session_state.selected_ticket_id:
+        # --- VISTA DE DETALHES DA CONVERSA ---
+        # (Esta parte já usa componentes padrão do Streamlit e não precisa de grandes mudanças)
+        ticket_id = st.session_state.selected_ticket_id
+        messages_df = conversations.ticket_messages(all_messages_df, ticket_id)
+        ticket_info = ticket_summary.loc[ticket_id]
+
+        if st.button("⬅️ Voltar para a lista"):
+            st.session_state.selected_ticket_id = None
+            st.session_state.insights = None
+            st.rerun()
+
+        st.header(f"Conversa: {ticket_id}")
+        st.caption(f"Cliente: {ticket_info['user_identity']} | Curso de Interesse: {ticket_info['curso']}")
+
+        if st.button("✨ Gerar Insights com IA"):
+            st.session_state.insights = None
+            generate_insights_from_conversation(ticket_id, messages_df)
+
+        # Insights salvos (pela página ou pelo job em lote) aparecem na hora, sem chamar a IA
+        stored_record = get_insight_store().get(ticket_id)
+        if not st.session_state.get('insights') and stored_record:
+            st.session_state.insights = stored_record['insights']
+
+        if 'insights' in st.session_state and st.session_state.insights:
+            insights = st.session_state.insights
+            with st.container(border=True):
+                st.subheader("🧠 Insights Gerados pela IA")
+                if stored_record:
+                    generated_at = format_timestamp(stored_record.get('generated_at'))
+                    if get_insight_store().is_fresh(stored_record, messages_df):
+                        st.caption(f"Gerado em {generated_at}")
+                    else:
+                        st.caption(f"Gerado em {generated_at} · há mensagens novas desde então, gere novamente para atualizar")
+                cache_stats = get_insight_cache().stats()
+                st.caption(f"Cache de insights: {cache_stats['entries']} conversas · taxa de acerto {cache_stats['hit_rate']:.0%}")
+                st.markdown(f"**Resumo:** {insights.get('resumo', 'N/A')}")
+                st.markdown(f"**Objeção Identificada:** {insights.get('objecao', 'N/A')}")
+                st.markdown(f"**Ponto a Explorar:** {insights.get('ponto_fraco', 'N/A')}")
+
+                follow_up = insights.get('follow_up', {})
+                with st.expander("**Estratégia e Copy de Follow-up**"):
+                    st.markdown(f"**Estratégia:** {follow_up.get('estrategia', 'N/A')}")
+                    st.markdown("**Próxima Mensagem (Copy):**")
+                    st.code(follow_up.get('copy', 'N/A'), language=None)
+
+        st.divider()
+
+        with st.container(height=500):
+            for _, msg in messages_df.iterrows():
+                is_client = str(msg['message_id']).startswith('wamid')
+                sender_name = msg['user_identity'] if is_client else msg['from_message']
+
+                with st.chat_message("user" if is_client else "assistant"):
+                    st.write(msg.get('mensagem', '*Mensagem vazia*'))
+                    st.caption(f"{sender_name} - {format_timestamp(msg.get('data_hora'))}")
+    else:
+        # --- VISTA DE LISTA DE CONVERSAS ---
+        # Apenas a fatia da página atual é transformada em widgets
+        render_start = time.perf_counter()
+        total_pages = max(1, math.ceil(len(filtered_conversations) / page_size))
+        st.session_state.conv_page = min(st.session_state.conv_page, total_pages - 1)
+        page_start = st.session_state.conv_page * page_size
+        page_conversations = filtered_conversations.iloc[page_start:page_start + page_size]
+
+        st.write(f"{len(filtered_conversations)} de {total_conversas} conversas")
+
+        for ticket_id, conversation in page_conversations.iterrows():
+            with st.container(border=True):
+                col1, col2, col3 = st.columns([4, 1, 1])
+                with col1:
+                    st.subheader(f"{conversation['user_identity']}")
+                    st.caption(f"Ticket: {ticket_id} | Curso: {conversation['curso']}")
+                    st.text(f"{conversation['ultima_mensagem']}")
+                with col2:
+                    st.metric("Mensagens", int(conversation['mensagens']))
+                    if conversation['ultima_em_negociacao']:
+                        st.success("Negociando")
+                with col3:
+                    if st.button("Analisar", key=ticket_id, use_container_width=True):
+                        st.session_state.selected_ticket_id = ticket_id
+                        st.rerun()
+
+        # --- PAGINAÇÃO ---
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        if prev_col.button("⬅️ Anterior", disabled=st.session_state.conv_page == 0, use_container_width=True):
+            st.session_state.conv_page -= 1
+            st.rerun()
+        info_col.markdown(f"<div style='text-align: center'>Página {st.session_state.conv_page + 1} de {total_pages}</div>", unsafe_allow_html=True)
+        if next_col.button("Próxima ➡️", disabled=st.session_state.conv_page >= total_pages - 1, use_container_width=True):
+            st.session_state.conv_page += 1
+            st.rerun()
+
+        st.caption(f"⏱️ Lista renderizada em {(time.perf_counter() - render_start) * 1000:.0f} ms")
+
+render_dashboard()
\ No newline at end of file
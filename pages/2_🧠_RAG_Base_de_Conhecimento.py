@@ -22,31 +22,44 @@ if prompt := st.chat_input("Qual a sua dúvida?"):
 
     with st.chat_message("assistant"):
         with st.spinner("Analisando e buscando informações..."):
-            # ... (o resto do código permanece o mesmo)
-            st.write("1️⃣ **Classificando a intenção...**")
-            specialties = services.classify_query(prompt, config.CLASSIFIER_SYSTEM_PROMPT)
-            
-            if not specialties:
-                st.warning("Nenhuma especialidade específica identificada. A busca pode ser menos precisa.")
-            else:
-                st.write(f"✅ **Especialidades identificadas:** `{'`, `'.join(specialties)}`")
-            
-            st.write("2️⃣ **Buscando na base de conhecimento...**")
-            rag_content, citations = services.query_pinecone_assistant(prompt)
-            
-            if "Erro" in rag_content or "Não foi possível" in rag_content:
-                st.error(rag_content)
-            else:
-                st.write("✅ **Informações relevantes encontradas!**")
-                
-                st.write("3️⃣ **Gerando insight com o Estrategista de Vendas AI...**")
-                final_response = services.get_sales_insight(
-                    user_query=prompt,
-                    specialties=specialties,
-                    rag_content=rag_content,
-                    citations=citations,
-                    system_prompt=config.SALES_COACH_SYSTEM_PROMPT
-                )
-                
-                st.markdown(final_response)
-                st.session_state.rag_messages.append({"role": "assistant", "content": final_response})
\ No newline at end of file
+            st.write("1️⃣ **Classificando a intenção e buscando na base de conhecimento...**")
+
+            def show_context(result):
+                """Exibe o resultado da classificação e da busca antes da geração do insight."""
+                specialties = result["specialties"]
+                if not specialties:
+                    st.warning("Nenhuma especialidade específica identificada. A busca pode ser menos precisa.")
+                else:
+                    st.write(f"✅ **Especialidades identificadas:** `{'`, `'.join(specialties)}`")
+
+                if result["rag_error"]:
+                    st.error(result["rag_content"])
+                else:
+                    if result["rag_partial"]:
+                        st.warning("Parte das especialidades não respondeu; o insight usa as que trouxeram conteúdo.")
+                    st.write("✅ **Informações relevantes encontradas!**")
+                    st.write("2️⃣ **Gerando insight com o Estrategista de Vendas AI...**")
+
+            def show_rag_stream(rag_stream):
+                """Exibe a resposta da base de conhecimento à medida que ela chega."""
+                with st.expander("📚 Resposta da base de conhecimento"):
+                    st.write_stream(rag_stream)
+
+            result = services.run_rag_pipeline(
+                user_query=prompt,
+                classifier_prompt=config.CLASSIFIER_SYSTEM_PROMPT,
+                coach_prompt=config.SALES_COACH_SYSTEM_PROMPT,
+                on_context=show_context,
+                stream=True,
+                on_rag_stream=show_rag_stream
+            )
+
+            insight_stream = result["insight"]
+            if insight_stream is not None:
+                st.write_stream(insight_stream)
+                st.session_state.rag_messages.append({"role": "assistant", "content": insight_stream.text})
+
+            st.caption(f"⏱️ {services.format_timings(result['timings'])}")
+            if result["cache_match"]:
+                cache_stats = services.get_rag_cache().stats()
+                st.caption(f"⚡ Resposta recuperada do cache (correspondência {result['cache_match']}) · taxa de acerto {cache_stats['hit_rate']:.0%}")
\ No newline at end of file
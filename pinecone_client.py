@@ -0,0 +1,203 @@
+# pinecone_client.py
+"""
+Cliente HTTP do assistente de chat do Pinecone. Reaproveita conexões (sessão com
+pool keep-alive), separa timeout de conexão e de leitura, refaz requisições que
+falham de forma transitória (429/5xx, queda de conexão) com backoff exponencial
+com jitter e abre um circuit breaker quando o serviço falha seguidamente.
+"""
+import bisect
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """O circuit breaker está aberto: a chamada nem chegou a ser feita."""
+
+class CircuitBreaker:
+    """
+    Após `failure_threshold` chamadas seguidas com falha, recusa chamadas por `cooldown` segundos.
+    Passado esse tempo, deixa uma chamada de teste passar (meio-aberto): se ela der
+    certo o circuito fecha, se falhar volta a abrir.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "fechado"
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                return "meio-aberto"
+            return "aberto"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+class LatencyHistogram:
+    """Histograma cumulativo de latências (em segundos), no formato de buckets do Prometheus."""
+
+    DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # último bucket: +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self._sum += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total = sum(counts)
+            cumulative, running = {}, 0
+            for bound, count in zip([*self.buckets, float("inf")], counts):
+                running += count
+                cumulative[f"le_{bound}"] = running
+            return {"count": total, "sum": self._sum, "mean": self._sum / total if total else 0.0, "buckets": cumulative}
+
+    def quantile(self, q: float) -> float:
+        """Estimativa do quantil `q` (limite superior do bucket que o contém)."""
+        with self._lock:
+            total = sum(self._counts)
+            if not total:
+                return 0.0
+            running = 0
+            for bound, count in zip([*self.buckets, float("inf")], self._counts):
+                running += count
+                if running >= q * total:
+                    return bound
+            return float("inf")
+
+class PineconeAssistantClient:
+    """Cliente reutilizável (e seguro entre threads) para `POST /assistant/chat/<assistente>`."""
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 30.0,
+        pool_size: int = 8,
+    ):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.latency = LatencyHistogram()
+        self.retries = 0
+
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json", "Api-Key": api_key})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff(self, attempt: int, response: requests.Response | None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.backoff_cap, float(retry_after))
+            except ValueError:
+                pass
+        return min(self.backoff_cap, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def chat(self, user_query: str, stream: bool = False, model: str = "gpt-4o",
+             filter: dict | None = None, url: str | None = None) -> requests.Response:
+        """
+        Envia a pergunta e devolve a resposta HTTP já validada (status 2xx). Com
+        `stream=True` o corpo é lido sob demanda (SSE) e as novas tentativas só
+        acontecem antes de a resposta começar a chegar. `filter` restringe a busca
+        pelos metadados dos arquivos; `url` envia a outro assistente com a mesma chave
+        (a sessão, os retries e o circuit breaker são compartilhados).
+        """
+        body = {
+            "messages": [{"role": "user", "content": user_query}],
+            "stream": stream,
+            "model": model,
+        }
+        if filter:
+            body["filter"] = filter
+        if not self.breaker.allow():
+            raise CircuitOpenError("Base de conhecimento temporariamente indisponível (circuit breaker aberto).")
+
+        # O breaker conta uma falha por chamada, não por tentativa; o `finally` registra o resultado
+        # de qualquer saída (inclusive exceções não previstas), liberando a chamada de teste do meio-aberto
+        healthy = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                response = None
+                start = time.perf_counter()
+                try:
+                    response = self.session.post(url or self.url, json=body, timeout=self.timeout, stream=stream)
+                    self.latency.observe(time.perf_counter() - start)
+                    if response.status_code not in RETRYABLE_STATUS:
+                        healthy = True  # 4xx definitivos são erro da requisição, não do serviço
+                        response.raise_for_status()
+                        return response
+                    error = requests.exceptions.HTTPError(f"{response.status_code} do Pinecone", response=response)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    self.latency.observe(time.perf_counter() - start)
+                    error = e
+
+                if response is not None:
+                    response.close()
+                if attempt == self.max_retries:
+                    raise error
+                self.retries += 1
+                time.sleep(self._backoff(attempt, response))
+        finally:
+            if healthy:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.state,
+            "retries": self.retries,
+            "latency": self.latency.snapshot(),
+            "p50": self.latency.quantile(0.5),
+            "p95": self.latency.quantile(0.95),
+        }
@@ -0,0 +1,261 @@
+# realtime_feed.py
+"""
+Ingestão das mensagens em tempo real. A `MessageFeed` recebe os INSERT/UPDATE da
+tabela de mensagens assim que acontecem (canal `postgres_changes` do Supabase
+Realtime, ou o `LocalChangeSource` no desenvolvimento e nos benchmarks) e aplica os
+deltas à ConversationStore compartilhada em lotes curtos: só os tickets afetados têm
+o resumo e o índice de busca recalculados, sem nova consulta ao banco.
+
+Os eventos trazem a linha da tabela, não a do RPC `get_messages_data` (que junta
+ticket, tags e cliente); quando faltam colunas, as mensagens do lote são buscadas no
+RPC pelo `message_id`. A cada (re)conexão do canal, uma sincronização incremental pelo
+watermark recupera o que tenha chegado enquanto ele estava fora.
+"""
+import asyncio
+import threading
+import time
+
+import config
+import conversations
+import tracing
+
+SUBSCRIBED = "SUBSCRIBED"
+DISCONNECTED = "desconectado"
+
+def _change_from_payload(payload: dict) -> dict:
+    """Evento no formato usado aqui ({type, record}) a partir do payload do Supabase Realtime."""
+    data = payload.get("data", payload)
+    change_type = data.get("type")
+    return {"type": str(getattr(change_type, "value", change_type)), "record": data.get("record") or {}}
+
+class SupabaseRealtimeSource:
+    """
+    Canal `postgres_changes` do Supabase Realtime, com o loop asyncio em uma thread própria.
+
+    A biblioteca não avisa quando o socket cai: na reconexão ela só marca o canal como
+    ERRORED e, esgotadas as tentativas, desiste em silêncio. Por isso `connected` lê o
+    estado do canal e do socket, e uma verificação periódica informa a queda (e a volta,
+    que pede a sincronização pelo watermark) a `on_status`; se o canal ficar fora por mais
+    de REALTIME_RECONNECT_SECONDS, o cliente é recriado.
+    """
+
+    def __init__(self, url: str, key: str, schema: str = config.REALTIME_SCHEMA, table: str = config.REALTIME_TABLE):
+        self.url = url
+        self.key = key
+        self.schema = schema
+        self.table = table
+        self._loop = None
+        self._stopped = None
+        self._thread = None
+        self._client = None
+        self._channel = None
+
+    @property
+    def connected(self) -> bool:
+        client, channel = self._client, self._channel
+        return client is not None and channel is not None and channel.is_joined and client.realtime.is_connected
+
+    def start(self, on_event, on_status):
+        self._thread = threading.Thread(target=asyncio.run, args=(self._listen(on_event, on_status),), name="realtime-canal", daemon=True)
+        self._thread.start()
+
+    async def _listen(self, on_event, on_status):
+        from supabase import acreate_client  # Só quem usa o Realtime precisa do cliente assíncrono
+
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        while not self._stopped.is_set():
+            try:
+                self._client = await acreate_client(self.url, self.key)
+                self._channel = self._client.channel(f"conversas-{self.table}")
+                for event in ("INSERT", "UPDATE"):
+                    self._channel.on_postgres_changes(event, schema=self.schema, table=self.table,
+                                                      callback=lambda payload: on_event(_change_from_payload(payload)))
+                await self._channel.subscribe(lambda state, error: on_status(str(getattr(state, "value", state)), error))
+                await self._watch(on_status)
+            except Exception as e:
+                on_status(DISCONNECTED, e)
+            finally:
+                await self._close()
+            if not self._stopped.is_set():
+                await self._wait_stopped(config.REALTIME_HEALTH_CHECK_SECONDS)
+
+    async def _watch(self, on_status):
+        """Acompanha o canal até a parada ou até ele ficar fora por mais de REALTIME_RECONNECT_SECONDS."""
+        live, down_since = None, None
+        while not await self._wait_stopped(config.REALTIME_HEALTH_CHECK_SECONDS):
+            if self.connected:
+                if live is False:
+                    on_status(SUBSCRIBED, None)  # A biblioteca voltou a entrar no canal sozinha
+                live, down_since = True, None
+                continue
+            if live:
+                on_status(DISCONNECTED, None)
+            live = False
+            down_since = down_since or time.monotonic()
+            if time.monotonic() - down_since >= config.REALTIME_RECONNECT_SECONDS:
+                return
+
+    async def _wait_stopped(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._stopped.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _close(self):
+        client, self._client, self._channel = self._client, None, None
+        if client is None:
+            return
+        try:
+            await asyncio.wait_for(client.remove_all_channels(), config.REALTIME_HEALTH_CHECK_SECONDS)
+        except Exception:
+            pass  # O socket já pode ter caído; o cliente é descartado de qualquer forma
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+class LocalChangeSource:
+    """
+    Substituto local do canal do Supabase: `publish` entrega o evento como o Realtime
+    entregaria. Útil para desenvolvimento sem banco e para os benchmarks.
+    """
+
+    def __init__(self):
+        self._on_event = None
+
+    @property
+    def connected(self) -> bool:
+        return self._on_event is not None
+
+    def start(self, on_event, on_status):
+        self._on_event = on_event
+        on_status(SUBSCRIBED, None)
+
+    def publish(self, record: dict, change_type: str = "INSERT"):
+        self._on_event({"type": change_type, "record": record})
+
+    def stop(self):
+        self._on_event = None
+
+class MessageFeed:
+    """
+    Aplica à `store` as mudanças recebidas de `source`. Eventos que chegam dentro de
+    `batch_seconds` viram um único merge (várias mensagens de uma conversa, um único
+    recálculo do ticket). `on_change`, se informado, recebe os tickets afetados por lote.
+    """
+
+    def __init__(self, store: conversations.ConversationStore, conn, source, batch_seconds: float = config.REALTIME_BATCH_SECONDS,
+                 save_interval: float = config.REALTIME_SAVE_INTERVAL_SECONDS, on_change=None):
+        self.store = store
+        self.conn = conn
+        self.source = source
+        self.batch_seconds = batch_seconds
+        self.save_interval = save_interval
+        self.on_change = on_change
+        self.status = DISCONNECTED
+        self.events = 0
+        self.batches = 0
+        self.fetched = 0
+        self.last_event_at = None
+        self.last_error = None
+        self._pending = []
+        self._resync = False
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def connected(self) -> bool:
+        """Se as mensagens estão chegando por push: inscrição confirmada e canal de fato ativo."""
+        return self.status == SUBSCRIBED and self.source.connected
+
+    def start(self) -> "MessageFeed":
+        self._thread = threading.Thread(target=self._run, name="realtime-ingestao", daemon=True)
+        self._thread.start()
+        self.source.start(self._on_event, self._on_status)
+        return self
+
+    def stop(self):
+        self.source.stop()
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _on_event(self, event: dict):
+        if event.get("type") not in ("INSERT", "UPDATE") or not event.get("record"):
+            return
+        with self._lock:
+            self._pending.append(event["record"])
+            self.events += 1
+            self.last_event_at = time.time()
+        self._wake.set()
+
+    def _on_status(self, status: str, error=None):
+        self.status = status
+        if error is not None:
+            self.last_error = str(error)
+        if status == SUBSCRIBED:
+            with self._lock:
+                self._resync = True
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait()
+            # Espera o lote se formar: mensagens em rajada entram no mesmo merge
+            self._stopped.wait(self.batch_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+                self.last_error = None
+                self._failures = 0
+            except Exception as e:
+                # O lote volta para a fila (flush) e é tentado de novo com backoff; o span do flush
+                # registra o erro e a página mostra o last_error
+                self.last_error = str(e)
+                self._failures += 1
+                if self._failures >= config.REALTIME_RETRY_ATTEMPTS:
+                    with self._lock:
+                        self._pending = []  # Um lote que falha sempre não trava a ingestão: fica para a sincronização
+                        self._resync = True
+                self._stopped.wait(min(config.REALTIME_RETRY_MAX_SECONDS, self.batch_seconds * 2 ** self._failures))
+                self._wake.set()
+
+    @tracing.traced("realtime_feed.MessageFeed.flush")
+    def flush(self) -> int:
+        """
+        Aplica os eventos pendentes (e a sincronização pedida por uma reconexão); retorna quantas
+        linhas entraram. Em caso de erro, os eventos voltam para a fila.
+        """
+        with self._lock:
+            records, self._pending = self._pending, []
+            resync, self._resync = self._resync, False
+        try:
+            return self._apply(records, resync)
+        except BaseException:
+            with self._lock:
+                self._pending[:0] = records
+                self._resync = self._resync or resync
+            raise
+
+    def _apply(self, records: list, resync: bool) -> int:
+        applied = self.store.sync(self.conn) if resync else 0
+        if records:
+            # A última versão de cada mensagem vence
+            latest = {record.get("message_id"): record for record in records}
+            complete = [record for record in latest.values() if conversations.MESSAGE_COLUMNS <= record.keys()]
+            missing = [message_id for message_id, record in latest.items() if not conversations.MESSAGE_COLUMNS <= record.keys()]
+            if missing:
+                complete += conversations.fetch_messages_by_id(self.conn, missing)
+                self.fetched += len(missing)
+            tracing.set_attributes({"events": len(records), "messages": len(latest), "fetched": len(missing), "resync": resync})
+            applied += self.store.merge(conversations.prepare_messages(complete), save_interval=self.save_interval)
+            self.batches += 1
+            if self.on_change is not None:
+                self.on_change({record["ticket_id"] for record in complete})
+        return applied
\ No newline at end of file
@@ -0,0 +1,117 @@
+# search_index.py
+"""
+Índice invertido em memória para a busca de conversas. Indexa as palavras (sem
+acento e sem caixa) de `mensagem` e `user_identity` por ticket, permitindo buscar
+por prefixo de palavra sem varrer todas as mensagens a cada rerun.
+"""
+import bisect
+import threading
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+from text_utils import tokenize
+
+# Peso de uma palavra do nome do cliente em relação a uma ocorrência em mensagem
+IDENTITY_WEIGHT = 5
+
+def _count_message_tokens(messages) -> pd.Series:
+    """
+    Ocorrências de cada palavra por ticket (índice `(ticket_id, token)`). Cada texto
+    distinto é tokenizado uma única vez; a contagem é feita de forma vetorizada.
+    """
+    codes, unique_texts = pd.factorize(messages['mensagem'], use_na_sentinel=True)
+    unique_tokens = pd.Series([tokenize(text) for text in unique_texts] + [[]], dtype=object)
+    tokens = pd.DataFrame({
+        'ticket_id': messages['ticket_id'].to_numpy(),
+        'token': unique_tokens.to_numpy()[codes],  # código -1 (vazio) cai na lista vazia do final
+    })
+    tokens = tokens.explode('token').dropna(subset=['token'])
+    return tokens.groupby(['ticket_id', 'token'], sort=False, observed=True).size()
+
+class ConversationSearchIndex:
+    """
+    Mapeia palavra -> {ticket_id: ocorrências}. Cada termo da busca casa com as
+    palavras que começam com ele (busca binária no vocabulário ordenado) e um ticket
+    precisa casar com todos os termos. O resultado é ordenado pelo total de
+    ocorrências e, em caso de empate, pela mensagem mais recente.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(Counter)  # palavra -> Counter(ticket_id -> ocorrências)
+        self._vocabulary = []                  # palavras ordenadas, para busca por prefixo
+        self._ticket_tokens = {}               # ticket_id -> palavras indexadas (para reindexar)
+        self._last_activity = {}               # ticket_id -> data_hora da última mensagem
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ticket_tokens)
+
+    def _remove_ticket(self, ticket_id):
+        for token in self._ticket_tokens.pop(ticket_id, ()):
+            postings = self._postings[token]
+            postings.pop(ticket_id, None)
+            if not postings:
+                del self._postings[token]
+                position = bisect.bisect_left(self._vocabulary, token)
+                del self._vocabulary[position]
+        self._last_activity.pop(ticket_id, None)
+
+    def _add_ticket(self, ticket_id, counts: Counter, last_activity):
+        for token, count in counts.items():
+            if token not in self._postings:
+                bisect.insort(self._vocabulary, token)
+            self._postings[token][ticket_id] = count
+        self._ticket_tokens[ticket_id] = set(counts)
+        self._last_activity[ticket_id] = str(last_activity) if pd.notna(last_activity) else ""
+
+    def update_tickets(self, messages):
+        """
+        (Re)indexa os tickets presentes em `messages`, que deve conter todas as
+        mensagens de cada um deles. Tickets fora de `messages` não são tocados.
+        """
+        if messages.empty:
+            return
+        token_counts = _count_message_tokens(messages)
+        counts_by_ticket = defaultdict(Counter)
+        for (ticket_id, token), count in token_counts.items():
+            counts_by_ticket[ticket_id][token] = count
+
+        grouped = messages.sort_values('data_hora', na_position='first').groupby('ticket_id', sort=False, observed=True)
+        identities = grouped['user_identity'].first()
+        last_activity = grouped['data_hora'].last()
+        with self._lock:
+            for ticket_id, identity in identities.items():
+                counts = counts_by_ticket[ticket_id]
+                for token in tokenize(identity):
+                    counts[token] += IDENTITY_WEIGHT
+                self._remove_ticket(ticket_id)
+                self._add_ticket(ticket_id, counts, last_activity.get(ticket_id))
+
+    def _prefix_matches(self, term: str) -> Counter:
+        """Ocorrências por ticket de todas as palavras que começam com `term`."""
+        scores = Counter()
+        start = bisect.bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            scores.update(self._postings[token])
+        return scores
+
+    def search(self, query: str, limit: int | None = None) -> list:
+        """`ticket_id`s que contêm todos os termos de `query`, do mais para o menos relevante."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            scores = None
+            for term in sorted(set(terms), key=len, reverse=True):
+                matches = self._prefix_matches(term)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = Counter({t: scores[t] + count for t, count in matches.items() if t in scores})
+                if not scores:
+                    return []
+            ranked = sorted(scores, key=lambda t: (scores[t], self._last_activity.get(t, "")), reverse=True)
+        return ranked[:limit] if limit is not None else ranked
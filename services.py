@@ -1,7 +1,22 @@
 import streamlit as st
 import openai
+import contextvars
+import itertools
 import json
+import math
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import requests # Importa a biblioteca para requisições HTTP
+import config
+import pinecone_client
+import specialty_classifier
+import text_utils
+import tracing
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # --- INICIALIZAÇÃO DOS SERVIÇOS ---
 # A inicialização do Pinecone com a biblioteca não é mais necessária para esta página.
@@ -11,10 +26,47 @@ try:
 except Exception as e:
     st.error(f"Erro ao inicializar a API da OpenAI: {e}")
 
+# Pool compartilhado entre as sessões para as etapas do pipeline RAG que rodam em paralelo
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-pipeline")
+# Pool próprio para as consultas de cada rota da busca: elas são disparadas de dentro do pool
+# acima, e esperar por tarefas do mesmo pool poderia travá-lo sob carga
+_RETRIEVAL_EXECUTOR = ThreadPoolExecutor(max_workers=config.PINECONE_POOL_SIZE, thread_name_prefix="rag-busca")
+
+NO_RAG_CONTENT = "Nenhum conteúdo retornado."
+INSIGHT_ERROR = "Não foi possível gerar o insight. Tente novamente."
+
+# Rótulos exibidos para cada etapa medida no pipeline
+STAGE_LABELS = {
+    "cache": "cache",
+    "classificacao": "classificação",
+    "busca_rag_ttft": "1º token RAG",
+    "busca_rag": "busca RAG",
+    "insight_ttft": "1º token insight",
+    "insight": "insight",
+    "total": "total",
+}
+
 # --- FUNÇÕES DO AGENTE ---
 
-def classify_query(user_query: str, system_prompt: str) -> list:
-    """Classifica a query do usuário em especialidades."""
+@st.cache_resource
+def get_specialty_classifier() -> specialty_classifier.SpecialtyClassifier:
+    """Classificador local compartilhado entre as sessões."""
+    return specialty_classifier.build_default_classifier()
+
+@tracing.traced()
+def classify_query(user_query: str, system_prompt: str, allow_remote: bool = True) -> list | None:
+    """
+    Classifica a query do usuário em especialidades. O classificador local responde
+    na hora quando a pergunta cita a especialidade; só os casos ambíguos vão ao GPT-4o.
+    Com `allow_remote=False`, devolve None em vez de consultar o GPT-4o.
+    """
+    tracing.set_attributes({"request.chars": len(user_query)})
+    local_result = get_specialty_classifier().classify(user_query)
+    if local_result is not None or not allow_remote:
+        tracing.set_attributes({"classifier.source": "local" if local_result is not None else "nenhuma"})
+        return local_result
+    tracing.set_attributes({"classifier.source": "gpt-4o"})
+
     try:
         response = openai.chat.completions.create(
             model="gpt-4o", 
@@ -25,6 +77,7 @@ def classify_query(user_query: str, system_prompt: str) -> list:
             response_format={"type": "json_object"},
             temperature=0.0
         )
+        tracing.set_token_usage(tracing.current_span(), response.usage)
         result_json = json.loads(response.choices[0].message.content)
         
         # O n8n espera a saída direta, que pode ser a lista em si ou dentro de uma chave
@@ -42,60 +95,323 @@ def classify_query(user_query: str, system_prompt: str) -> list:
         st.error(f"Erro ao classificar a query: {e}")
         return []
 
-# MUDANÇA: Função substituída para fazer a chamada POST direta
-def query_pinecone_assistant(user_query: str) -> tuple[str, str]:
+# --- RESPOSTAS EM STREAMING ---
+
+class TokenStream:
     """
-    Envia uma pergunta para o assistente de chat do Pinecone via requisição POST.
+    Resposta em streaming: iterável de chunks de texto (compatível com st.write_stream)
+    que acumula o texto final e mede o tempo até o primeiro token (TTFT) e o tempo total.
+    `on_complete`, se informado, é chamado com o próprio stream quando ele termina;
+    `span`, se informado, recebe o TTFT e o tamanho da resposta e é finalizado junto.
+    `errors` recebe as falhas da origem (o gerador de chunks anexa a ela): o texto pode
+    trazer uma mensagem de erro, e `failed` diz se foi o caso. `partial_errors` recebe as
+    falhas de parte das origens quando outras responderam (`partial`).
     """
-    pinecone_url = "https://prod-1-data.ke.pinecone.io/assistant/chat/ia-assistant"
-    api_key = st.secrets.get("PINECONE_API_KEY")
 
+    def __init__(self, chunks, on_complete=None, span: tracing.Span | None = None):
+        self._chunks = chunks
+        self._parts = []
+        self._on_complete = on_complete
+        self._span = span
+        self._created_at = time.perf_counter()
+        self.citations = []
+        self.errors = []
+        self.partial_errors = []
+        self.ttft = None
+        self.duration = None
+
+    def __iter__(self):
+        if self.duration is not None:
+            return
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - self._created_at
+            self._parts.append(chunk)
+            yield chunk
+        self.duration = time.perf_counter() - self._created_at
+        if self._span is not None:
+            self._span.set_attributes({
+                "stream.ttft_ms": round((self.ttft or self.duration) * 1000, 3),
+                "stream.chunks": len(self._parts),
+                "response.chars": len(self.text),
+            })
+            self._span.end()
+        if self._on_complete is not None:
+            self._on_complete(self)
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.errors)
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.partial_errors)
+
+def _prefetched(chunks, executor: ThreadPoolExecutor | None = None):
+    """
+    Consome `chunks` em uma thread do pool (por padrão, o do pipeline), repassando-os por
+    uma fila. Permite que a requisição comece imediatamente, mesmo que o stream só seja
+    lido mais tarde.
+    """
+    buffer = queue.Queue()
+    done = object()
+
+    def pump():
+        try:
+            for chunk in chunks:
+                buffer.put(chunk)
+        finally:
+            buffer.put(done)
+
+    def drain():
+        while (chunk := buffer.get()) is not done:
+            yield chunk
+
+    _submit_to(executor or _EXECUTOR, pump)
+    return drain()
+
+@st.cache_resource
+def get_pinecone_client() -> pinecone_client.PineconeAssistantClient | None:
+    """
+    Cliente do assistente do Pinecone compartilhado entre as sessões (pool de conexões,
+    retries e circuit breaker), ou None se a chave não estiver configurada. Cada span de
+    busca leva o `stats()` do cliente no atributo `pinecone.client` (lido por diagnostics.py).
+    """
+    api_key = st.secrets.get("PINECONE_API_KEY")
     if not api_key:
-        return "Erro: Chave da API do Pinecone não configurada.", "[]"
+        return None
+    return pinecone_client.PineconeAssistantClient(
+        url=st.secrets.get("PINECONE_ASSISTANT_URL", config.PINECONE_ASSISTANT_URL),
+        api_key=api_key,
+        connect_timeout=config.PINECONE_CONNECT_TIMEOUT,
+        read_timeout=config.PINECONE_READ_TIMEOUT,
+        max_retries=config.PINECONE_MAX_RETRIES,
+        backoff_base=config.PINECONE_BACKOFF_BASE,
+        backoff_cap=config.PINECONE_BACKOFF_CAP,
+        breaker_threshold=config.PINECONE_BREAKER_THRESHOLD,
+        breaker_cooldown=config.PINECONE_BREAKER_COOLDOWN,
+        pool_size=config.PINECONE_POOL_SIZE,
+    )
 
-    headers = {
-        "Content-Type": "application/json",
-        "Api-Key": api_key 
-    }
-    
-    body = {
-        "messages": [
-            {
-                "role": "user",
-                "content": user_query
-            }
-        ],
-        "stream": False,
-        "model": "gpt-4o"
-    }
+# --- ROTEAMENTO DA BUSCA POR ESPECIALIDADE ---
+
+def retrieval_routes(specialties: list | None) -> list:
+    """
+    Onde buscar o contexto das `specialties`: lista de (rótulo, url, filtro), uma rota por
+    assistente consultado. As especialidades com assistente dedicado vão a ele; as demais,
+    juntas, ao assistente geral com filtro pelo metadado da especialidade. Lista vazia =
+    busca global (roteamento desligado, nenhuma especialidade conhecida ou especialidades demais).
+    """
+    known = [s for s in dict.fromkeys(specialties or []) if s in config.ALLOWED_SPECIALTIES]
+    if not config.PINECONE_SPECIALTY_ROUTING or not known or len(known) > config.PINECONE_MAX_ROUTED_SPECIALTIES:
+        return []
+    shared = [s for s in known if s not in config.PINECONE_SPECIALTY_ASSISTANTS]
+    routes = [(", ".join(shared), None, {config.PINECONE_SPECIALTY_METADATA_FIELD: {"$in": shared}})] if shared else []
+    routes += [(s, config.PINECONE_SPECIALTY_ASSISTANTS[s], None) for s in known if s in config.PINECONE_SPECIALTY_ASSISTANTS]
+    return routes
+
+def _is_grounded(rag_content: str, citations: list) -> bool:
+    """
+    Se a resposta de uma rota veio da base: com o filtro sem nenhum arquivo correspondente
+    (metadado ausente, por exemplo) o assistente ainda gera um texto ("não encontrei..."),
+    mas sem citações.
+    """
+    return bool(citations) and bool(rag_content.strip()) and rag_content != NO_RAG_CONTENT
+
+def _merge_answers(answers: list) -> str:
+    """Junta o conteúdo de várias rotas, com o rótulo de cada uma; uma só rota passa direto."""
+    if len(answers) == 1:
+        return answers[0][1]
+    return "\n\n".join(f"**{label}**\n{content}" for label, content, _, _ in answers)
 
+def _sum_usage(usages: list) -> dict | None:
+    usages = [usage for usage in usages if usage]
+    if not usages:
+        return None
+    return {key: sum(usage.get(key) or 0 for usage in usages) for key in ("prompt_tokens", "completion_tokens", "total_tokens")}
+
+@tracing.traced("services.pinecone_route")
+def _ask_pinecone(client: pinecone_client.PineconeAssistantClient, user_query: str, route: tuple | None = None) -> tuple[str, list, dict | None]:
+    """Uma consulta ao assistente, global ou por uma rota de retrieval_routes: conteúdo, citações e uso de tokens."""
+    label, url, filter = route or ("global", None, None)
+    tracing.set_attributes({"rag.route": label})
     try:
-        response = requests.post(pinecone_url, headers=headers, json=body, timeout=60)
-        response.raise_for_status()  # Lança um erro para status HTTP 4xx/5xx
-        
-        data = response.json()
-        
-        rag_content = data.get("message", {}).get("content", "Nenhum conteúdo retornado.")
-        citations = data.get("citations", [])
-        
-        return rag_content, json.dumps(citations, indent=2, ensure_ascii=False)
+        response = client.chat(user_query, filter=filter, url=url)  # Já valida o status e refaz falhas transitórias
+    finally:
+        tracing.set_attributes({"pinecone.client": client.stats()})
+    data = response.json()
+    tracing.set_attributes({"response.bytes": len(response.content)})
+    tracing.set_token_usage(tracing.current_span(), data.get("usage"))
+    return data.get("message", {}).get("content", NO_RAG_CONTENT), data.get("citations", []), data.get("usage")
+
+def _ask_routes(client: pinecone_client.PineconeAssistantClient, user_query: str, routes: list) -> tuple[list, list]:
+    """Consulta as rotas em paralelo: (rótulo, conteúdo, citações, uso) das que trouxeram citações e os erros das que falharam."""
+    futures = [_submit_to(_RETRIEVAL_EXECUTOR, _ask_pinecone, client, user_query, route) for route in routes]
+    answers, errors = [], []
+    for (label, _, _), future in zip(routes, futures):
+        try:
+            content, citations, usage = future.result()
+        except requests.exceptions.RequestException as e:
+            errors.append(e)
+            continue
+        if _is_grounded(content, citations):
+            answers.append((label, content, citations, usage))
+    return answers, errors
+
+# MUDANÇA: Função substituída para fazer a chamada POST direta
+@tracing.traced()
+def query_pinecone_assistant(user_query: str, specialties: list | None = None) -> tuple[str, str, bool, bool]:
+    """
+    Envia uma pergunta ao assistente do Pinecone, restrita às `specialties` (retrieval_routes)
+    ou, sem rota com citações, em toda a base. Retorna (conteúdo, citações, falhou, parcial).
+    """
+    client = get_pinecone_client()
+    if client is None:
+        return "Erro: Chave da API do Pinecone não configurada.", "[]", True, False
 
+    routes = retrieval_routes(specialties)
+    tracing.set_attributes({"request.chars": len(user_query), "rag.routes": len(routes)})
+    try:
+        answers, errors = _ask_routes(client, user_query, routes) if routes else ([], [])
+        if not answers:
+            if routes:
+                tracing.set_attributes({"rag.fallback": True})
+            errors = []  # A busca global substitui as rotas por inteiro
+            content, citations, usage = _ask_pinecone(client, user_query)
+            answers = [("global", content, citations, usage)]
+        tracing.set_token_usage(tracing.current_span(), _sum_usage([usage for _, _, _, usage in answers]))
+
+        rag_content = _merge_answers(answers)
+        citations = [citation for _, _, route_citations, _ in answers for citation in route_citations]
+
+        return rag_content, json.dumps(citations, indent=2, ensure_ascii=False), False, bool(errors)
     except requests.exceptions.RequestException as e:
         st.error(f"Erro de conexão com a API do Pinecone: {e}")
-        return "Ocorreu um erro ao se comunicar com a base de conhecimento.", "[]"
+        return "Ocorreu um erro ao se comunicar com a base de conhecimento.", "[]", True, False
     except Exception as e:
         st.error(f"Erro ao processar a resposta do Pinecone: {e}")
-        return "Ocorreu um erro ao processar a resposta da base de conhecimento.", "[]"
+        return "Ocorreu um erro ao processar a resposta da base de conhecimento.", "[]", True, False
 
-def get_sales_insight(user_query: str, specialties: list, rag_content: str, citations: str, system_prompt: str) -> str:
-    """Gera o insight final para o vendedor."""
-    final_prompt = system_prompt.format(
+def _iter_pinecone_chunks(user_query: str, citations: list, errors: list, span: tracing.Span | None = None,
+                          url: str | None = None, filter: dict | None = None):
+    """
+    Lê os eventos SSE do assistente do Pinecone, devolvendo o texto e guardando as citações
+    em `citations`. Uma falha vira uma mensagem no texto e é anexada a `errors`.
+    """
+    client = get_pinecone_client()
+    if client is None:
+        errors.append(RuntimeError("Chave da API do Pinecone não configurada."))
+        yield "Erro: Chave da API do Pinecone não configurada."
+        return
+
+    try:
+        with client.chat(user_query, stream=True, filter=filter, url=url) as response:
+            response.encoding = "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:"):].strip())
+                if event.get("type") == "content_chunk":
+                    yield event.get("delta", {}).get("content", "")
+                elif event.get("type") == "citation":
+                    citations.append(event.get("citation"))
+                elif event.get("type") == "message_end":
+                    tracing.set_token_usage(span, event.get("usage"))
+    except requests.exceptions.RequestException as e:
+        errors.append(e)
+        if span is not None:
+            span.record_error(e)
+        st.error(f"Erro de conexão com a API do Pinecone: {e}")
+        yield "Ocorreu um erro ao se comunicar com a base de conhecimento."
+    except Exception as e:
+        errors.append(e)
+        if span is not None:
+            span.record_error(e)
+        st.error(f"Erro ao processar a resposta do Pinecone: {e}")
+        yield "Ocorreu um erro ao processar a resposta da base de conhecimento."
+    finally:
+        if span is not None:
+            span.set_attribute("pinecone.client", client.stats())
+
+def _iter_routed_chunks(user_query: str, routes: list, citations: list, errors: list, partial_errors: list, span: tracing.Span):
+    """
+    Busca em streaming pelas rotas, em paralelo; cada rota só aparece depois da primeira citação.
+    Sem nenhuma rota citada, faz a busca global; senão, as falhas vão para `partial_errors`.
+    """
+    started = []
+    for label, url, filter in routes:
+        route_span = tracing.start_span("services.pinecone_route", {"rag.route": label}, parent=span)
+        route_citations, route_errors = [], []
+        route_stream = TokenStream(_iter_pinecone_chunks(user_query, route_citations, route_errors, route_span, url, filter), span=route_span)
+        started.append((label, route_citations, route_errors, _prefetched(route_stream, _RETRIEVAL_EXECUTOR)))
+
+    def chunks():
+        produced, failures = False, []
+        for label, route_citations, route_errors, route_chunks in started:
+            held, released = [], False
+            for chunk in itertools.chain(route_chunks, [None]):  # None: fim da rota (as citações podem chegar depois do texto)
+                if not released and route_citations and not route_errors:
+                    released = True
+                    if len(started) > 1:
+                        yield ("\n\n" if produced else "") + f"**{label}**\n"
+                    produced = True
+                    yield "".join(held)
+                if chunk is None:
+                    break
+                if released:
+                    yield chunk
+                else:
+                    held.append(chunk)
+            if released:
+                citations.extend(route_citations)
+            failures.extend(route_errors)
+        if not produced:
+            span.set_attribute("rag.fallback", True)
+            yield from _iter_pinecone_chunks(user_query, citations, errors, span)
+        else:
+            partial_errors.extend(failures)
+    return chunks()
+
+def stream_pinecone_assistant(user_query: str, specialties: list | None = None, on_complete=None, prefetch: bool = False) -> TokenStream:
+    """
+    Versão em streaming do query_pinecone_assistant (`stream.citations`, `failed`, `partial`).
+    Com `prefetch=True`, a requisição começa na hora, em segundo plano.
+    """
+    citations, errors, partial_errors = [], [], []
+    routes = retrieval_routes(specialties)
+    span = tracing.start_span("services.stream_pinecone_assistant", {"request.chars": len(user_query), "rag.routes": len(routes)})
+    if routes:
+        chunks = _iter_routed_chunks(user_query, routes, citations, errors, partial_errors, span)
+    else:
+        chunks = _iter_pinecone_chunks(user_query, citations, errors, span)
+        if prefetch:
+            chunks = _prefetched(chunks)
+    stream = TokenStream(chunks, on_complete=on_complete, span=span)
+    stream.citations = citations
+    stream.errors = errors
+    stream.partial_errors = partial_errors
+    return stream
+
+def _build_coach_prompt(user_query: str, specialties: list, rag_content: str, citations: str, system_prompt: str) -> str:
+    return system_prompt.format(
         specialties=", ".join(specialties) if specialties else "Nenhuma",
         user_query=user_query,
         rag_content=rag_content,
         citations=citations
     )
 
+@tracing.traced()
+def get_sales_insight(user_query: str, specialties: list, rag_content: str, citations: str, system_prompt: str) -> str:
+    """Gera o insight final para o vendedor (INSIGHT_ERROR se a geração falhar)."""
+    final_prompt = _build_coach_prompt(user_query, specialties, rag_content, citations, system_prompt)
+    tracing.set_attributes({"request.chars": len(final_prompt)})
+
     try:
         response = openai.chat.completions.create(
             model="gpt-4o", # GPT-5 não está disponível, usando gpt-4o
@@ -104,7 +420,391 @@ def get_sales_insight(user_query: str, specialties: list, rag_content: str, cita
             ],
             temperature=0.3
         )
+        tracing.set_token_usage(tracing.current_span(), response.usage)
         return response.choices[0].message.content
     except Exception as e:
         st.error(f"Erro ao gerar insight de vendas: {e}")
-        return "Não foi possível gerar o insight. Tente novamente."
\ No newline at end of file
+        return INSIGHT_ERROR
+
+def _iter_sales_insight_chunks(final_prompt: str, errors: list, span: tracing.Span | None = None):
+    try:
+        response = openai.chat.completions.create(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": final_prompt}
+            ],
+            temperature=0.3,
+            stream=True,
+            stream_options={"include_usage": True}  # O último chunk traz o uso de tokens
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if chunk.usage is not None:
+                tracing.set_token_usage(span, chunk.usage)
+    except Exception as e:
+        errors.append(e)
+        if span is not None:
+            span.record_error(e)
+        st.error(f"Erro ao gerar insight de vendas: {e}")
+        yield INSIGHT_ERROR
+
+def stream_sales_insight(user_query: str, specialties: list, rag_content: str, citations: str, system_prompt: str, on_complete=None) -> TokenStream:
+    """Versão em streaming do get_sales_insight: os tokens chegam à medida que o modelo os gera."""
+    final_prompt = _build_coach_prompt(user_query, specialties, rag_content, citations, system_prompt)
+    span = tracing.start_span("services.stream_sales_insight", {"request.chars": len(final_prompt)})
+    errors = []
+    stream = TokenStream(_iter_sales_insight_chunks(final_prompt, errors, span), on_complete=on_complete, span=span)
+    stream.errors = errors
+    return stream
+
+# --- CACHE DE RESPOSTAS DO RAG ---
+
+def normalize_question(text: str) -> str:
+    """Normaliza uma pergunta para comparação: minúsculas, sem acentos, pontuação ou espaços repetidos."""
+    return text_utils.fold_text(text)
+
+def _embed_question(normalized: str, dims: int = 512) -> dict:
+    """
+    Embedding local e determinístico da pergunta (feature hashing de palavras e trigramas
+    de caracteres), normalizado para norma 1. Não depende de nenhuma chamada externa.
+    """
+    features = normalized.split()
+    padded = f" {normalized} "
+    features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    vector = {}
+    for feature in features:
+        index = zlib.crc32(feature.encode("utf-8")) % dims
+        vector[index] = vector.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {i: v / norm for i, v in vector.items()}
+
+# Palavras que mudam a resposta mexendo pouco no texto: com trigramas, "é presencial" e
+# "não é presencial" ficam a ~0.91 de similaridade, "em 2024" e "em 2025" a ~0.93
+_NEGATION_WORDS = frozenset({"nao", "nem", "nunca", "jamais", "nenhum", "nenhuma", "sem", "nada", "ninguem"})
+_NUMBER_WORDS = frozenset({"dois", "duas", "tres", "quatro", "cinco", "seis", "sete", "oito", "nove", "dez", "doze", "quinze", "vinte", "trinta", "cem", "mil"})
+
+def _question_guard(normalized: str) -> frozenset:
+    """Números e negações da pergunta: a camada de similaridade só casa perguntas com os mesmos."""
+    return frozenset(
+        word for word in normalized.split()
+        if word in _NEGATION_WORDS or word in _NUMBER_WORDS or any(c.isdigit() for c in word)
+    )
+
+def _cosine(a: dict, b: dict) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(i, 0.0) for i, v in a.items())
+
+class RagAnswerCache:
+    """
+    Cache em memória das respostas do pipeline RAG, com duas camadas:
+    correspondência exata da pergunta normalizada e similaridade entre embeddings
+    locais (restrita às mesmas especialidades e às perguntas com os mesmos números e
+    negações, ver _question_guard). Entradas expiram por TTL e, ao atingir
+    `max_entries`, a menos usada recentemente é descartada (LRU).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # (pergunta normalizada, especialidades) -> entrada
+        self._by_question = {}         # pergunta normalizada -> chave mais recente
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(normalized: str, specialties: list) -> tuple:
+        return normalized, tuple(sorted(specialties))
+
+    def _expired(self, entry: dict) -> bool:
+        return time.monotonic() - entry["created_at"] > self.ttl_seconds
+
+    def _remove(self, key: tuple):
+        self._entries.pop(key, None)
+        if self._by_question.get(key[0]) == key:
+            del self._by_question[key[0]]
+
+    def _hit(self, key: tuple, match: str) -> dict:
+        self._entries.move_to_end(key)
+        if match == "exato":
+            self.exact_hits += 1
+        else:
+            self.similar_hits += 1
+        tracing.set_attributes({"cache.match": match})
+        return dict(self._entries[key]["answer"], match=match)
+
+    @tracing.traced("rag_cache.lookup_question")
+    def lookup_question(self, question: str) -> dict | None:
+        """
+        Camada exata, consultada antes da classificação: a mesma pergunta normalizada
+        sempre recebe a mesma classificação, então a resposta guardada serve direto.
+        Não conta como miss, pois a busca com especialidades (get) ainda será feita.
+        """
+        normalized = normalize_question(question)
+        with self._lock:
+            key = self._by_question.get(normalized)
+            if key is None:
+                return None
+            if self._expired(self._entries[key]):
+                self._remove(key)
+                return None
+            return self._hit(key, "exato")
+
+    @tracing.traced("rag_cache.get")
+    def get(self, question: str, specialties: list) -> dict | None:
+        """Busca uma resposta pela pergunta + especialidades: primeiro exata, depois por similaridade."""
+        normalized = normalize_question(question)
+        key = self._key(normalized, specialties)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                return self._hit(key, "exato")
+
+            vector = _embed_question(normalized)
+            guard = _question_guard(normalized)
+            best_key, best_score = None, self.similarity_threshold
+            for candidate_key, candidate in list(self._entries.items()):
+                if self._expired(candidate):
+                    self._remove(candidate_key)
+                    continue
+                if candidate_key[1] != key[1] or candidate["guard"] != guard:
+                    continue
+                score = _cosine(vector, candidate["vector"])
+                if score >= best_score:
+                    best_key, best_score = candidate_key, score
+            if best_key is not None:
+                return self._hit(best_key, "similar")
+
+            self.misses += 1
+            return None
+
+    def put(self, question: str, specialties: list, rag_content: str, citations: str, insight: str):
+        """Guarda a resposta final (e o contexto do RAG que a gerou)."""
+        normalized = normalize_question(question)
+        key = self._key(normalized, specialties)
+        with self._lock:
+            self._entries[key] = {
+                "created_at": time.monotonic(),
+                "vector": _embed_question(normalized),
+                "guard": _question_guard(normalized),
+                "answer": {
+                    "specialties": list(specialties),
+                    "rag_content": rag_content,
+                    "citations": citations,
+                    "insight": insight,
+                },
+            }
+            self._entries.move_to_end(key)
+            self._by_question[normalized] = key
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            total = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+            }
+
+@st.cache_resource
+def get_rag_cache() -> RagAnswerCache:
+    """Instância única do cache, compartilhada entre todas as sessões do app."""
+    return RagAnswerCache(
+        max_entries=config.RAG_CACHE_MAX_ENTRIES,
+        ttl_seconds=config.RAG_CACHE_TTL_SECONDS,
+        similarity_threshold=config.RAG_CACHE_SIMILARITY_THRESHOLD,
+    )
+
+# --- ORQUESTRAÇÃO DO PIPELINE RAG ---
+
+def _run_in_script_context(ctx, fn, *args, **kwargs):
+    """Executa `fn` em uma thread do pool com o contexto do Streamlit anexado, para que st.error/st.warning funcionem."""
+    if ctx is not None:
+        add_script_run_ctx(threading.current_thread(), ctx)
+    return fn(*args, **kwargs)
+
+def _submit_to(executor: ThreadPoolExecutor, fn, *args, **kwargs):
+    """Submete `fn` ao `executor` levando o contexto do Streamlit e as contextvars (span ativo do tracing)."""
+    context = contextvars.copy_context()
+    return executor.submit(context.run, _run_in_script_context, get_script_run_ctx(), fn, *args, **kwargs)
+
+def _submit(fn, *args, **kwargs):
+    return _submit_to(_EXECUTOR, fn, *args, **kwargs)
+
+def _timed(timings: dict, stage: str, fn, *args, **kwargs):
+    """Executa `fn` registrando em `timings[stage]` o tempo gasto, em segundos."""
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+def _cached_result(answer: dict, timings: dict, start: float, stream: bool, on_context, on_rag_stream) -> dict:
+    """Monta o resultado do pipeline a partir de uma resposta do cache, no mesmo formato de uma resposta nova."""
+    timings["cache"] = time.perf_counter() - start
+    result = {
+        "specialties": answer["specialties"],
+        "rag_content": answer["rag_content"],
+        "citations": answer["citations"],
+        "rag_error": False,
+        "rag_partial": False,
+        "insight": answer["insight"],
+        "cache_match": answer["match"],
+        "timings": timings,
+    }
+    if stream and on_rag_stream is not None:
+        on_rag_stream(TokenStream(iter([answer["rag_content"]])))
+    if on_context is not None:
+        on_context(result)
+
+    if stream:
+        def finish(_):
+            timings["total"] = time.perf_counter() - start
+        result["insight"] = TokenStream(iter([answer["insight"]]), on_complete=finish)
+    else:
+        timings["total"] = time.perf_counter() - start
+    return result
+
+@tracing.traced()
+def run_rag_pipeline(user_query: str, classifier_prompt: str, coach_prompt: str, on_context=None, stream: bool = False, on_rag_stream=None) -> dict:
+    """
+    Executa o pipeline RAG (classificação, busca e insight), reaproveitando o cache de respostas.
+    Com `stream=True`, a busca vai para `on_rag_stream` e `result["insight"]` é um TokenStream.
+    """
+    timings = {}
+    start = time.perf_counter()
+    cache = get_rag_cache()
+
+    cached = cache.lookup_question(user_query)
+    if cached is not None:
+        return _cached_result(cached, timings, start, stream, on_context, on_rag_stream)
+
+    if stream:
+        return _run_rag_pipeline_stream(user_query, classifier_prompt, coach_prompt, on_context, on_rag_stream, cache, timings, start)
+
+    specialties = _timed(timings, "classificacao", classify_query, user_query, classifier_prompt, allow_remote=False)
+    rag_future = None
+    if specialties is None:
+        classify_future = _submit(_timed, timings, "classificacao", classify_query, user_query, classifier_prompt)
+        rag_future = _submit(_timed, timings, "busca_rag", query_pinecone_assistant, user_query)
+        specialties = classify_future.result()
+
+    # A busca global segue em segundo plano; se o cache tiver a resposta, não esperamos por ela
+    cached = cache.get(user_query, specialties)
+    if cached is not None:
+        return _cached_result(cached, timings, start, stream, on_context, on_rag_stream)
+
+    if rag_future is None:
+        rag_content, citations, rag_error, rag_partial = _timed(timings, "busca_rag", query_pinecone_assistant, user_query, specialties)
+    else:
+        rag_content, citations, rag_error, rag_partial = rag_future.result()
+
+    result = {
+        "specialties": specialties,
+        "rag_content": rag_content,
+        "citations": citations,
+        "rag_error": rag_error,
+        "rag_partial": rag_partial,
+        "insight": None,
+        "cache_match": None,
+        "timings": timings,
+    }
+    if on_context is not None:
+        on_context(result)
+
+    if not rag_error:
+        insight = _timed(
+            timings, "insight", get_sales_insight,
+            user_query=user_query,
+            specialties=specialties,
+            rag_content=rag_content,
+            citations=citations,
+            system_prompt=coach_prompt
+        )
+        result["insight"] = insight
+        if insight != INSIGHT_ERROR and not rag_partial:
+            cache.put(user_query, specialties, rag_content, citations, insight)
+
+    timings["total"] = time.perf_counter() - start
+    return result
+
+def _run_rag_pipeline_stream(user_query: str, classifier_prompt: str, coach_prompt: str, on_context, on_rag_stream, cache: RagAnswerCache, timings: dict, start: float) -> dict:
+    """
+    Variante em streaming do run_rag_pipeline: a busca por especialidade começa assim que o
+    classificador local responde; nas perguntas ambíguas, a busca global começa em segundo
+    plano junto com a classificação.
+    """
+    specialties = _timed(timings, "classificacao", classify_query, user_query, classifier_prompt, allow_remote=False)
+    rag_stream = None
+    if specialties is None:
+        classify_future = _submit(_timed, timings, "classificacao", classify_query, user_query, classifier_prompt)
+        rag_stream = stream_pinecone_assistant(user_query, prefetch=True)
+        specialties = classify_future.result()
+
+    cached = cache.get(user_query, specialties)
+    if cached is not None:
+        return _cached_result(cached, timings, start, True, on_context, on_rag_stream)
+
+    if rag_stream is None:
+        rag_stream = stream_pinecone_assistant(user_query, specialties)
+
+    if on_rag_stream is not None:
+        on_rag_stream(rag_stream)
+    for _ in rag_stream:  # Garante o consumo caso o callback não tenha lido o stream
+        pass
+    timings["busca_rag_ttft"] = rag_stream.ttft or rag_stream.duration
+    timings["busca_rag"] = rag_stream.duration
+
+    rag_content = rag_stream.text or NO_RAG_CONTENT
+    citations = json.dumps(rag_stream.citations, indent=2, ensure_ascii=False)
+    result = {
+        "specialties": specialties,
+        "rag_content": rag_content,
+        "citations": citations,
+        "rag_error": rag_stream.failed,
+        "rag_partial": rag_stream.partial,
+        "insight": None,
+        "cache_match": None,
+        "timings": timings,
+    }
+    if on_context is not None:
+        on_context(result)
+
+    if rag_stream.failed:
+        timings["total"] = time.perf_counter() - start
+        return result
+
+    def finish(insight_stream: TokenStream):
+        timings["insight_ttft"] = insight_stream.ttft or insight_stream.duration
+        timings["insight"] = insight_stream.duration
+        timings["total"] = time.perf_counter() - start
+        if not insight_stream.failed and not rag_stream.partial:
+            cache.put(user_query, specialties, rag_content, citations, insight_stream.text)
+
+    result["insight"] = stream_sales_insight(
+        user_query=user_query,
+        specialties=specialties,
+        rag_content=rag_content,
+        citations=citations,
+        system_prompt=coach_prompt,
+        on_complete=finish
+    )
+    return result
+
+def format_timings(timings: dict) -> str:
+    """Formata o tempo de cada etapa do pipeline para exibição."""
+    return " · ".join(
+        f"{label} {timings[stage]:.2f}s"
+        for stage, label in STAGE_LABELS.items()
+        if stage in timings
+    )
\ No newline at end of file
@@ -0,0 +1,127 @@
+# specialty_classifier.py
+"""
+Classificador local de especialidades. Resolve na hora as perguntas que citam a
+especialidade (pelo nome ou por um apelido de config.SPECIALTY_ALIASES) e, quando
+há um modelo treinado disponível, as que ele classifica com confiança. Nos demais
+casos devolve None e quem chamou recorre ao LLM.
+"""
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+import config
+from text_utils import fold_text
+
+class KeywordSpecialtyIndex:
+    """Índice de nomes e apelidos das especialidades, comparados como palavras inteiras."""
+
+    def __init__(self, specialties: list, aliases: dict):
+        self._phrase_to_specialty = {}
+        for specialty in specialties:
+            for phrase in [specialty, *aliases.get(specialty, [])]:
+                self._phrase_to_specialty[fold_text(phrase)] = specialty
+        # Frases mais longas primeiro: "psiquiatria da infancia" vence "psiquiatria"
+        phrases = sorted(self._phrase_to_specialty, key=len, reverse=True)
+        self._pattern = re.compile(r"\b(?:" + "|".join(re.escape(p) for p in phrases) + r")\b")
+
+    def match(self, text: str) -> list:
+        """Especialidades citadas no texto, na ordem em que aparecem e sem repetição."""
+        found = []
+        for m in self._pattern.finditer(fold_text(text)):
+            specialty = self._phrase_to_specialty[m.group(0)]
+            if specialty not in found:
+                found.append(specialty)
+        return found
+
+class NaiveBayesSpecialtyModel:
+    """Naive Bayes multinomial (palavras sem acento) treinado com perguntas rotuladas."""
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.class_counts = Counter()
+        self.word_counts = defaultdict(Counter)
+        self.vocabulary = set()
+
+    def fit(self, questions: list, labels: list) -> "NaiveBayesSpecialtyModel":
+        for question, label in zip(questions, labels):
+            words = fold_text(question).split()
+            self.class_counts[label] += 1
+            self.word_counts[label].update(words)
+            self.vocabulary.update(words)
+        return self
+
+    def predict_proba(self, text: str) -> list:
+        """Lista de (especialidade, probabilidade), da mais para a menos provável."""
+        if not self.class_counts:
+            return []
+        words = [w for w in fold_text(text).split() if w in self.vocabulary]
+        total_docs = sum(self.class_counts.values())
+        vocab_size = len(self.vocabulary)
+        log_scores = {}
+        for label, doc_count in self.class_counts.items():
+            counts = self.word_counts[label]
+            denominator = sum(counts.values()) + self.alpha * vocab_size
+            score = math.log(doc_count / total_docs)
+            for word in words:
+                score += math.log((counts[word] + self.alpha) / denominator)
+            log_scores[label] = score
+        top = max(log_scores.values())
+        exp_scores = {label: math.exp(score - top) for label, score in log_scores.items()}
+        norm = sum(exp_scores.values())
+        return sorted(((label, v / norm) for label, v in exp_scores.items()), key=lambda x: x[1], reverse=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "alpha": self.alpha,
+            "class_counts": dict(self.class_counts),
+            "word_counts": {label: dict(counts) for label, counts in self.word_counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "NaiveBayesSpecialtyModel":
+        model = cls(alpha=data.get("alpha", 1.0))
+        model.class_counts = Counter(data["class_counts"])
+        for label, counts in data["word_counts"].items():
+            model.word_counts[label] = Counter(counts)
+            model.vocabulary.update(counts)
+        return model
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "NaiveBayesSpecialtyModel":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+class SpecialtyClassifier:
+    """Combina o índice de palavras-chave com o modelo opcional; None significa 'pergunte ao LLM'."""
+
+    def __init__(self, index: KeywordSpecialtyIndex, model: NaiveBayesSpecialtyModel | None = None, min_model_confidence: float = 0.85):
+        self.index = index
+        self.model = model
+        self.min_model_confidence = min_model_confidence
+
+    def classify(self, text: str) -> list | None:
+        matches = self.index.match(text)
+        if matches:
+            return matches
+        if self.model is not None:
+            ranked = self.model.predict_proba(text)
+            if ranked and ranked[0][1] >= self.min_model_confidence:
+                return [ranked[0][0]]
+        return None
+
+def build_default_classifier(model_path: str | None = None) -> SpecialtyClassifier:
+    """Classificador com as especialidades e apelidos do config e, se existir, o modelo treinado."""
+    model_path = model_path or config.SPECIALTY_MODEL_PATH
+    model = NaiveBayesSpecialtyModel.load(model_path) if os.path.exists(model_path) else None
+    return SpecialtyClassifier(
+        KeywordSpecialtyIndex(config.ALLOWED_SPECIALTIES, config.SPECIALTY_ALIASES),
+        model=model,
+        min_model_confidence=config.SPECIALTY_MODEL_MIN_CONFIDENCE,
+    )
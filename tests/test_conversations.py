@@ -0,0 +1,78 @@
+# tests/test_conversations.py
+"""
+Testes da busca paginada (keyset) e da sincronização da ConversationStore contra o
+FakeSupabase (benchmarks/stubs.py): linhas sem `data_hora` entre páginas, linhas
+gravadas com atraso dentro da janela do sync e remoções trazidas pela reconciliação.
+
+Uso (a partir da raiz do repositório):
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import conversations
+import tracing
+from stubs import FakeSupabase
+from synthetic import make_messages
+
+def make_store() -> conversations.ConversationStore:
+    return conversations.ConversationStore(os.path.join(tempfile.mkdtemp(), "store.pkl"))
+
+class FetchMessagesTest(unittest.TestCase):
+
+    def setUp(self):
+        tracing.set_exporter(None)
+
+    def test_keyset_pages_cover_every_row(self):
+        rows = make_messages(1000)
+        ids = [row["message_id"] for row in conversations.fetch_messages(FakeSupabase(rows), page_size=70)]
+        self.assertEqual(ids, [row["message_id"] for row in rows])
+
+    def test_rows_without_data_hora_across_pages(self):
+        rows = make_messages(1000)
+        for i in range(0, len(rows), 9):
+            rows[i] = dict(rows[i], data_hora=None)
+        records = conversations.fetch_messages(FakeSupabase(rows), page_size=70)
+        self.assertCountEqual([row["message_id"] for row in records], [row["message_id"] for row in rows])
+
+    def test_incremental_fetch_skips_rows_without_data_hora(self):
+        rows = make_messages(100)
+        rows[-1] = dict(rows[-1], data_hora=None)
+        records = conversations.fetch_messages(FakeSupabase(rows), since=rows[50]["data_hora"], page_size=10)
+        self.assertEqual(len(records), 49)
+
+class ConversationStoreSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        tracing.set_exporter(None)
+
+    def test_late_row_inside_lookback_is_fetched(self):
+        rows = make_messages(500)
+        conn = FakeSupabase(rows)
+        store = make_store()
+        store.sync(conn)
+        late_at = datetime.fromisoformat(store.watermark) - timedelta(minutes=2)
+        conn.insert([dict(rows[0], message_id="atrasada", ordemmensagens=999, data_hora=late_at.isoformat())])
+        self.assertEqual(store.sync(conn), 1)
+        self.assertIn("atrasada", set(store.messages["message_id"]))
+        self.assertEqual(store.sync(conn), 0)
+
+    def test_reconcile_drops_deleted_rows(self):
+        rows = make_messages(500)
+        conn = FakeSupabase(rows)
+        store = make_store()
+        store.sync(conn)
+        conn.delete([rows[10]["message_id"]])
+        store.reconcile(conn)
+        self.assertNotIn(rows[10]["message_id"], set(store.messages["message_id"]))
+        self.assertEqual(len(store.messages), 499)
+
+if __name__ == "__main__":
+    unittest.main()
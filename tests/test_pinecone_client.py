@@ -0,0 +1,180 @@
+# tests/test_pinecone_client.py
+"""
+Testes do PineconeAssistantClient contra o servidor local (benchmarks/pinecone_standin.py):
+novas tentativas em 429/5xx, Retry-After, timeouts de conexão e de leitura separados e o
+ciclo do circuit breaker (aberto, meio-aberto, fechado).
+
+Uso (a partir da raiz do repositório):
+    python -m unittest discover tests
+"""
+import os
+import socket
+import sys
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import requests
+
+from pinecone_client import CircuitOpenError, PineconeAssistantClient
+from pinecone_standin import PineconeStandIn
+
+def make_client(url: str, **overrides) -> PineconeAssistantClient:
+    options = dict(connect_timeout=1, read_timeout=2, max_retries=3, backoff_base=0.01, backoff_cap=0.05, breaker_threshold=5, breaker_cooldown=0.3)
+    options.update(overrides)
+    return PineconeAssistantClient(url, "chave-falsa", **options)
+
+class RetryTest(unittest.TestCase):
+
+    def test_retries_rate_limit_and_server_errors(self):
+        with PineconeStandIn(fail_next=[429, 500, 502, 503]) as server:
+            client = make_client(server.url, max_retries=4)
+            self.assertEqual(client.chat("pergunta").status_code, 200)
+            self.assertEqual(server.requests, 5)
+            self.assertEqual(client.retries, 4)
+            self.assertEqual(client.breaker.state, "fechado")
+
+    def test_gives_up_after_max_retries(self):
+        with PineconeStandIn(failure_rate=1.0) as server:
+            client = make_client(server.url, max_retries=2)
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.chat("pergunta")
+            self.assertEqual(server.requests, 3)
+
+    def test_client_errors_are_not_retried(self):
+        with PineconeStandIn(fail_next=[400]) as server:
+            client = make_client(server.url)
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.chat("pergunta")
+            self.assertEqual(server.requests, 1)
+            self.assertEqual(client.breaker.state, "fechado")
+
+    def test_honors_retry_after(self):
+        with PineconeStandIn(fail_next=[429], retry_after=0.4) as server:
+            client = make_client(server.url, backoff_cap=1.0)
+            start = time.perf_counter()
+            client.chat("pergunta")
+            self.assertGreaterEqual(time.perf_counter() - start, 0.4)
+            self.assertEqual(server.requests, 2)
+
+    def test_retry_after_is_capped(self):
+        with PineconeStandIn(fail_next=[503], retry_after=30) as server:
+            client = make_client(server.url, backoff_cap=0.1)
+            start = time.perf_counter()
+            client.chat("pergunta")
+            self.assertLess(time.perf_counter() - start, 2)
+
+class TimeoutTest(unittest.TestCase):
+
+    def test_read_timeout(self):
+        with PineconeStandIn(latency=2) as server:
+            client = make_client(server.url, connect_timeout=5, read_timeout=0.2, max_retries=0)
+            start = time.perf_counter()
+            with self.assertRaises(requests.exceptions.ReadTimeout):
+                client.chat("pergunta")
+            self.assertLess(time.perf_counter() - start, 1.5)
+
+    def test_connect_timeout(self):
+        # Servidor com a fila de conexões cheia: o SYN é descartado e a conexão não se completa
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(0)
+        host, port = listener.getsockname()
+        pending = []
+        try:
+            for _ in range(3):
+                sock = socket.socket()
+                sock.setblocking(False)
+                sock.connect_ex((host, port))
+                pending.append(sock)
+            client = make_client(f"http://{host}:{port}/assistant/chat/ia-assistant", connect_timeout=0.2, read_timeout=10, max_retries=0)
+            start = time.perf_counter()
+            with self.assertRaises(requests.exceptions.ConnectTimeout):
+                client.chat("pergunta")
+            self.assertLess(time.perf_counter() - start, 2)
+        finally:
+            for sock in pending:
+                sock.close()
+            listener.close()
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_opens_after_threshold_and_refuses_without_calling(self):
+        with PineconeStandIn(failure_rate=1.0) as server:
+            client = make_client(server.url, max_retries=0, breaker_threshold=3, breaker_cooldown=60)
+            for _ in range(3):
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    client.chat("pergunta")
+            self.assertEqual(client.breaker.state, "aberto")
+            with self.assertRaises(CircuitOpenError):
+                client.chat("pergunta")
+            self.assertEqual(server.requests, 3)
+
+    def test_counts_one_failure_per_call(self):
+        with PineconeStandIn(failure_rate=1.0) as server:
+            client = make_client(server.url, max_retries=3, breaker_threshold=2)
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.chat("pergunta")
+            self.assertEqual(server.requests, 4)
+            self.assertEqual(client.breaker.state, "fechado")
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.chat("pergunta")
+            self.assertEqual(client.breaker.state, "aberto")
+
+    def test_half_open_trial_success_closes(self):
+        with PineconeStandIn(fail_next=[503, 503]) as server:
+            client = make_client(server.url, max_retries=0, breaker_threshold=2)
+            for _ in range(2):
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    client.chat("pergunta")
+            self.assertEqual(client.breaker.state, "aberto")
+            time.sleep(client.breaker.cooldown)
+            self.assertEqual(client.breaker.state, "meio-aberto")
+            self.assertEqual(client.chat("pergunta").status_code, 200)
+            self.assertEqual(client.breaker.state, "fechado")
+
+    def test_half_open_trial_failure_reopens(self):
+        with PineconeStandIn(fail_next=[503, 503, 503]) as server:
+            client = make_client(server.url, max_retries=0, breaker_threshold=2)
+            for _ in range(2):
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    client.chat("pergunta")
+            time.sleep(client.breaker.cooldown)
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.chat("pergunta")
+            self.assertEqual(client.breaker.state, "aberto")
+            with self.assertRaises(CircuitOpenError):
+                client.chat("pergunta")
+            self.assertEqual(server.requests, 3)
+
+    def test_unexpected_error_in_trial_releases_breaker(self):
+        with PineconeStandIn(fail_next=[503, 503], truncate_next=1) as server:
+            client = make_client(server.url, max_retries=0, breaker_threshold=2)
+            for _ in range(2):
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    client.chat("pergunta")
+            time.sleep(client.breaker.cooldown)
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                client.chat("pergunta")
+            self.assertEqual(client.breaker.state, "aberto")
+            time.sleep(client.breaker.cooldown)
+            self.assertEqual(client.chat("pergunta").status_code, 200)
+            self.assertEqual(client.breaker.state, "fechado")
+
+class StatsTest(unittest.TestCase):
+
+    def test_stats_track_latency_and_retries(self):
+        with PineconeStandIn(fail_next=[503]) as server:
+            client = make_client(server.url)
+            client.chat("pergunta")
+            stats = client.stats()
+            self.assertEqual(stats["retries"], 1)
+            self.assertEqual(stats["latency"]["count"], 2)
+            self.assertEqual(stats["latency"]["buckets"]["le_inf"], 2)
+            self.assertEqual(stats["breaker"], "fechado")
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,49 @@
+# tests/test_rag_cache.py
+"""
+Testes da camada de similaridade do RagAnswerCache: perguntas que diferem em números
+ou negações nunca reaproveitam a resposta uma da outra, e o limiar configurado não tem
+falsos positivos nos pares rotulados de benchmarks/data/rag_cache_pairs.json.
+
+Uso (a partir da raiz do repositório):
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import config
+from bench_rag_cache_similarity import DEFAULT_DATASET, cache_matches, load_pairs, rates
+from services import RagAnswerCache
+
+def make_cache() -> RagAnswerCache:
+    return RagAnswerCache(max_entries=8, ttl_seconds=60, similarity_threshold=config.RAG_CACHE_SIMILARITY_THRESHOLD)
+
+class SimilarityTierTest(unittest.TestCase):
+
+    def test_negation_is_not_a_match(self):
+        cache = make_cache()
+        cache.put("O curso de cardiologia é presencial?", ["Cardiologia"], "conteúdo", "[]", "Sim.")
+        self.assertIsNone(cache.get("O curso de cardiologia não é presencial?", ["Cardiologia"]))
+
+    def test_different_numbers_are_not_a_match(self):
+        cache = make_cache()
+        cache.put("Qual o valor da mensalidade em 2024?", ["Cardiologia"], "conteúdo", "[]", "R$ 900.")
+        self.assertIsNone(cache.get("Qual o valor da mensalidade em 2025?", ["Cardiologia"]))
+
+    def test_paraphrase_is_a_match(self):
+        cache = make_cache()
+        cache.put("Qual o valor da mensalidade em 2025?", ["Cardiologia"], "conteúdo", "[]", "R$ 900.")
+        answer = cache.get("Qual é o valor da mensalidade em 2025?", ["Cardiologia"])
+        self.assertEqual(answer["match"], "similar")
+        self.assertEqual(answer["insight"], "R$ 900.")
+
+    def test_no_false_positives_on_labeled_pairs(self):
+        false_positive_rate, _ = rates(load_pairs(DEFAULT_DATASET), lambda p: cache_matches(p, config.RAG_CACHE_SIMILARITY_THRESHOLD))
+        self.assertEqual(false_positive_rate, 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
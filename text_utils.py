@@ -0,0 +1,16 @@
+# text_utils.py
+"""Normalização de texto em português usada pelas buscas e classificações locais."""
+import re
+import unicodedata
+
+def fold_text(text: str) -> str:
+    """Minúsculas, sem acentos e com apenas letras/números separados por um espaço."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+def tokenize(text) -> list:
+    """Palavras de `fold_text`; valores vazios ou não textuais não geram tokens."""
+    if not text or not isinstance(text, str):
+        return []
+    return fold_text(text).split()
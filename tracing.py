@@ -0,0 +1,202 @@
+# tracing.py
+"""
+Tracing leve para os pipelines do copiloto. Cada etapa vira um span (context manager
+`span` ou decorator `traced`) com nome, duração e atributos (tokens, tamanho dos
+payloads, acertos de cache...). O span ativo fica em uma contextvar, então spans
+aninhados herdam o trace e o pai automaticamente.
+
+Os spans finalizados são gravados, um por linha, em `config.TRACE_EXPORT_PATH`, com os
+campos do modelo de dados do OpenTelemetry (trace_id, span_id, parent_span_id, tempos
+em nanossegundos Unix, attributes, status). A página diagnostics.py lê esse arquivo.
+"""
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """Uma etapa medida. Use `span()`/`traced()`; `start_span()` apenas para streams."""
+
+    def __init__(self, name: str, attributes: dict | None = None, parent: "Span | None" = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano = None
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set_attribute(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: BaseException):
+        self.status = "ERROR"
+        self.attributes["error.type"] = type(error).__name__
+        self.attributes["error.message"] = str(error)[:500]
+
+    def end(self):
+        """Finaliza e exporta o span (chamadas repetidas são ignoradas)."""
+        if self.end_time_unix_nano is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        self.end_time_unix_nano = self.start_time_unix_nano + int(self.duration * 1e9)
+        if _exporter is not None:
+            _exporter.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+class JsonlExporter:
+    """Acrescenta os spans a um arquivo JSONL; ao passar de `max_bytes`, rotaciona para `<path>.1`."""
+
+    def __init__(self, path: str, max_bytes: int = config.TRACE_EXPORT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, f"{self.path}.1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                pass  # Tracing nunca deve derrubar a aplicação
+
+_exporter = JsonlExporter(config.TRACE_EXPORT_PATH) if config.TRACING_ENABLED else None
+
+def set_exporter(exporter):
+    """Troca o destino dos spans (qualquer objeto com `export(span)`), ou desliga com None."""
+    global _exporter
+    _exporter = exporter
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+def set_attributes(attributes: dict):
+    """Adiciona atributos ao span ativo, se houver."""
+    active = _current_span.get()
+    if active is not None:
+        active.set_attributes(attributes)
+
+@contextmanager
+def span(name: str, attributes: dict | None = None):
+    """Mede o bloco como um span filho do span ativo (ou raiz de um novo trace)."""
+    active = Span(name, attributes, parent=_current_span.get())
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        active.end()
+
+def start_span(name: str, attributes: dict | None = None, parent: Span | None = None) -> Span:
+    """
+    Cria um span filho de `parent` (por padrão, do ativo) sem torná-lo ativo. Para etapas
+    que terminam fora do bloco que as criou (streams); quem criou deve chamar `end()`.
+    """
+    return Span(name, attributes, parent=parent or _current_span.get())
+
+def traced(name: str | None = None):
+    """Decorator: cada chamada da função vira um span (por padrão, `<módulo>.<função>`)."""
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def set_token_usage(target: Span | None, usage):
+    """Registra o uso de tokens (objeto da OpenAI ou dict) como atributos `llm.*` do span."""
+    if target is None or usage is None:
+        return
+    get = usage.get if isinstance(usage, dict) else lambda key: getattr(usage, key, None)
+    target.set_attributes({
+        "llm.prompt_tokens": get("prompt_tokens"),
+        "llm.completion_tokens": get("completion_tokens"),
+        "llm.total_tokens": get("total_tokens"),
+    })
+
+# --- LEITURA E AGREGAÇÃO ---
+
+def load_spans(path: str = config.TRACE_EXPORT_PATH, limit: int | None = None) -> list:
+    """Spans exportados (os `limit` mais recentes, se informado), incluindo o arquivo rotacionado."""
+    spans = []
+    for file_path in (f"{path}.1", path):
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # Linha truncada por uma escrita interrompida
+        except FileNotFoundError:
+            continue
+    return spans[-limit:] if limit else spans
+
+def percentile(values: list, q: float) -> float:
+    """Percentil `q` (0 a 1) por interpolação linear entre os valores ordenados."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize_spans(spans: list) -> list:
+    """Por etapa (nome do span): quantidade, erros, p50/p95/máximo em ms e média de tokens."""
+    by_name = {}
+    for item in spans:
+        if item.get("duration_ms") is not None:
+            by_name.setdefault(item["name"], []).append(item)
+
+    rows = []
+    for name, items in by_name.items():
+        durations = [item["duration_ms"] for item in items]
+        tokens = [item["attributes"]["llm.total_tokens"] for item in items if "llm.total_tokens" in item["attributes"]]
+        rows.append({
+            "etapa": name,
+            "chamadas": len(items),
+            "erros": sum(item.get("status") == "ERROR" for item in items),
+            "p50_ms": percentile(durations, 0.5),
+            "p95_ms": percentile(durations, 0.95),
+            "max_ms": max(durations),
+            "tokens_medios": sum(tokens) / len(tokens) if tokens else None,
+        })
+    return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
\ No newline at end of file